@@ -20,14 +20,68 @@ DETECTRON_CONFIG = {
     "config_file": "COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml",
     "model_weights": str(MODELS_DIR / "model_final.pth"),
     "score_threshold": float(os.getenv("MODEL_CONFIDENCE_THRESHOLD", "0.75")),
-    "device": "cuda" if os.getenv("USE_CUDA", "true").lower() == "true" else "cpu"
+    "device": "cuda" if os.getenv("USE_CUDA", "true").lower() == "true" else "cpu",
+    "batch_size": int(os.getenv("DETECTION_BATCH_SIZE", "4")),  # Pages par passe avant
+    "quantization": os.getenv("DETECTOR_QUANTIZATION", "none").lower(),  # "none" ou "dynamic" (INT8, CPU)
+    # Filtrage avant collage des masques (0 = seuil du modèle ; liste vide = toutes les classes)
+    "postprocess_score_threshold": float(os.getenv("POSTPROCESS_SCORE_THRESH", "0")),
+    "postprocess_classes": [int(c) for c in os.getenv("POSTPROCESS_CLASSES", "").split(",") if c.strip()]
+}
+
+# Détection par tuiles des longues bandes verticales (webtoons)
+TILING_CONFIG = {
+    "min_aspect": float(os.getenv("TILE_MIN_ASPECT", "2.5")),      # hauteur/largeur déclenchant le découpage
+    "height_ratio": float(os.getenv("TILE_HEIGHT_RATIO", "1.5")),  # hauteur d'une tuile / largeur
+    "overlap": float(os.getenv("TILE_OVERLAP", "0.25")),           # recouvrement entre tuiles
+    "batch_size": int(os.getenv("TILE_BATCH_SIZE", "4"))           # tuiles détectées ensemble
+}
+
+# Budget de threads CPU partagé par torch, OpenCV et EasyOCR (entre les workers du traitement par lots)
+THREADS_CONFIG = {
+    "core_budget": int(os.getenv("CPU_CORE_BUDGET", "0")),              # 0 = tous les cœurs disponibles
+    "interop_threads": int(os.getenv("TORCH_INTEROP_THREADS", "1")),
+    "pinning": os.getenv("CPU_PINNING", "false").lower() == "true"     # épingler chaque worker sur ses cœurs
 }
 
 # Configuration OCR
 OCR_CONFIG = {
-    "languages": ["en"],
-    "gpu": os.getenv("USE_CUDA", "true").lower() == "true",
-    "confidence_threshold": float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.75"))
+    "languages": [code.strip() for code in os.getenv("OCR_LANGUAGES", "en").split(",") if code.strip()],  # langue source par défaut
+    "gpu": os.getenv("USE_CUDA", "true").lower() == "true",  # CUDA utilisé seulement s'il est disponible
+    "max_readers": int(os.getenv("OCR_MAX_READERS", "2")),          # lecteurs EasyOCR résidents (un par jeu de langues)
+    "max_readers_mb": float(os.getenv("OCR_MAX_READERS_MB", "0")),  # 0 = pas de limite mémoire
+    "confidence_threshold": float(os.getenv("OCR_CONFIDENCE_THRESHOLD", "0.75")),
+    "batch_size": int(os.getenv("OCR_BATCH_SIZE", "16")),  # recadrages par passe CRAFT / lignes par lot de reconnaissance
+    "mode": os.getenv("OCR_MODE", "page").lower(),         # "page" (une détection par page) ou "crops"
+    # Normalisation des recadrages avant OCR
+    "target_text_height": float(os.getenv("OCR_TARGET_TEXT_HEIGHT", "32")),  # pixels, 0 = pas de remise à l'échelle
+    "max_upscale": float(os.getenv("OCR_MAX_UPSCALE", "2.0")),
+    "min_scale": float(os.getenv("OCR_MIN_SCALE", "0.25")),
+    "binarize": os.getenv("OCR_BINARIZE", "false").lower() == "true",
+    "mask_bubble": os.getenv("OCR_MASK_BUBBLE", "true").lower() == "true",  # fond blanc hors du masque de la bulle
+    # Escalade : passe rapide (recadrages réduits, décodage glouton) puis relecture précise des bulles peu sûres
+    "escalation": os.getenv("OCR_ESCALATION", "true").lower() == "true",
+    "fast_scale": float(os.getenv("OCR_FAST_SCALE", "0.75")),
+    "escalation_confidence": float(os.getenv("OCR_ESCALATION_CONFIDENCE", "0.5")),
+    "accurate_decoder": os.getenv("OCR_ACCURATE_DECODER", "beamsearch"),  # "beamsearch" ou "wordbeamsearch"
+    "beam_width": int(os.getenv("OCR_BEAM_WIDTH", "5")),
+    # Pool de processus OCR à lecteurs préchargés ("0" = OCR dans le processus, "auto" = selon le budget de cœurs)
+    "workers": os.getenv("OCR_WORKERS", "0").lower(),
+    "worker_threads": int(os.getenv("OCR_WORKER_THREADS", "2")),
+    "chunk_size": int(os.getenv("OCR_CHUNK_SIZE", "4")),
+    # Moteur OCR : "easyocr" ou "tesseract" (pytesseract + binaire tesseract), et moteur par classe de bulle
+    "backend": os.getenv("OCR_BACKEND", "easyocr").lower(),
+    "class_backends": {
+        class_name.strip(): name.strip().lower()
+        for class_name, name in (item.split("=", 1) for item in os.getenv("OCR_CLASS_BACKENDS", "").split(",") if "=" in item)
+    },  # ex. OCR_CLASS_BACKENDS="narration_box=tesseract"
+    "tesseract_threads": int(os.getenv("OCR_TESSERACT_THREADS", "4")),
+    "tesseract_config": os.getenv("OCR_TESSERACT_CONFIG", "--oem 1 --psm 6"),
+    # Cache des textes reconnus (clé : empreinte du recadrage + langues), persisté entre les sessions
+    "cache_enabled": os.getenv("OCR_CACHE", "1") == "1",
+    "cache_entries": int(os.getenv("OCR_CACHE_ENTRIES", "4096")),
+    "cache_max_mb": float(os.getenv("OCR_CACHE_MAX_MB", "8")),
+    "cache_hash": os.getenv("OCR_CACHE_HASH", "exact").lower(),  # "exact" ou "perceptual"
+    "cache_path": os.getenv("OCR_CACHE_PATH", str(DATA_DIR / "ocr_cache.pkl"))  # vide = pas de persistance
 }
 
 # Configuration OpenAI (clé API depuis .env)
@@ -35,7 +89,35 @@ OPENAI_CONFIG = {
     "api_key": os.getenv("OPENAI_API_KEY", ""),  # Secret obligatoire
     "model": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
     "max_tokens": int(os.getenv("OPENAI_MAX_TOKENS", "1000")),
-    "temperature": float(os.getenv("OPENAI_TEMPERATURE", "0.3"))
+    "temperature": float(os.getenv("OPENAI_TEMPERATURE", "0.3")),
+    # Traduction groupée par page : une requête JSON indexée, découpée selon un budget de tokens
+    "batch_translation": os.getenv("TRANSLATION_BATCH", "true").lower() == "true",
+    "token_budget": int(os.getenv("TRANSLATION_TOKEN_BUDGET", "1500")),  # tokens de texte source par requête
+    "max_retries": int(os.getenv("TRANSLATION_MAX_RETRIES", "2")),       # nouvelles tentatives des éléments invalides
+    # Client asynchrone : lots envoyés dès la reconnaissance des bulles, en parallèle
+    "async_translation": os.getenv("TRANSLATION_ASYNC", "true").lower() == "true",
+    "concurrency": int(os.getenv("TRANSLATION_CONCURRENCY", "4")),       # requêtes simultanées
+    "timeout": float(os.getenv("TRANSLATION_TIMEOUT", "30")),            # secondes par requête
+    # Mémoire de traduction : LRU en mémoire devant un fichier SQLite
+    "memory_enabled": os.getenv("TRANSLATION_MEMORY", "true").lower() == "true",
+    "memory_path": os.getenv("TRANSLATION_MEMORY_PATH", str(DATA_DIR / "translation_memory.db")),
+    "memory_lru_entries": int(os.getenv("TRANSLATION_MEMORY_LRU_ENTRIES", "2048")),
+    "memory_ttl_days": float(os.getenv("TRANSLATION_MEMORY_TTL_DAYS", "90")),         # 0 = pas d'expiration
+    "memory_max_entries": int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "100000")),  # 0 = pas de plafond
+    "memory_cleanup_every": int(os.getenv("TRANSLATION_MEMORY_CLEANUP_EVERY", "500")),  # écritures entre deux nettoyages
+    # Limites de débit du compte OpenAI (0 = illimité) et nouvelles tentatives sur erreur transitoire
+    "requests_per_minute": int(os.getenv("TRANSLATION_RPM", "500")),
+    "tokens_per_minute": int(os.getenv("TRANSLATION_TPM", "200000")),
+    "rate_retries": int(os.getenv("TRANSLATION_RATE_RETRIES", "5")),
+    "backoff_base": float(os.getenv("TRANSLATION_BACKOFF_BASE", "1.0")),  # secondes
+    "backoff_max": float(os.getenv("TRANSLATION_BACKOFF_MAX", "60")),     # secondes
+    # Moteur de traduction : "openai" (par défaut), "local" (modèle seq2seq hors ligne) ou "stub" (tests)
+    "backend": os.getenv("TRANSLATION_BACKEND", "openai").lower(),
+    "local_model_path": os.getenv("TRANSLATION_MODEL_PATH", str(MODELS_DIR / "opus-mt-en-fr")),
+    "local_batch_size": int(os.getenv("TRANSLATION_LOCAL_BATCH_SIZE", "16")),  # bulles par génération
+    "local_max_length": int(os.getenv("TRANSLATION_LOCAL_MAX_LENGTH", "256")),  # tokens, entrée et sortie
+    "local_num_beams": int(os.getenv("TRANSLATION_LOCAL_BEAMS", "1")),          # 1 = décodage glouton
+    "stub_delay_ms": float(os.getenv("TRANSLATION_STUB_DELAY_MS", "0"))
 }
 
 # Configuration du nettoyage
@@ -4,18 +4,25 @@ Gère le traitement de plusieurs images en arrière-plan avec contrôles
 """
 
 import os
+import sys
+import math
 import time
 import threading
 from queue import Queue
 from pathlib import Path
 from typing import List, Dict, Optional, Callable
 import logging
+import multiprocessing
 import concurrent.futures
 
 # Import du patch PIL pour compatibilité
 import pil_patch
 
 from scripts.main_pipeline import run_pipeline
+from scripts.thread_budget import compute_budget, init_worker
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import DETECTRON_CONFIG
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +60,24 @@ def process_one(image_path, output_dir, clean_only, translate_only, verbose):
         logger.error(f"Erreur dans le process: {e}")
         return (image_path, False)
 
+def process_chunk(image_paths, output_dir, clean_only, translate_only, verbose, batch_size):
+    """Traite un groupe d'images avec une détection batchée (une passe avant par lot)"""
+    from scripts.main_pipeline import run_pipeline_batch
+    import logging
+    logger = logging.getLogger(__name__)
+    try:
+        return run_pipeline_batch(
+            image_paths,
+            output_dir=output_dir,
+            clean_only=clean_only,
+            translate_only=translate_only,
+            verbose=verbose,
+            batch_size=batch_size
+        )
+    except Exception as e:
+        logger.error(f"Erreur dans le process: {e}")
+        return [(image_path, False) for image_path in image_paths]
+
 class BatchProcessor:
     """Gestionnaire de traitement par lots"""
     
@@ -79,6 +104,8 @@ class BatchProcessor:
         self.is_paused = False
         self.should_stop = False
         self.num_workers = 1  # Valeur par défaut
+        self.batch_size = DETECTRON_CONFIG["batch_size"]  # pages par passe avant (1 = image par image)
+        self.thread_budget = None  # Part du budget CPU de chaque worker
         
         # Callbacks pour l'interface
         self.progress_callback = progress_callback
@@ -115,9 +142,15 @@ class BatchProcessor:
         self._update_status(f"{len(valid_paths)} images en attente")
     
     def start_processing(self, output_dir: str, clean_only: bool = False, 
-                        translate_only: bool = False, verbose: bool = False, num_workers: int = 1) -> None:
+                        translate_only: bool = False, verbose: bool = False, num_workers: int = 1,
+                        batch_size: Optional[int] = None) -> None:
         """
         Lance le traitement par lots en parallèle
+        
+        Args:
+            batch_size: nombre d'images détectées ensemble en une passe avant
+                        par chaque worker (1 = image par image,
+                        DETECTRON_CONFIG["batch_size"] par défaut)
         """
         if self.is_running:
             logger.warning("Traitement deja en cours")
@@ -130,6 +163,13 @@ class BatchProcessor:
         self.should_stop = False
         self.start_time = time.time()
         self.num_workers = num_workers
+        self.batch_size = max(1, batch_size or DETECTRON_CONFIG["batch_size"])
+        # Répartition des cœurs entre workers (torch, OpenCV, EasyOCR)
+        self.thread_budget = compute_budget(num_workers)
+        logger.info(
+            f"Budget CPU: {self.thread_budget['cores']} coeurs / {num_workers} worker(s), "
+            f"{self.thread_budget['intra_op_threads']} thread(s) torch/OpenCV par worker"
+        )
         # Lance le thread de gestion du pool
         self.worker_thread = threading.Thread(
             target=self._process_pool_worker,
@@ -218,7 +258,8 @@ class BatchProcessor:
             'successful': self.results,
             'failed': self.failed_images,
             'total_processed': self.processed_images,
-            'total_images': self.total_images
+            'total_images': self.total_images,
+            'thread_budget': self.thread_budget
         }
     
     def _process_pool_worker(self, output_dir: str, clean_only: bool, translate_only: bool, verbose: bool, num_workers: int) -> None:
@@ -232,18 +273,32 @@ class BatchProcessor:
             self.failed_images = 0
             self._update_progress()
             self._update_status(f"{self.total_images} images à traiter")
-            # Utilisation de ProcessPoolExecutor avec la fonction process_one du module
-            with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
-                futures = [executor.submit(process_one, img, output_dir, clean_only, translate_only, verbose) for img in images]
+            # Utilisation de ProcessPoolExecutor avec la fonction process_one du module ;
+            # chaque worker applique sa part du budget CPU au démarrage
+            worker_counter = multiprocessing.Value("i", 0)
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=num_workers,
+                initializer=init_worker,
+                initargs=(num_workers, worker_counter)
+            ) as executor:
+                # Groupes assez petits pour occuper tous les workers
+                chunk_size = min(self.batch_size, math.ceil(len(images) / num_workers)) if images else 1
+                if chunk_size > 1:
+                    # Détection batchée : chaque future traite un groupe d'images
+                    chunks = [images[i:i + chunk_size] for i in range(0, len(images), chunk_size)]
+                    futures = {executor.submit(process_chunk, chunk, output_dir, clean_only, translate_only, verbose, chunk_size): chunk for chunk in chunks}
+                else:
+                    futures = {executor.submit(process_one, img, output_dir, clean_only, translate_only, verbose): [img] for img in images}
                 for future in concurrent.futures.as_completed(futures):
                     try:
-                        img_path, success = future.result()
-                        self.processed_images += 1
-                        if not success:
-                            self.failed_images += 1
+                        outcome = future.result()
+                        for img_path, success in (outcome if isinstance(outcome, list) else [outcome]):
+                            self.processed_images += 1
+                            if not success:
+                                self.failed_images += 1
                     except Exception as e:
-                        self.processed_images += 1
-                        self.failed_images += 1
+                        self.processed_images += len(futures[future])
+                        self.failed_images += len(futures[future])
                         logger.error(f"Erreur dans le process: {e}")
                     self._update_progress()
             self.is_running = False
@@ -1,11 +1,17 @@
 import os
 import cv2
-import torch
 import numpy as np
 import logging
-from detectron2.config import get_cfg
-from detectron2.engine import DefaultPredictor
-from detectron2 import model_zoo
+
+try:
+    from scripts.model_registry import get_predictor
+except ImportError:
+    from model_registry import get_predictor
+
+try:
+    from scripts.masks import masks_of
+except ImportError:
+    from masks import masks_of
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -14,14 +20,15 @@ logger = logging.getLogger(__name__)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 
-cfg = get_cfg()
-cfg.merge_from_file(model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"))
-cfg.MODEL.WEIGHTS = os.path.join(PROJECT_DIR, "models", "model_final.pth")
-cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5
-cfg.MODEL.ROI_HEADS.NUM_CLASSES = 3  # bubble, floating_text, narration_box
-cfg.MODEL.DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+def load_predictor():
+    """Predictor Detectron2 partagé (chargé une seule fois par processus)"""
+    return get_predictor()
 
-predictor = DefaultPredictor(cfg)
+def __getattr__(name):
+    # Compatibilité : "from clean_bubbles import predictor" charge le modèle à la demande
+    if name == "predictor":
+        return load_predictor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # === PARAMÈTRES DE NETTOYAGE ===
 FILL_COLOR = (255, 255, 255)  # Blanc
@@ -32,23 +39,33 @@ CLASS_NAMES = {
     2: "narration_box"
 }
 
+# Marge autour d'un masque couvrant la dilatation (5x5) et le rayon d'inpainting
+INPAINT_MARGIN = 8
+
 def clean_bubbles(image, outputs):
-    masks = outputs["instances"].pred_masks.to("cpu").numpy()
+    masks = masks_of(outputs)
     classes = outputs["instances"].pred_classes.to("cpu").numpy()
 
     result = image.copy()
+    height, width = image.shape[:2]
 
     for i, mask in enumerate(masks):
         class_id = classes[i]
         class_name = CLASS_NAMES.get(class_id, "unknown")
+        if mask.is_empty:
+            continue
 
-        mask_uint8 = (mask * 255).astype(np.uint8)
+        # Traitement limité à la boîte du masque (plus une marge)
+        y0, y1, x0, x1 = mask.region(INPAINT_MARGIN, (height, width))
+        local = mask.crop_to((y0, y1, x0, x1))
+        window = result[y0:y1, x0:x1]
 
         if class_name in ["bubble", "narration_box"]:
-            result[mask > 0] = FILL_COLOR
+            window[local] = FILL_COLOR
         elif class_name == "floating_text":
+            mask_uint8 = local.astype(np.uint8) * 255
             inpaint_mask = cv2.dilate(mask_uint8, np.ones((5, 5), np.uint8), iterations=1)
-            result = cv2.inpaint(result, inpaint_mask, inpaintRadius=3, flags=cv2.INPAINT_TELEA)
+            result[y0:y1, x0:x1] = cv2.inpaint(window, inpaint_mask, inpaintRadius=3, flags=cv2.INPAINT_TELEA)
 
     return result
 
@@ -60,7 +77,7 @@ if __name__ == "__main__":
 
     image_path = sys.argv[1]
     image = cv2.imread(image_path)
-    outputs = predictor(image)
+    outputs = load_predictor()(image)
 
     cleaned = clean_bubbles(image, outputs)
     output_dir = os.path.join(PROJECT_DIR, "output", "cleaned")
@@ -0,0 +1,90 @@
+"""
+Détection Detectron2 par lots
+
+DefaultPredictor.__call__ ne traite qu'une image à la fois. Ici, les pages
+sont prétraitées comme le ferait DefaultPredictor, puis passées ensemble au
+modèle : GeneralizedRCNN les regroupe dans un seul tenseur paddé (ImageList)
+et n'effectue qu'une passe avant par lot.
+
+Le post-traitement de Detectron2 est remplacé par postprocess_compact (voir
+mask_postprocess.py) : filtrage par score/classe, puis masques collés dans
+leur seule boîte. Les sorties portent instances.compact_masks (masks.py).
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+import torch
+
+try:
+    from scripts.model_registry import get_predictor
+except ImportError:
+    from model_registry import get_predictor
+
+try:
+    from scripts.tiling import detect_page
+except ImportError:
+    from tiling import detect_page
+
+try:
+    from scripts.mask_postprocess import postprocess_compact
+except ImportError:
+    from mask_postprocess import postprocess_compact
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import DETECTRON_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_input(predictor, image):
+    """
+    Prétraite une image BGR exactement comme DefaultPredictor.__call__
+    et retourne le dictionnaire d'entrée attendu par le modèle
+    """
+    if predictor.input_format == "RGB":
+        image = image[:, :, ::-1]
+    height, width = image.shape[:2]
+    transformed = predictor.aug.get_transform(image).apply_image(image)
+    tensor = torch.as_tensor(transformed.astype("float32").transpose(2, 0, 1))
+    tensor = tensor.to(predictor.cfg.MODEL.DEVICE)
+    return {"image": tensor, "height": height, "width": width}
+
+
+def detect_batch(images, batch_size=None, predictor=None):
+    """
+    Détecte les bulles sur une liste d'images BGR
+
+    Args:
+        images: liste d'images OpenCV (BGR, tailles libres)
+        batch_size: nombre de pages par passe avant (DETECTRON_CONFIG["batch_size"] par défaut)
+        predictor: predictor à utiliser (le predictor partagé par défaut)
+
+    Returns:
+        Liste de sorties {"instances": Instances}, dans l'ordre des images,
+        avec des masques compacts (compact_masks)
+    """
+    if not images:
+        return []
+
+    predictor = predictor or get_predictor()
+    batch_size = max(1, batch_size or DETECTRON_CONFIG["batch_size"])
+
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            inputs = [prepare_input(predictor, image) for image in chunk]
+            raw = predictor.model.inference(inputs, do_postprocess=False)
+            outputs.extend(
+                {"instances": postprocess_compact(instances, item["height"], item["width"])}
+                for instances, item in zip(raw, inputs)
+            )
+            logger.info(f"Detection par lot: {len(chunk)} image(s) en une passe")
+    return outputs
+
+
+def detect_image(image):
+    """Détecte une image : predictor partagé, ou par tuiles pour les longues bandes (webtoons)"""
+    return detect_page(image, lambda page: detect_batch([page])[0], detect_batch)
@@ -34,7 +34,7 @@ if not logging.getLogger().handlers:
     )
 logger = logging.getLogger(__name__)
 
-def run_pipeline(image_path, output_dir="output", clean_only=False, translate_only=False, verbose=False):
+def run_pipeline(image_path, output_dir="output", clean_only=False, translate_only=False, verbose=False, outputs=None):
     """
     Exécute le pipeline complet de traitement des bulles
     
@@ -43,6 +43,7 @@ def run_pipeline(image_path, output_dir="output", clean_only=False, translate_on
         output_dir (str): Répertoire de sortie
         clean_only (bool): Nettoyer seulement (pas de traduction)
         translate_only (bool): Traduire seulement (pas de nettoyage)
+        outputs: Détections déjà calculées (ex. par detect_batch), sinon détection ici
     """
     image_path = Path(image_path)
     output_dir = Path(output_dir)
@@ -73,6 +74,14 @@ def run_pipeline(image_path, output_dir="output", clean_only=False, translate_on
         logger.info(f"DOSSIERS: Dossiers de sortie crees: {output_dir}")
     
     try:
+        import cv2
+        image = cv2.imread(str(image_path))
+        if outputs is None:
+            # Une seule détection, partagée par le nettoyage et la traduction
+            # (par tuiles pour les longues bandes verticales)
+            from detection import detect_image
+            outputs = detect_image(image)
+        
         # Étape 1: Nettoyage des bulles
         if not translate_only:
             logger.info("Etape 1: Nettoyage des bulles...")
@@ -85,11 +94,8 @@ def run_pipeline(image_path, output_dir="output", clean_only=False, translate_on
                 cleaned_path = cleaned_dir / f"cleaned_{image_path.name}"
             
             # Import et exécution du nettoyage
-            from clean_bubbles import clean_bubbles, predictor
-            import cv2
+            from clean_bubbles import clean_bubbles
             
-            image = cv2.imread(str(image_path))
-            outputs = predictor(image)
             cleaned_image = clean_bubbles(image, outputs)
             cv2.imwrite(str(cleaned_path), cleaned_image)
             logger.info(f"Image nettoyee: {cleaned_path}")
@@ -100,12 +106,9 @@ def run_pipeline(image_path, output_dir="output", clean_only=False, translate_on
             basename = image_path.stem
             
             # Import et exécution de la traduction
-            from translate_bubbles import extract_and_translate, predictor
-            import cv2
+            from translate_bubbles import extract_and_translate
             import json
             
-            image = cv2.imread(str(image_path))
-            outputs = predictor(image)
             results = extract_and_translate(image, outputs)
             
             # Sauvegarde des résultats
@@ -139,6 +142,50 @@ def run_pipeline(image_path, output_dir="output", clean_only=False, translate_on
         logger.error(f"ERREUR: Erreur dans le pipeline: {e}")
         return False
 
+def run_pipeline_batch(image_paths, output_dir="output", clean_only=False, translate_only=False, verbose=False, batch_size=None):
+    """
+    Exécute le pipeline sur plusieurs images en regroupant la détection par lots
+    
+    Args:
+        image_paths (list): Chemins des images à traiter
+        batch_size (int): Pages par passe avant (DETECTRON_CONFIG["batch_size"] par défaut)
+    
+    Returns:
+        list: Tuples (chemin, succès), un par image
+    """
+    import cv2
+    from detection import detect_batch
+    from tiling import is_tall
+    
+    results = []
+    valid_paths = []
+    images = []
+    for image_path in image_paths:
+        image = cv2.imread(str(image_path))
+        if image is None:
+            logger.error(f"Image illisible: {image_path}")
+            results.append((image_path, False))
+            continue
+        if is_tall(image):
+            # Longue bande : détection par tuiles dans run_pipeline, hors du lot
+            results.append((image_path, run_pipeline(image_path, output_dir, clean_only, translate_only, verbose)))
+            continue
+        valid_paths.append(image_path)
+        images.append(image)
+    
+    try:
+        all_outputs = detect_batch(images, batch_size=batch_size)
+    except Exception as e:
+        logger.error(f"ERREUR: Erreur de detection par lots: {e}")
+        return results + [(image_path, False) for image_path in valid_paths]
+    # Libérer les images décodées : run_pipeline les relit au besoin
+    del images
+    
+    for image_path, outputs in zip(valid_paths, all_outputs):
+        success = run_pipeline(image_path, output_dir, clean_only, translate_only, verbose, outputs=outputs)
+        results.append((image_path, success))
+    return results
+
 def main():
     parser = argparse.ArgumentParser(description="Pipeline de traitement des bulles de manga")
     parser.add_argument("image_path", help="Chemin vers l'image à traiter")
@@ -0,0 +1,86 @@
+"""
+Post-traitement du détecteur : filtrage puis collage des masques dans leur boîte
+
+detector_postprocess colle chaque masque 28x28 prédit dans une image pleine
+résolution (N x H x W), avant même que extract_and_translate n'applique son
+seuil de confiance. Ici, les instances sont d'abord filtrées par score et par
+classe, puis chaque masque est collé (même algorithme, paste_masks_in_image)
+dans un canevas limité à sa boîte : la sortie porte directement des masques
+compacts, sans jamais matérialiser de masque pleine image.
+"""
+
+import sys
+import math
+from pathlib import Path
+
+import torch
+from detectron2.layers.mask_ops import paste_masks_in_image
+from detectron2.structures import Boxes, Instances
+
+try:
+    from scripts.masks import CompactMask, CompactMasks
+except ImportError:
+    from masks import CompactMask, CompactMasks
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import DETECTRON_CONFIG
+
+POSTPROCESS_SCORE_THRESH = DETECTRON_CONFIG["postprocess_score_threshold"]  # 0 = seuil du modèle uniquement
+POSTPROCESS_CLASSES = DETECTRON_CONFIG["postprocess_classes"]               # vide = toutes les classes
+MASK_THRESHOLD = 0.5
+
+
+def filter_instances(instances, score_thresh=POSTPROCESS_SCORE_THRESH, classes=POSTPROCESS_CLASSES):
+    """Garde les instances au-dessus du seuil et des classes demandées"""
+    keep = instances.scores >= score_thresh
+    if classes:
+        keep &= torch.isin(instances.pred_classes, torch.tensor(classes, device=instances.pred_classes.device))
+    return instances[keep]
+
+
+def paste_mask_local(mask, box, height, width, threshold=MASK_THRESHOLD):
+    """
+    Colle un masque M x M prédit dans un canevas couvrant seulement sa boîte
+    (coordonnées à la taille de sortie), et retourne un CompactMask
+    """
+    x0, y0 = max(0, int(math.floor(box[0]))), max(0, int(math.floor(box[1])))
+    x1, y1 = min(width, int(math.ceil(box[2])) + 1), min(height, int(math.ceil(box[3])) + 1)
+    if x1 <= x0 or y1 <= y0:
+        return CompactMask.empty()
+    local_box = box.clone()
+    local_box[0::2] -= x0
+    local_box[1::2] -= y0
+    pasted = paste_masks_in_image(mask[None], Boxes(local_box[None]), (y1 - y0, x1 - x0), threshold=threshold)
+    return CompactMask.from_full(pasted[0].cpu().numpy()).shifted(x0, y0)
+
+
+def postprocess_compact(instances, output_height, output_width,
+                        score_thresh=POSTPROCESS_SCORE_THRESH, classes=POSTPROCESS_CLASSES):
+    """
+    Équivalent de detector_postprocess pour des sorties brutes
+    (model.inference(..., do_postprocess=False)) : filtrage, remise à
+    l'échelle des boîtes et masques compacts collés localement
+
+    Returns:
+        Instances à la taille (output_height, output_width), avec compact_masks
+    """
+    instances = filter_instances(instances, score_thresh, classes)
+
+    scale_x = output_width / instances.image_size[1]
+    scale_y = output_height / instances.image_size[0]
+    boxes = instances.pred_boxes.clone()
+    boxes.scale(scale_x, scale_y)
+    boxes.clip((output_height, output_width))
+    nonempty = boxes.nonempty()
+    instances, boxes = instances[nonempty], boxes[nonempty]
+
+    result = Instances((output_height, output_width))
+    result.pred_boxes = Boxes(boxes.tensor.cpu())
+    result.scores = instances.scores.cpu()
+    result.pred_classes = instances.pred_classes.cpu()
+    raw_masks = instances.pred_masks[:, 0]  # N x M x M (probabilités)
+    result.compact_masks = CompactMasks(
+        [paste_mask_local(raw_masks[i], boxes.tensor[i], output_height, output_width) for i in range(len(instances))],
+        (output_height, output_width),
+    )
+    return result
@@ -0,0 +1,191 @@
+"""
+Représentation compacte des masques de bulles
+
+Un masque pleine image (H x W) par bulle coûte des dizaines de Mo par page et
+oblige chaque consommateur à rechercher la boîte avec np.where. Ici, chaque
+masque est stocké sous forme (x0, y0, masque local à sa boîte englobante) :
+une page de 40 bulles tient en quelques Ko et la boîte est obtenue en O(1).
+
+Les sorties de détection portent ces masques dans le champ
+instances.compact_masks (CompactMasks). masks_of() permet aux consommateurs de
+les lire indifféremment depuis ce champ ou depuis un pred_masks pleine image.
+"""
+
+import math
+
+import cv2
+import numpy as np
+import torch
+
+
+class CompactMask:
+    """Masque binaire local à sa boîte englobante, positionné en (x0, y0) dans l'image"""
+
+    __slots__ = ("x0", "y0", "mask")
+
+    def __init__(self, x0, y0, mask):
+        self.x0 = int(x0)
+        self.y0 = int(y0)
+        self.mask = mask.astype(bool, copy=False)
+
+    @property
+    def is_empty(self):
+        return self.mask.size == 0
+
+    @property
+    def bbox(self):
+        """(x_min, y_min, x_max, y_max), bornes incluses comme np.min/np.max des indices"""
+        height, width = self.mask.shape
+        return self.x0, self.y0, self.x0 + width - 1, self.y0 + height - 1
+
+    @property
+    def area(self):
+        return int(self.mask.sum())
+
+    @property
+    def nbytes(self):
+        return self.mask.nbytes
+
+    def region(self, margin=0, image_size=None):
+        """
+        Fenêtre (y0, y1, x0, x1) autour du masque, élargie de margin pixels
+        et bornée par image_size (hauteur, largeur) si fourni
+        """
+        height, width = self.mask.shape
+        y0, x0 = self.y0 - margin, self.x0 - margin
+        y1, x1 = self.y0 + height + margin, self.x0 + width + margin
+        if image_size is not None:
+            y0, x0 = max(0, y0), max(0, x0)
+            y1, x1 = min(image_size[0], y1), min(image_size[1], x1)
+        return y0, y1, x0, x1
+
+    def crop_to(self, region):
+        """Masque local replacé dans une fenêtre (y0, y1, x0, x1) qui le contient ou le recoupe"""
+        y0, y1, x0, x1 = region
+        out = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        if self.is_empty:
+            return out
+        height, width = self.mask.shape
+        sy0, sx0 = max(y0, self.y0), max(x0, self.x0)
+        sy1, sx1 = min(y1, self.y0 + height), min(x1, self.x0 + width)
+        if sy1 > sy0 and sx1 > sx0:
+            out[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = self.mask[sy0 - self.y0:sy1 - self.y0, sx0 - self.x0:sx1 - self.x0]
+        return out
+
+    def to_full(self, height, width):
+        """Masque pleine image (à n'utiliser que pour la compatibilité)"""
+        return self.crop_to((0, height, 0, width))
+
+    @classmethod
+    def empty(cls):
+        return cls(0, 0, np.zeros((0, 0), dtype=bool))
+
+    @classmethod
+    def from_full(cls, mask, box=None):
+        """
+        Construit un masque compact depuis un masque pleine image. Si la boîte
+        de détection est fournie, seule cette zone est parcourue.
+        """
+        mask = np.asarray(mask)
+        height, width = mask.shape
+        ox, oy = 0, 0
+        if box is not None:
+            ox = max(0, int(math.floor(box[0])) - 1)
+            oy = max(0, int(math.floor(box[1])) - 1)
+            mask = mask[oy:min(height, int(math.ceil(box[3])) + 2), ox:min(width, int(math.ceil(box[2])) + 2)]
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        if len(rows) == 0 or len(cols) == 0:
+            return cls.empty()
+        local = mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+        return cls(ox + cols[0], oy + rows[0], np.array(local, dtype=bool))
+
+    @classmethod
+    def from_polygon(cls, polygon, height, width):
+        """Rasterise un polygone [[x, y], ...] uniquement dans sa boîte englobante"""
+        points = np.array(polygon, dtype=np.int32).reshape(-1, 2)
+        if len(points) == 0:
+            return cls.empty()
+        x0, y0 = max(0, int(points[:, 0].min())), max(0, int(points[:, 1].min()))
+        x1, y1 = min(width, int(points[:, 0].max()) + 1), min(height, int(points[:, 1].max()) + 1)
+        if x1 <= x0 or y1 <= y0:
+            return cls.empty()
+        local = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(local, [points - np.array([x0, y0], dtype=np.int32)], 255)
+        return cls.from_full(local > 0).shifted(x0, y0)
+
+    def shifted(self, dx, dy):
+        """Copie décalée de (dx, dy) (ex. passage d'une tuile à la bande complète)"""
+        return CompactMask(self.x0 + dx, self.y0 + dy, self.mask)
+
+
+class CompactMasks:
+    """
+    Ensemble de masques compacts d'une image, utilisable comme champ
+    d'Instances Detectron2 (longueur, indexation, .to(), cat)
+    """
+
+    def __init__(self, masks, image_size):
+        self.masks = list(masks)
+        self.image_size = tuple(image_size)
+
+    def __len__(self):
+        return len(self.masks)
+
+    def __iter__(self):
+        return iter(self.masks)
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return self.masks[int(item)]
+        if isinstance(item, slice):
+            return CompactMasks(self.masks[item], self.image_size)
+        if isinstance(item, torch.Tensor):
+            item = item.cpu().numpy()
+        item = np.asarray(item)
+        if item.dtype == bool:
+            item = np.flatnonzero(item)
+        return CompactMasks([self.masks[int(i)] for i in item], self.image_size)
+
+    def to(self, *args, **kwargs):
+        # Toujours sur CPU : rien à déplacer
+        return self
+
+    @classmethod
+    def cat(cls, items):
+        return cls([m for item in items for m in item.masks], items[0].image_size if items else (0, 0))
+
+    @property
+    def nbytes(self):
+        return sum(m.nbytes for m in self.masks)
+
+    def to_full(self):
+        """Tableau N x H x W pleine image (compatibilité uniquement)"""
+        height, width = self.image_size
+        if not self.masks:
+            return np.zeros((0, height, width), dtype=bool)
+        return np.stack([m.to_full(height, width) for m in self.masks])
+
+    @classmethod
+    def from_full(cls, masks, boxes=None):
+        """Depuis un tableau/tenseur N x H x W (et les boîtes N x 4 si disponibles)"""
+        if isinstance(masks, torch.Tensor):
+            masks = masks.to("cpu").numpy()
+        if isinstance(boxes, torch.Tensor):
+            boxes = boxes.to("cpu").numpy()
+        image_size = masks.shape[1:3]
+        return cls(
+            [CompactMask.from_full(mask, None if boxes is None else boxes[i]) for i, mask in enumerate(masks)],
+            image_size,
+        )
+
+
+def masks_of(instances):
+    """Masques compacts d'une instance Detectron2 ou MockInstances"""
+    if isinstance(instances, dict):
+        instances = instances["instances"]
+    if hasattr(instances, "compact_masks"):
+        return instances.compact_masks
+    boxes = instances.pred_boxes.tensor if hasattr(instances, "pred_boxes") else None
+    return CompactMasks.from_full(instances.pred_masks, boxes)
+
@@ -0,0 +1,130 @@
+"""
+Registre unique des modèles de l'application desktop (Detectron2, EasyOCR)
+
+clean_bubbles, translate_bubbles et l'interface récupèrent ici le predictor
+et les lecteurs OCR : les poids ne sont chargés qu'une fois par processus
+(un lecteur par jeu de langues, voir ocr_readers.py).
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+from pathlib import Path
+
+import torch
+from detectron2.config import get_cfg
+from detectron2.engine import DefaultPredictor
+from detectron2 import model_zoo
+
+# Les scripts sont importés tantôt en "scripts.xxx" (GUI), tantôt en "xxx"
+# (ligne de commande) : on enregistre le module sous les deux noms pour ne
+# jamais avoir deux registres (et donc deux copies des poids) en mémoire.
+sys.modules.setdefault("model_registry", sys.modules[__name__])
+sys.modules.setdefault("scripts.model_registry", sys.modules[__name__])
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import DETECTRON_CONFIG
+
+try:
+    from scripts.quantization import quantize_predictor
+except ImportError:
+    from quantization import quantize_predictor
+
+try:
+    from scripts.ocr_readers import get_reader_pool
+except ImportError:
+    from ocr_readers import get_reader_pool
+
+logger = logging.getLogger(__name__)
+
+NUM_CLASSES = 3  # bubble, floating_text, narration_box
+SCORE_THRESH_TEST = 0.5
+
+CLASS_NAMES = {0: "bubble", 1: "floating_text", 2: "narration_box"}
+
+_lock = threading.RLock()
+_cfg = None
+_predictor = None
+_memory_stats = {}
+
+
+def _rss_bytes():
+    """Mémoire résidente du processus (0 si psutil indisponible)"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        return 0
+
+
+def _parameters_bytes(model):
+    """Taille des paramètres et buffers d'un module torch"""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def get_detectron_cfg():
+    """Configuration Detectron2 partagée (construite une seule fois)"""
+    global _cfg
+    with _lock:
+        if _cfg is None:
+            cfg = get_cfg()
+            cfg.merge_from_file(model_zoo.get_config_file(DETECTRON_CONFIG["config_file"]))
+            cfg.MODEL.WEIGHTS = DETECTRON_CONFIG["model_weights"]
+            cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = SCORE_THRESH_TEST
+            cfg.MODEL.ROI_HEADS.NUM_CLASSES = NUM_CLASSES
+            quantized = DETECTRON_CONFIG["quantization"] != "none"
+            cfg.MODEL.DEVICE = "cuda" if torch.cuda.is_available() and not quantized else "cpu"
+            _cfg = cfg
+        return _cfg
+
+
+def get_predictor():
+    """Predictor Detectron2 partagé, chargé paresseusement une fois par processus"""
+    global _predictor
+    if _predictor is not None:
+        return _predictor
+
+    with _lock:
+        if _predictor is None:
+            cfg = get_detectron_cfg()
+            rss_before = _rss_bytes()
+            start = time.time()
+            predictor = quantize_predictor(DefaultPredictor(cfg))
+            _memory_stats["detector"] = {
+                "load_time_s": round(time.time() - start, 3),
+                "parameters_bytes": _parameters_bytes(predictor.model),
+                "rss_delta_bytes": max(0, _rss_bytes() - rss_before),
+                "device": cfg.MODEL.DEVICE,
+                "quantization": DETECTRON_CONFIG["quantization"],
+            }
+            logger.info(f"Modele Detectron2 charge ({_memory_stats['detector']['load_time_s']}s)")
+            _predictor = predictor
+        return _predictor
+
+
+def get_reader(languages=None):
+    """
+    Lecteur EasyOCR pour une langue source ("en", "ja", "ko", "zh"...) ou un
+    jeu de langues (OCR_CONFIG["languages"] par défaut), créé par le pool partagé
+    """
+    return get_reader_pool().get(languages)
+
+
+def is_loaded():
+    """Indique quels modèles sont déjà résidents"""
+    readers = get_reader_pool().loaded()
+    return {"detector": _predictor is not None, "ocr": bool(readers), "ocr_languages": readers}
+
+
+def get_memory_stats():
+    """Comptabilité mémoire des modèles chargés"""
+    return {
+        "process_rss_bytes": _rss_bytes(),
+        "models": {name: dict(stats) for name, stats in _memory_stats.items()},
+        "ocr_readers": get_reader_pool().get_stats(),
+    }
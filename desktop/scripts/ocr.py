@@ -0,0 +1,523 @@
+"""
+OCR groupé des bulles d'une page (EasyOCR)
+
+reader.readtext(roi) appelé bulle par bulle relance CRAFT puis le
+reconnaisseur avec des lots d'une seule ligne. Ici, toutes les bulles d'une
+page sont traitées ensemble :
+
+- détection des lignes : les recadrages sont paddés (blanc) à une taille
+  commune par paquets de OCR_BATCH_SIZE et passés en un seul lot à CRAFT ;
+- reconnaissance : les recadrages sont empilés dans une mosaïque en niveaux
+  de gris et toutes leurs lignes sont reconnues en un appel à
+  reader.recognize, par lots de OCR_BATCH_SIZE lignes.
+
+En mode OCR_CONFIG["mode"]="page" (par défaut), CRAFT ne tourne qu'une fois
+sur la page entière : les lignes détectées sont attribuées aux bulles via un
+index spatial (grille sur les boîtes, puis test d'appartenance au masque), et
+seul le reconnaisseur est appliqué aux lignes attribuées. Le mode "crops"
+détecte les lignes bulle par bulle (en lots).
+
+Les résultats sont rendus dans l'ordre des bulles, au même format que
+readtext : [(boîte, texte, confiance), ...] par bulle. read_texts et
+read_bubbles normalisent d'abord chaque recadrage (ocr_preprocess : masque de
+la bulle, hauteur de texte cible) puis passent par le cache OCR (ocr_cache) :
+seuls les recadrages normalisés jamais vus sont lus.
+
+Lecture en deux temps (OCR_CONFIG["escalation"]) : une passe rapide sur les
+recadrages réduits (OCR_CONFIG["fast_scale"], décodage glouton), puis seules
+les bulles dont la confiance reste sous OCR_CONFIG["escalation_confidence"]
+sont relues à pleine résolution avec le décodeur précis (beam search).
+
+Avec OCR_CONFIG["workers"] (ocr_executor), la lecture des bulles absentes du
+cache est confiée à un pool de processus à lecteurs préchargés (mode "crops").
+
+Le moteur OCR est interchangeable (EasyOCRBackend, TesseractBackend) : par
+appel, par configuration (OCR_CONFIG["backend"]) ou par classe de bulle
+(OCR_CONFIG["class_backends"]).
+Un moteur expose name et read(prepared, languages, ...) qui retourne un
+texte par recadrage normalisé.
+"""
+
+import sys
+import bisect
+import logging
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    from scripts.model_registry import get_reader
+    from scripts.ocr_cache import cached_texts
+    from scripts.ocr_executor import get_ocr_executor
+    from scripts.ocr_readers import resolve_languages
+    from scripts.ocr_tesseract import TesseractBackend
+    from scripts.ocr_preprocess import normalize_crop, scale_lines, unscale_results
+except ImportError:
+    from model_registry import get_reader
+    from ocr_cache import cached_texts
+    from ocr_executor import get_ocr_executor
+    from ocr_readers import resolve_languages
+    from ocr_tesseract import TesseractBackend
+    from ocr_preprocess import normalize_crop, scale_lines, unscale_results
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import OCR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+OCR_BATCH_SIZE = OCR_CONFIG["batch_size"]  # recadrages par passe CRAFT / lignes par lot de reconnaissance
+OCR_MODE = OCR_CONFIG["mode"]              # "page" (une détection par page) ou "crops"
+OCR_BACKEND = OCR_CONFIG["backend"]  # moteur par défaut : "easyocr" ou "tesseract"
+OCR_CLASS_BACKENDS = OCR_CONFIG["class_backends"]  # moteur par classe de bulle
+OCR_LINE_MIN_OVERLAP = 0.3  # part minimale d'une ligne recouverte par une bulle pour lui être attribuée
+INDEX_CELL_SIZE = 64        # taille (px) des cellules de l'index spatial
+MOSAIC_GAP = 16  # pixels blancs entre deux recadrages de la mosaïque
+# Escalade : passe rapide puis relecture précise des bulles peu sûres
+OCR_ESCALATION = OCR_CONFIG["escalation"]
+OCR_FAST_SCALE = OCR_CONFIG["fast_scale"]  # réduction des recadrages de la passe rapide
+OCR_ESCALATION_CONFIDENCE = OCR_CONFIG["escalation_confidence"]
+OCR_ACCURATE_DECODER = OCR_CONFIG["accurate_decoder"]  # "beamsearch" ou "wordbeamsearch"
+OCR_BEAM_WIDTH = OCR_CONFIG["beam_width"]
+
+
+def _to_color(crop):
+    if crop.ndim == 2:
+        return cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+    return crop
+
+
+def _to_gray(crop):
+    if crop.ndim == 2:
+        return crop
+    return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+
+def detect_lines(reader, crops, batch_size=OCR_BATCH_SIZE):
+    """
+    Détecte les lignes de texte de chaque recadrage avec CRAFT, par lots
+
+    Returns:
+        Liste (une entrée par recadrage) de (horizontal_list, free_list),
+        dans le repère du recadrage, comme reader.detect
+    """
+    lines = [([], []) for _ in crops]
+    # Trier par taille limite le padding à l'intérieur d'un lot
+    order = sorted(range(len(crops)), key=lambda i: crops[i].shape[0] * crops[i].shape[1])
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        height = max(crops[i].shape[0] for i in chunk)
+        width = max(crops[i].shape[1] for i in chunk)
+        batch = np.full((len(chunk), height, width, 3), 255, dtype=np.uint8)
+        for slot, i in enumerate(chunk):
+            crop = _to_color(crops[i])
+            batch[slot, :crop.shape[0], :crop.shape[1]] = crop
+        horizontal, free = reader.detect(batch, reformat=False)
+        for slot, i in enumerate(chunk):
+            lines[i] = (horizontal[slot], free[slot])
+    return lines
+
+
+def build_mosaic(crops):
+    """Empile verticalement les recadrages (gris, fond blanc) ; retourne (mosaïque, décalages y)"""
+    width = max(crop.shape[1] for crop in crops)
+    height = sum(crop.shape[0] for crop in crops) + MOSAIC_GAP * (len(crops) - 1)
+    mosaic = np.full((height, width), 255, dtype=np.uint8)
+    offsets = []
+    y = 0
+    for crop in crops:
+        offsets.append(y)
+        mosaic[y:y + crop.shape[0], :crop.shape[1]] = _to_gray(crop)
+        y += crop.shape[0] + MOSAIC_GAP
+    return mosaic, offsets
+
+
+def recognize_lines(reader, crops, lines, batch_size=OCR_BATCH_SIZE, **recognize_kwargs):
+    """
+    Reconnaît en un appel les lignes de tous les recadrages
+
+    Returns:
+        Liste (une entrée par recadrage) de [(boîte, texte, confiance), ...],
+        boîtes dans le repère du recadrage
+    """
+    results = [[] for _ in crops]
+    if not any(horizontal or free for horizontal, free in lines):
+        return results
+
+    mosaic, offsets = build_mosaic(crops)
+    horizontal_list, free_list = [], []
+    for offset, (horizontal, free) in zip(offsets, lines):
+        horizontal_list.extend([x0, x1, y0 + offset, y1 + offset] for x0, x1, y0, y1 in horizontal)
+        free_list.extend([[x, y + offset] for x, y in box] for box in free)
+
+    recognized = reader.recognize(
+        mosaic, horizontal_list=horizontal_list, free_list=free_list,
+        batch_size=batch_size, detail=1, **recognize_kwargs
+    )
+    for box, text, confidence in recognized:
+        center_y = sum(point[1] for point in box) / len(box)
+        index = max(0, bisect.bisect_right(offsets, center_y) - 1)
+        offset = offsets[index]
+        results[index].append(([[x, y - offset] for x, y in box], text, confidence))
+    return results
+
+
+def read_crops(crops, reader=None, batch_size=OCR_BATCH_SIZE, **recognize_kwargs):
+    """
+    OCR groupé d'une liste de recadrages BGR (ou gris)
+
+    Returns:
+        Liste, dans l'ordre des recadrages, de [(boîte, texte, confiance), ...]
+    """
+    reader = reader or get_reader()
+    results = [[] for _ in crops]
+    valid = [i for i, crop in enumerate(crops) if crop is not None and crop.size > 0]
+    if not valid:
+        return results
+
+    batch = [crops[i] for i in valid]
+    lines = detect_lines(reader, batch, batch_size)
+    recognized = recognize_lines(reader, batch, lines, batch_size, **recognize_kwargs)
+    for i, lines_of_crop in zip(valid, recognized):
+        results[i] = lines_of_crop
+    logger.info(f"OCR groupe: {len(valid)} bulle(s), {sum(len(r) for r in recognized)} ligne(s)")
+    return results
+
+
+def reader_languages(reader, languages=None):
+    """Langues d'un lecteur EasyOCR, ou du jeu demandé sans lecteur (partie de la clé du cache OCR)"""
+    if reader is None:
+        return resolve_languages(languages)
+    return tuple(sorted(getattr(reader, "lang_list", ())))
+
+
+def normalize_crops(crops, masks=None):
+    """
+    Normalise chaque recadrage non vide (masques booléens à la taille des
+    recadrages, optionnels) ; retourne une liste de (image, échelle)
+    """
+    prepared = []
+    for i, crop in enumerate(crops):
+        if crop is None or crop.size == 0:
+            prepared.append((crop, 1.0))
+        else:
+            prepared.append(normalize_crop(crop, masks[i] if masks is not None else None))
+    return prepared
+
+
+def bubble_confidence(lines):
+    """Confiance d'une bulle : moyenne des confiances de ses lignes pondérée par leur longueur"""
+    weights = [max(1, len(text)) for _, text, _ in lines]
+    if not weights:
+        return 0.0
+    return sum(w * confidence for w, (_, _, confidence) in zip(weights, lines)) / sum(weights)
+
+
+def downscale(item, factor):
+    """Réduit un recadrage normalisé (image, échelle) pour la passe rapide"""
+    image, scale = item
+    if image is None or image.size == 0 or factor >= 1.0:
+        return item
+    size = (max(1, round(image.shape[1] * factor)), max(1, round(image.shape[0] * factor)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale * factor
+
+
+def read_with_escalation(prepared, read):
+    """
+    Lecture en deux temps de recadrages normalisés
+
+    Args:
+        prepared: [(image, échelle), ...]
+        read: read(positions, items, **recognize_kwargs) -> lignes reconnues
+              pour chaque item (positions : rangs dans prepared)
+
+    Returns:
+        Lignes reconnues pour chaque recadrage, dans l'ordre de prepared
+    """
+    positions = list(range(len(prepared)))
+    if not OCR_ESCALATION:
+        return read(positions, prepared)
+
+    results = read(positions, [downscale(item, OCR_FAST_SCALE) for item in prepared], decoder="greedy")
+    # Une bulle sans ligne n'a rien à relire : seules les lectures peu sûres sont escaladées
+    low = [k for k, lines in enumerate(results) if lines and bubble_confidence(lines) < OCR_ESCALATION_CONFIDENCE]
+    if low:
+        accurate = read(low, [prepared[k] for k in low], decoder=OCR_ACCURATE_DECODER, beamWidth=OCR_BEAM_WIDTH)
+        for k, lines in zip(low, accurate):
+            if bubble_confidence(lines) >= bubble_confidence(results[k]):
+                results[k] = lines
+    logger.info(f"OCR en deux temps: {len(low)}/{len(prepared)} bulle(s) relue(s) en mode precis")
+    return results
+
+
+def join_lines(lines):
+    """Texte d'une bulle à partir de ses lignes reconnues"""
+    return " ".join(text for _, text, _ in lines).strip()
+
+
+class BubbleIndex:
+    """Index spatial en grille des boîtes de bulles (x_min, y_min, x_max, y_max)"""
+
+    def __init__(self, boxes, masks=None, cell_size=INDEX_CELL_SIZE):
+        self.boxes = boxes
+        self.masks = masks
+        self.cell_size = cell_size
+        self._cells = {}
+        for i, (x0, y0, x1, y1) in enumerate(boxes):
+            for cx in range(int(x0) // cell_size, int(x1) // cell_size + 1):
+                for cy in range(int(y0) // cell_size, int(y1) // cell_size + 1):
+                    self._cells.setdefault((cx, cy), []).append(i)
+
+    def candidates(self, x0, y0, x1, y1):
+        """Bulles dont la boîte partage une cellule avec le rectangle donné"""
+        found = set()
+        for cx in range(int(x0) // self.cell_size, int(x1) // self.cell_size + 1):
+            for cy in range(int(y0) // self.cell_size, int(y1) // self.cell_size + 1):
+                found.update(self._cells.get((cx, cy), ()))
+        return sorted(found)
+
+    def contains(self, i, x, y):
+        """Le point (x, y) appartient-il au masque de la bulle i (ou à sa boîte sans masque)"""
+        x0, y0, x1, y1 = self.boxes[i]
+        if not (x0 <= x <= x1 and y0 <= y <= y1):
+            return False
+        if self.masks is None:
+            return True
+        mask = self.masks[i]
+        local_y, local_x = int(y) - mask.y0, int(x) - mask.x0
+        return 0 <= local_y < mask.mask.shape[0] and 0 <= local_x < mask.mask.shape[1] and bool(mask.mask[local_y, local_x])
+
+
+def assign_lines(index, horizontal, free, min_overlap=OCR_LINE_MIN_OVERLAP):
+    """
+    Attribue les lignes détectées sur la page aux bulles
+
+    Une ligne horizontale est découpée sur la boîte de chaque bulle qui en
+    recouvre au moins min_overlap (CRAFT peut fusionner deux bulles voisines) ;
+    une ligne libre (inclinée) va à la bulle qui contient son centre.
+
+    Returns:
+        Liste (une entrée par bulle) de (horizontal_list, free_list) dans le
+        repère de la page
+    """
+    assigned = [([], []) for _ in index.boxes]
+    for x0, x1, y0, y1 in horizontal:
+        area = max(1, (x1 - x0) * (y1 - y0))
+        for i in index.candidates(x0, y0, x1, y1):
+            bx0, by0, bx1, by1 = index.boxes[i]
+            ix0, iy0, ix1, iy1 = max(x0, bx0), max(y0, by0), min(x1, bx1), min(y1, by1)
+            if ix1 <= ix0 or iy1 <= iy0 or (ix1 - ix0) * (iy1 - iy0) < min_overlap * area:
+                continue
+            if not index.contains(i, (ix0 + ix1) / 2, (iy0 + iy1) / 2) and index.masks is not None:
+                # Intersection hors du masque (boîtes voisines qui se chevauchent)
+                continue
+            assigned[i][0].append([ix0, ix1, iy0, iy1])
+    for box in free:
+        xs, ys = [p[0] for p in box], [p[1] for p in box]
+        center_x, center_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        for i in index.candidates(center_x, center_y, center_x, center_y):
+            if index.contains(i, center_x, center_y):
+                assigned[i][1].append(box)
+                break
+    return assigned
+
+
+def detect_page(reader, image):
+    """Lignes de texte de la page entière (horizontal_list, free_list)"""
+    horizontal, free = reader.detect(image)
+    return horizontal[0], free[0]
+
+
+def read_page(image, boxes, masks=None, reader=None, batch_size=OCR_BATCH_SIZE, prepared=None, detected=None,
+              **recognize_kwargs):
+    """
+    OCR des bulles d'une page avec une seule détection CRAFT sur la page
+
+    Args:
+        image: page BGR
+        boxes: boîtes des bulles (x_min, y_min, x_max, y_max) ; le recadrage
+               d'une bulle est image[y_min:y_max, x_min:x_max]
+        masks: masques compacts des bulles (optionnel, affine l'attribution)
+        prepared: recadrages déjà normalisés [(image, échelle), ...]
+                  (calculés ici sinon)
+        detected: lignes déjà détectées sur la page (horizontal_list,
+                  free_list), pour relire des bulles sans relancer CRAFT
+
+    Returns:
+        Liste, dans l'ordre des bulles, de [(boîte, texte, confiance), ...]
+        (boîtes dans le repère du recadrage, comme read_crops)
+    """
+    reader = reader or get_reader()
+    results = [[] for _ in boxes]
+    if not boxes:
+        return results
+
+    if prepared is None:
+        prepared = normalize_crops(bubble_crops(image, boxes), bubble_masks(boxes, masks))
+
+    horizontal, free = detected if detected is not None else detect_page(reader, image)
+    index = BubbleIndex(boxes, masks)
+    assigned = assign_lines(index, horizontal, free)
+
+    valid, crops, lines = [], [], []
+    for i, ((x0, y0, x1, y1), (h_lines, f_lines)) in enumerate(zip(boxes, assigned)):
+        crop, scale = prepared[i]
+        if crop is None or crop.size == 0 or not (h_lines or f_lines):
+            continue
+        valid.append(i)
+        crops.append(crop)
+        # Repère de la page -> repère du recadrage normalisé
+        lines.append(scale_lines((
+            [[lx0 - x0, lx1 - x0, ly0 - y0, ly1 - y0] for lx0, lx1, ly0, ly1 in h_lines],
+            [[[px - x0, py - y0] for px, py in box] for box in f_lines],
+        ), scale))
+
+    if valid:
+        recognized = recognize_lines(reader, crops, lines, batch_size, **recognize_kwargs)
+        for i, lines_of_crop in zip(valid, recognized):
+            results[i] = unscale_results(lines_of_crop, prepared[i][1])
+    logger.info(f"OCR page: {len(valid)}/{len(boxes)} bulle(s) avec texte")
+    return results
+
+
+def bubble_crops(image, boxes):
+    return [image[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+
+
+def bubble_masks(boxes, masks):
+    """Masques compacts des bulles -> masques booléens à la taille de leur recadrage"""
+    if masks is None:
+        return None
+    return [mask.crop_to((y0, y1, x0, x1)) for (x0, y0, x1, y1), mask in zip(boxes, masks)]
+
+
+class EasyOCRBackend:
+    """Moteur OCR EasyOCR : page ou recadrages, lecture en deux temps, exécuteur multi-processus"""
+
+    name = "easyocr"
+
+    def read(self, prepared, languages, image=None, boxes=None, masks=None, reader=None, batch_size=OCR_BATCH_SIZE,
+             on_texts=None):
+        """
+        Textes de recadrages normalisés [(image, échelle), ...] ; avec la page
+        et les boîtes des bulles, le mode OCR_MODE=page détecte les lignes
+        une seule fois sur la page. Avec l'exécuteur multi-processus,
+        on_texts([(position, texte), ...]) reçoit chaque paquet dès sa fin
+        """
+        executor = get_ocr_executor()
+        if executor is not None:
+            texts = [""] * len(prepared)
+            for pairs in executor.iter_texts(prepared, languages, batch_size):
+                for position, text in pairs:
+                    texts[position] = text
+                if on_texts is not None:
+                    on_texts(pairs)
+            return texts
+        ocr_reader = reader or get_reader(languages)
+        detected = []  # détection de la page, partagée par les deux passes
+
+        def read(positions, items, **recognize_kwargs):
+            if OCR_MODE == "page" and image is not None:
+                if not detected:
+                    detected.append(detect_page(ocr_reader, image))
+                return read_page(
+                    image, [boxes[p] for p in positions],
+                    [masks[p] for p in positions] if masks is not None else None,
+                    ocr_reader, batch_size, prepared=items, detected=detected[0], **recognize_kwargs
+                )
+            return read_crops([item_image for item_image, _ in items], ocr_reader, batch_size, **recognize_kwargs)
+
+        return [join_lines(lines) for lines in read_with_escalation(prepared, read)]
+
+
+BACKENDS = {
+    "easyocr": EasyOCRBackend,
+    "tesseract": TesseractBackend,
+}
+_backends = {}
+
+
+def get_backend(name=None):
+    """
+    Moteur OCR par nom (OCR_BACKEND par défaut), instancié au premier usage
+
+    Raises:
+        ValueError: moteur inconnu
+    """
+    name = (name or OCR_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Moteur OCR inconnu: {name} (attendu: {', '.join(sorted(BACKENDS))})")
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+def select_backend(class_name=None, requested=None):
+    """Moteur d'une bulle : demandé par la requête, sinon celui de sa classe, sinon OCR_BACKEND"""
+    return (requested or OCR_CLASS_BACKENDS.get(class_name) or OCR_BACKEND).lower()
+
+
+def read_texts(crops, reader=None, batch_size=OCR_BATCH_SIZE, masks=None, languages=None, backend=None,
+               class_name=None, on_texts=None):
+    """
+    Textes reconnus pour chaque recadrage, dans l'ordre des bulles
+    (normalisation puis cache ; masks : masques booléens des bulles à la
+    taille des recadrages, optionnels ; sans reader, le lecteur de languages
+    n'est chargé que si nécessaire ; moteur : backend, sinon celui de
+    class_name, sinon OCR_BACKEND ; on_texts([(indice, texte), ...]) reçoit
+    les textes dès qu'ils sont connus)
+    """
+    key_languages = reader_languages(reader, languages)
+    prepared = normalize_crops(crops, masks)
+    engine = get_backend(select_backend(class_name, backend))
+
+    def recognize(indices, on_recognized=None):
+        return engine.read([prepared[i] for i in indices], key_languages, reader=reader, batch_size=batch_size,
+                           on_texts=on_recognized)
+
+    return cached_texts([image for image, _ in prepared], (engine.name,) + key_languages, recognize,
+                        on_texts=on_texts)
+
+
+def read_bubbles(image, boxes, masks=None, reader=None, batch_size=OCR_BATCH_SIZE, languages=None,
+                 backend=None, classes=None, on_texts=None):
+    """
+    Textes des bulles d'une page, dans l'ordre des boîtes
+
+    Chaque bulle est lue par le moteur demandé (backend), sinon celui de sa
+    classe (classes : noms de classe par boîte,
+    OCR_CONFIG["class_backends"]), sinon OCR_CONFIG["backend"].
+
+    Les bulles déjà en cache ne sont ni détectées ni reconnues.
+    on_texts([(indice, texte), ...]) reçoit les textes au fil de l'eau :
+    ceux du cache, puis ceux de chaque moteur dès sa lecture terminée.
+    """
+    key_languages = reader_languages(reader, languages)
+    prepared = normalize_crops(bubble_crops(image, boxes), bubble_masks(boxes, masks))
+
+    groups = {}
+    for i in range(len(boxes)):
+        name = select_backend(classes[i] if classes is not None else None, backend)
+        groups.setdefault(name, []).append(i)
+
+    texts = [""] * len(boxes)
+    for name, group in groups.items():
+        engine = get_backend(name)
+
+        def recognize(positions, on_recognized=None, engine=engine, group=group):
+            indices = [group[p] for p in positions]
+            return engine.read(
+                [prepared[i] for i in indices], key_languages, image=image,
+                boxes=[boxes[i] for i in indices],
+                masks=[masks[i] for i in indices] if masks is not None else None,
+                reader=reader, batch_size=batch_size, on_texts=on_recognized
+            )
+
+        def on_group_texts(pairs, group=group):
+            on_texts([(group[k], text) for k, text in pairs])
+
+        group_texts = cached_texts([prepared[i][0] for i in group], (engine.name,) + key_languages, recognize,
+                                   on_texts=on_group_texts if on_texts is not None else None)
+        for i, text in zip(group, group_texts):
+            texts[i] = text
+    return texts
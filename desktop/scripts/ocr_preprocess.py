@@ -0,0 +1,109 @@
+"""
+Normalisation des recadrages avant OCR
+
+Les bulles arrivent à EasyOCR à leur taille d'origine : sur un scan haute
+résolution, une grande bulle coûte bien plus cher à détecter et à empiler
+dans la mosaïque qu'il n'est utile. Chaque recadrage est ici :
+
+- masqué à la forme de la bulle (fond blanc hors du masque), pour ne pas lire
+  le texte voisin compris dans la boîte ;
+- remis à l'échelle pour que la hauteur des caractères, estimée sur les
+  composantes connexes du recadrage binarisé, vaille
+  OCR_CONFIG["target_text_height"] ;
+- optionnellement binarisé (Otsu, OCR_CONFIG["binarize"]).
+
+Les lignes détectées sur le recadrage d'origine se convertissent avec le
+facteur d'échelle retourné.
+"""
+
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import OCR_CONFIG
+
+OCR_TARGET_TEXT_HEIGHT = OCR_CONFIG["target_text_height"]  # pixels, 0 = pas de remise à l'échelle
+OCR_MAX_UPSCALE = OCR_CONFIG["max_upscale"]
+OCR_MIN_SCALE = OCR_CONFIG["min_scale"]
+OCR_BINARIZE = OCR_CONFIG["binarize"]
+OCR_MASK_BUBBLE = OCR_CONFIG["mask_bubble"]
+SCALE_TOLERANCE = 0.1  # écart à 1 en dessous duquel le recadrage n'est pas redimensionné
+
+
+def to_gray(crop):
+    if crop.ndim == 2:
+        return crop
+    return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+
+def estimate_text_height(gray):
+    """
+    Hauteur médiane des caractères (composantes connexes sombres sur fond
+    clair), ou None si aucune composante plausible
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return None
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    # Ni bruit, ni contour de la bulle
+    keep = (areas >= 4) & (heights >= 3) & (heights < 0.8 * gray.shape[0])
+    if not keep.any():
+        return None
+    return float(np.median(heights[keep]))
+
+
+def mask_crop(gray, mask):
+    """Blanchit les pixels hors du masque de la bulle (masque booléen à la taille du recadrage)"""
+    return np.where(mask, gray, 255).astype(np.uint8)
+
+
+def normalize_crop(crop, mask=None, target_height=OCR_TARGET_TEXT_HEIGHT, binarize=OCR_BINARIZE,
+                   mask_bubble=OCR_MASK_BUBBLE, max_upscale=OCR_MAX_UPSCALE, min_scale=OCR_MIN_SCALE):
+    """
+    Recadrage normalisé (niveaux de gris) et facteur d'échelle appliqué
+
+    Returns:
+        (image, scale) : image à passer à l'OCR ; une coordonnée du recadrage
+        d'origine devient coordonnée * scale
+    """
+    gray = to_gray(crop)
+    if mask_bubble and mask is not None and mask.shape == gray.shape:
+        gray = mask_crop(gray, mask)
+
+    scale = 1.0
+    if target_height > 0:
+        text_height = estimate_text_height(gray)
+        if text_height:
+            scale = min(max(target_height / text_height, min_scale), max_upscale)
+    if abs(scale - 1.0) > SCALE_TOLERANCE:
+        size = (max(1, round(gray.shape[1] * scale)), max(1, round(gray.shape[0] * scale)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+    else:
+        scale = 1.0
+
+    if binarize:
+        _, gray = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return gray, scale
+
+
+def scale_lines(lines, scale):
+    """(horizontal_list, free_list) du recadrage d'origine -> recadrage normalisé"""
+    if scale == 1.0:
+        return lines
+    horizontal, free = lines
+    return (
+        [[round(v * scale) for v in box] for box in horizontal],
+        [[[round(x * scale), round(y * scale)] for x, y in box] for box in free],
+    )
+
+
+def unscale_results(results, scale):
+    """Boîtes reconnues sur le recadrage normalisé -> recadrage d'origine"""
+    if scale == 1.0:
+        return results
+    return [([[x / scale, y / scale] for x, y in box], text, confidence) for box, text, confidence in results]
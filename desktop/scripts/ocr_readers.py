@@ -0,0 +1,155 @@
+"""
+Pool de lecteurs EasyOCR par jeu de langues
+
+Un lecteur EasyOCR (CRAFT + reconnaisseur) coûte plusieurs centaines de Mo
+et plusieurs secondes de chargement. Les lecteurs sont donc créés à la
+première demande d'un jeu de langues (en, ja, ko, ch_sim...), sur CUDA si
+OCR_CONFIG["gpu"] le permet et qu'il est disponible, et au plus
+OCR_CONFIG["max_readers"] lecteurs (et OCR_CONFIG["max_readers_mb"] Mo de
+poids) restent résidents : le moins récemment utilisé est évincé.
+"""
+
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+import torch
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import OCR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+OCR_LANGUAGES = OCR_CONFIG["languages"]
+OCR_MAX_READERS = OCR_CONFIG["max_readers"]
+OCR_MAX_READERS_MB = OCR_CONFIG["max_readers_mb"]
+
+# Langue source demandée -> jeu de langues EasyOCR (ja, ko et ch_sim ne se
+# combinent qu'avec l'anglais)
+LANGUAGE_SETS = {
+    "en": ("en",),
+    "fr": ("fr", "en"),
+    "ja": ("ja", "en"),
+    "ko": ("ko", "en"),
+    "zh": ("ch_sim", "en"),
+    "ch_sim": ("ch_sim", "en"),
+    "ch_tra": ("ch_tra", "en"),
+}
+
+
+def resolve_languages(languages=None):
+    """
+    Normalise une langue source ("ja"), une liste (["ja", "en"]) ou None
+    (OCR_LANGUAGES) en jeu de langues EasyOCR trié
+
+    Raises:
+        ValueError: langue non prise en charge
+    """
+    if languages is None:
+        languages = OCR_LANGUAGES
+    if isinstance(languages, str):
+        codes = [code.strip() for code in languages.split(",") if code.strip()]
+    else:
+        codes = list(languages)
+    resolved = set()
+    for code in codes:
+        if code not in LANGUAGE_SETS:
+            raise ValueError(f"Langue OCR non prise en charge: {code} (attendu: {', '.join(sorted(LANGUAGE_SETS))})")
+        resolved.update(LANGUAGE_SETS[code])
+    return tuple(sorted(resolved))
+
+
+def select_device():
+    """Périphérique des lecteurs : CUDA si autorisé par la configuration et disponible"""
+    return "cuda" if OCR_CONFIG["gpu"] and torch.cuda.is_available() else "cpu"
+
+
+def reader_bytes(reader):
+    """Poids résidents d'un lecteur (détecteur CRAFT + reconnaisseur)"""
+    total = 0
+    for module in (getattr(reader, "detector", None), getattr(reader, "recognizer", None)):
+        if module is None:
+            continue
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ReaderPool:
+    """Lecteurs EasyOCR créés à la demande, évincés par LRU (nombre et mémoire)"""
+
+    def __init__(self, max_readers=OCR_MAX_READERS, max_bytes=OCR_MAX_READERS_MB * 1024 * 1024):
+        self.max_readers = max(1, int(max_readers))
+        self.max_bytes = int(max_bytes)
+        self._readers = OrderedDict()  # langues -> (lecteur, infos)
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, languages=None):
+        """Lecteur pour le jeu de langues demandé (créé au premier appel)"""
+        key = resolve_languages(languages)
+        with self._lock:
+            if key in self._readers:
+                self._readers.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._readers[key][0]
+            self._stats["misses"] += 1
+            reader, info = self._create(key)
+            self._readers[key] = (reader, info)
+            self._evict()
+            return reader
+
+    def _create(self, languages):
+        import easyocr
+
+        device = select_device()
+        start = time.time()
+        reader = easyocr.Reader(list(languages), gpu=device == "cuda")
+        info = {
+            "languages": list(languages),
+            "device": device,
+            "load_time_s": round(time.time() - start, 3),
+            "parameters_bytes": reader_bytes(reader),
+        }
+        logger.info(f"Lecteur EasyOCR {'+'.join(languages)} initialise sur {device} ({info['load_time_s']}s)")
+        return reader, info
+
+    def _resident_bytes(self):
+        return sum(info["parameters_bytes"] for _, info in self._readers.values())
+
+    def _evict(self):
+        # Le lecteur le plus récent n'est jamais évincé
+        while len(self._readers) > 1 and (
+            len(self._readers) > self.max_readers
+            or (self.max_bytes > 0 and self._resident_bytes() > self.max_bytes)
+        ):
+            languages, (_, info) = self._readers.popitem(last=False)
+            self._stats["evictions"] += 1
+            logger.info(f"Lecteur EasyOCR {'+'.join(languages)} evince")
+            if info["device"] == "cuda":
+                torch.cuda.empty_cache()
+
+    def loaded(self):
+        with self._lock:
+            return [list(languages) for languages in self._readers]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "resident": [dict(info) for _, info in self._readers.values()],
+                "resident_bytes": self._resident_bytes(),
+                "max_readers": self.max_readers,
+                "max_bytes": self.max_bytes,
+            }
+
+
+_pool = ReaderPool()
+
+
+def get_reader_pool():
+    """Pool de lecteurs partagé par le processus"""
+    return _pool
@@ -0,0 +1,69 @@
+"""
+Moteur OCR Tesseract (pytesseract)
+
+Pour les bulles au lettrage propre et horizontal (typiquement l'anglais),
+Tesseract coûte bien moins cher sur CPU qu'EasyOCR (CRAFT + reconnaisseur).
+Il lit les recadrages déjà normalisés (ocr_preprocess), un bloc de texte par
+bulle (--psm 6), en parallèle sur OCR_CONFIG["tesseract_threads"] threads :
+chaque
+appel lance un processus tesseract, le GIL n'est donc pas un frein.
+
+Nécessite le binaire tesseract et ses données de langues (eng, jpn...).
+"""
+
+import sys
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import OCR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+OCR_TESSERACT_THREADS = OCR_CONFIG["tesseract_threads"]
+OCR_TESSERACT_CONFIG = OCR_CONFIG["tesseract_config"]
+
+# Codes EasyOCR -> données de langue Tesseract
+TESSERACT_LANGUAGES = {
+    "en": "eng",
+    "fr": "fra",
+    "ja": "jpn",
+    "ko": "kor",
+    "ch_sim": "chi_sim",
+    "ch_tra": "chi_tra",
+}
+
+
+class TesseractBackend:
+    """Lecture des recadrages normalisés avec Tesseract"""
+
+    name = "tesseract"
+
+    def __init__(self, threads=OCR_TESSERACT_THREADS, config=OCR_TESSERACT_CONFIG):
+        try:
+            import pytesseract
+        except ImportError:
+            raise ImportError("pytesseract est requis pour le moteur OCR tesseract (pip install pytesseract)")
+        self._pytesseract = pytesseract
+        self.threads = max(1, threads)
+        self.config = config
+
+    def read(self, prepared, languages, **kwargs):
+        """
+        Textes de recadrages normalisés [(image, échelle), ...] ; les
+        arguments propres à EasyOCR (page, boîtes, lecteur) sont ignorés
+        """
+        lang = "+".join(TESSERACT_LANGUAGES[code] for code in languages if code in TESSERACT_LANGUAGES) or "eng"
+
+        def read_one(item):
+            image, _ = item
+            if image is None or image.size == 0:
+                return ""
+            text = self._pytesseract.image_to_string(image, lang=lang, config=self.config)
+            return " ".join(text.split())
+
+        with ThreadPoolExecutor(max_workers=min(self.threads, max(1, len(prepared)))) as pool:
+            texts = list(pool.map(read_one, prepared))
+        logger.info(f"OCR tesseract ({lang}): {len(prepared)} bulle(s)")
+        return texts
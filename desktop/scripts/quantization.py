@@ -0,0 +1,69 @@
+"""
+Mode INT8 du détecteur pour l'inférence CPU
+
+Quantification dynamique (poids INT8, activations quantifiées à la volée) des
+couches linéaires des têtes ROI : box head (fc1/fc2, ~13M paramètres) et
+prédicteur. Les convolutions du backbone ResNet-50/FPN de Detectron2 (Conv2d
+avec norme intégrée, additions résiduelles en place) ne sont pas compatibles
+avec la quantification statique en mode eager et restent en FP32, comme les
+convolutions de la tête de masques. Aucune calibration n'est effectuée.
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+import torch
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import DETECTRON_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# "none" (FP32) ou "dynamic" (INT8), voir DETECTRON_CONFIG["quantization"]
+DETECTOR_QUANTIZATION = DETECTRON_CONFIG["quantization"]
+QUANTIZATION_MODES = ("none", "dynamic")
+
+
+def _select_engine():
+    """Choisit le moteur de quantification disponible (fbgemm sur x86, qnnpack sur ARM)"""
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("fbgemm", "x86", "qnnpack"):
+        if engine in engines:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError(f"Aucun moteur de quantification CPU disponible: {engines}")
+
+
+def quantize_model(model, mode=DETECTOR_QUANTIZATION):
+    """
+    Quantifie un modèle Detectron2 en place
+
+    Args:
+        model: GeneralizedRCNN en mode eval, sur CPU
+        mode: "none" ou "dynamic"
+
+    Returns:
+        Le modèle (quantifié si mode == "dynamic")
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Mode de quantification inconnu: {mode} (attendu: {', '.join(QUANTIZATION_MODES)})")
+    if mode == "none":
+        return model
+
+    engine = _select_engine()
+    model.eval()
+    torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    logger.info(f"Détecteur quantifié en INT8 (dynamique, moteur {engine})")
+    return model
+
+
+def quantize_predictor(predictor, mode=DETECTOR_QUANTIZATION):
+    """Quantifie le modèle d'un DefaultPredictor (CPU uniquement)"""
+    if mode == "none":
+        return predictor
+    if predictor.cfg.MODEL.DEVICE != "cpu":
+        logger.warning("Quantification INT8 ignorée: le détecteur n'est pas sur CPU")
+        return predictor
+    quantize_model(predictor.model, mode)
+    return predictor
@@ -0,0 +1,118 @@
+"""
+Budget de threads CPU partagé entre torch, OpenCV et EasyOCR
+
+Chaque worker du ProcessPoolExecutor lance par défaut autant de threads torch
+que de cœurs, plus le pool d'OpenCV et les appels torch d'EasyOCR : avec N
+workers, la machine est sursouscrite N fois. Ici, le budget global
+(THREADS_CONFIG["core_budget"], tous les cœurs par défaut) est réparti entre
+les workers. Chaque processus règle torch (intra/inter-op), OpenCV et les
+variables OMP/MKL sur sa part, et peut être épinglé sur ses cœurs.
+"""
+
+import os
+import sys
+import logging
+from pathlib import Path
+
+import cv2
+import torch
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import THREADS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_settings = None
+
+
+def available_cores():
+    """Cœurs utilisables par le processus (affinité comprise)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def compute_budget(workers=1, core_budget=None, interop_threads=None):
+    """Répartit le budget de cœurs entre workers et retourne la part d'un worker"""
+    core_budget = THREADS_CONFIG["core_budget"] if core_budget is None else core_budget
+    interop_threads = interop_threads or THREADS_CONFIG["interop_threads"]
+    cores = available_cores()
+    total = min(core_budget, len(cores)) if core_budget > 0 else len(cores)
+    workers = max(1, int(workers))
+    per_worker = max(1, total // workers)
+    return {
+        "cores": total,
+        "workers": workers,
+        "intra_op_threads": per_worker,
+        "interop_threads": max(1, min(interop_threads, per_worker)),
+        "opencv_threads": per_worker,
+    }
+
+
+def worker_cores(budget, worker_index):
+    """Cœurs attribués au worker worker_index (tranches contiguës du budget)"""
+    cores = available_cores()[:budget["cores"]]
+    per_worker = budget["intra_op_threads"]
+    start = (worker_index % budget["workers"]) * per_worker
+    return cores[start:start + per_worker] or cores
+
+
+def apply_thread_budget(workers=1, worker_index=None, pin=None):
+    """
+    Applique le budget au processus courant, avant le chargement des modèles
+    (torch refuse de changer les threads inter-op une fois du travail lancé).
+    Retourne les réglages effectifs.
+    """
+    global _settings
+    pin = THREADS_CONFIG["pinning"] if pin is None else pin
+    budget = compute_budget(workers)
+    threads = budget["intra_op_threads"]
+
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    os.environ.setdefault("MKL_NUM_THREADS", str(threads))
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(budget["interop_threads"])
+    except RuntimeError as e:
+        logger.warning(f"Threads inter-op deja fixes, reglage ignore: {e}")
+    cv2.setNumThreads(budget["opencv_threads"])
+
+    pinned = None
+    if pin and worker_index is not None and hasattr(os, "sched_setaffinity"):
+        pinned = worker_cores(budget, worker_index)
+        try:
+            os.sched_setaffinity(0, pinned)
+        except OSError as e:
+            logger.warning(f"Epinglage CPU impossible: {e}")
+            pinned = None
+
+    _settings = {"budget": budget, "pinned_cores": pinned}
+    settings = get_thread_settings()
+    logger.info(
+        f"Budget CPU (pid {os.getpid()}): torch={settings['torch_threads']} "
+        f"(inter-op {settings['torch_interop_threads']}), opencv={settings['opencv_threads']}, "
+        f"coeurs={pinned or 'non epingle'}"
+    )
+    return settings
+
+
+def get_thread_settings():
+    """Réglages de threads effectivement en vigueur dans le processus"""
+    return {
+        "budget": _settings["budget"] if _settings else None,
+        "pinned_cores": _settings["pinned_cores"] if _settings else None,
+        "torch_threads": torch.get_num_threads(),
+        "torch_interop_threads": torch.get_num_interop_threads(),
+        "opencv_threads": cv2.getNumThreads(),
+        "omp_num_threads": os.environ.get("OMP_NUM_THREADS"),
+        "affinity": available_cores(),
+    }
+
+
+def init_worker(workers, counter):
+    """Initialiseur de ProcessPoolExecutor : chaque worker prend un rang et applique sa part du budget"""
+    with counter.get_lock():
+        worker_index = counter.value
+        counter.value += 1
+    apply_thread_budget(workers, worker_index)
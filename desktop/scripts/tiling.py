@@ -0,0 +1,166 @@
+"""
+Détection par tuiles pour les longues bandes verticales (webtoons)
+
+Une bande de 800x15000 réduite en 800x1200 rend les bulles indétectables. Les
+images dont le rapport hauteur/largeur dépasse TILE_MIN_ASPECT sont découpées
+en fenêtres qui se chevauchent. Chaque tuile est détectée, par lots de
+TILE_BATCH_SIZE, et les instances sont ramenées dans le repère de la bande.
+Les doublons de part et d'autre des coutures sont ensuite fusionnés.
+
+Seuls les masques compacts (recadrés sur leur boîte, voir masks.py) sont
+conservés, y compris dans les Instances retournées : la mémoire dépend de la
+taille d'une tuile et du nombre de bulles, pas de la longueur de la bande.
+"""
+
+import sys
+import logging
+from pathlib import Path
+
+import torch
+from detectron2.structures import Boxes, Instances
+
+try:
+    from scripts.masks import CompactMask, CompactMasks, masks_of
+except ImportError:
+    from masks import CompactMask, CompactMasks, masks_of
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import TILING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+TILE_MIN_ASPECT = TILING_CONFIG["min_aspect"]      # hauteur/largeur déclenchant le découpage
+TILE_HEIGHT_RATIO = TILING_CONFIG["height_ratio"]  # hauteur d'une tuile / largeur
+TILE_OVERLAP = TILING_CONFIG["overlap"]            # recouvrement entre tuiles
+TILE_BATCH_SIZE = TILING_CONFIG["batch_size"]      # tuiles détectées ensemble
+MERGE_IOU = 0.5           # IoU des boîtes au-delà duquel deux instances sont fusionnées
+MERGE_CONTAINMENT = 0.7   # part de la plus petite boîte recouverte (bulle coupée par une couture)
+
+
+def is_tall(image):
+    """Indique si l'image doit être détectée par tuiles"""
+    height, width = image.shape[:2]
+    return width > 0 and height / width >= TILE_MIN_ASPECT
+
+
+def tile_windows(height, width):
+    """Fenêtres verticales (y0, y1) couvrant toute la hauteur, avec recouvrement"""
+    tile_height = max(1, int(width * TILE_HEIGHT_RATIO))
+    if tile_height >= height:
+        return [(0, height)]
+    stride = max(1, int(tile_height * (1.0 - TILE_OVERLAP)))
+    starts = list(range(0, height - tile_height, stride))
+    starts.append(height - tile_height)  # dernière tuile alignée sur le bas
+    return [(y0, y0 + tile_height) for y0 in starts]
+
+
+def _collect(instances, y_offset):
+    """Extrait les instances d'une tuile, ramenées dans le repère de la bande"""
+    instances = instances.to("cpu")
+    boxes = instances.pred_boxes.tensor.numpy()
+    scores = instances.scores.numpy()
+    classes = instances.pred_classes.numpy()
+    masks = masks_of(instances)
+
+    detections = []
+    for i in range(len(instances)):
+        if masks[i].is_empty:
+            continue
+        detections.append({
+            "class": int(classes[i]),
+            "score": float(scores[i]),
+            "box": [float(boxes[i][0]), float(boxes[i][1]) + y_offset, float(boxes[i][2]), float(boxes[i][3]) + y_offset],
+            "mask": masks[i].shifted(0, y_offset),
+        })
+    return detections
+
+
+def _overlap(a, b):
+    """(IoU, recouvrement de la plus petite boîte) de deux boîtes [x0, y0, x1, y1]"""
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    union = area_a + area_b - inter
+    smallest = min(area_a, area_b)
+    return (inter / union if union > 0 else 0.0), (inter / smallest if smallest > 0 else 0.0)
+
+
+def _union_mask(a, b):
+    """Union de deux masques compacts, dans le repère de leur boîte englobante commune"""
+    ay0, ay1, ax0, ax1 = a.region()
+    by0, by1, bx0, bx1 = b.region()
+    region = (min(ay0, by0), max(ay1, by1), min(ax0, bx0), max(ax1, bx1))
+    return CompactMask(region[2], region[0], a.crop_to(region) | b.crop_to(region))
+
+
+def merge_detections(detections):
+    """Fusionne les instances dupliquées ou coupées de part et d'autre des coutures"""
+    kept = []
+    for det in sorted(detections, key=lambda d: d["score"], reverse=True):
+        target = None
+        for other in kept:
+            if other["class"] != det["class"]:
+                continue
+            iou, containment = _overlap(other["box"], det["box"])
+            if iou >= MERGE_IOU or containment >= MERGE_CONTAINMENT:
+                target = other
+                break
+        if target is None:
+            kept.append(det)
+            continue
+        target["box"] = [
+            min(target["box"][0], det["box"][0]), min(target["box"][1], det["box"][1]),
+            max(target["box"][2], det["box"][2]), max(target["box"][3], det["box"][3]),
+        ]
+        target["mask"] = _union_mask(target["mask"], det["mask"])
+    # Ordre de lecture : de haut en bas
+    return sorted(kept, key=lambda d: (d["box"][1], d["box"][0]))
+
+
+def build_instances(detections, height, width):
+    """Construit des Instances Detectron2 (masques compacts) dans le repère de la bande"""
+    instances = Instances((height, width))
+    count = len(detections)
+    instances.pred_boxes = Boxes(torch.tensor([d["box"] for d in detections], dtype=torch.float32).reshape(count, 4))
+    instances.scores = torch.tensor([d["score"] for d in detections], dtype=torch.float32)
+    instances.pred_classes = torch.tensor([d["class"] for d in detections], dtype=torch.int64)
+    instances.compact_masks = CompactMasks([d["mask"] for d in detections], (height, width))
+    return instances
+
+
+def detect_tiled(image, detect_many, batch_size=None):
+    """
+    Détecte les bulles d'une longue bande par tuiles
+
+    Args:
+        image: bande BGR (H, W, C)
+        detect_many: fonction liste d'images -> liste de sorties {"instances": ...}
+        batch_size: tuiles détectées ensemble (TILE_BATCH_SIZE par défaut)
+
+    Returns:
+        {"instances": Instances} dans le repère de la bande
+    """
+    height, width = image.shape[:2]
+    windows = tile_windows(height, width)
+    batch_size = max(1, batch_size or TILE_BATCH_SIZE)
+
+    detections = []
+    for start in range(0, len(windows), batch_size):
+        chunk = windows[start:start + batch_size]
+        outputs = detect_many([image[y0:y1] for y0, y1 in chunk])
+        for (y0, _), output in zip(chunk, outputs):
+            detections.extend(_collect(output["instances"], y0))
+        del outputs
+
+    merged = merge_detections(detections)
+    logger.info(f"Detection par tuiles: {len(windows)} tuiles, {len(detections)} instances brutes, {len(merged)} après fusion")
+    return {"instances": build_instances(merged, height, width)}
+
+
+def detect_page(image, detect_one, detect_many):
+    """Détecte une page normale avec detect_one, une longue bande par tuiles avec detect_many"""
+    if is_tall(image):
+        return detect_tiled(image, detect_many)
+    return detect_one(image)
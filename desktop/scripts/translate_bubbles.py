@@ -4,9 +4,10 @@ import cv2
 import torch
 import json
 import numpy as np
-import easyocr
 import openai
 import logging
+import threading
+from functools import partial
 from pathlib import Path
 
 # Patch de compatibilité pour Pillow >= 10.0 (utilisé par easyocr)
@@ -21,26 +22,49 @@ try:
 except ImportError:
     pass
 
-from detectron2.config import get_cfg
-from detectron2.engine import DefaultPredictor
-from detectron2 import model_zoo
+try:
+    from scripts.model_registry import get_predictor
+except ImportError:
+    from model_registry import get_predictor
+
+try:
+    from scripts.masks import CompactMask, masks_of
+except ImportError:
+    from masks import CompactMask, masks_of
+
+try:
+    from scripts.ocr import read_bubbles, read_texts
+    from scripts.ocr_readers import resolve_languages
+    from scripts.translation import (
+        TRANSLATION_ASYNC, TRANSLATION_BACKEND, TRANSLATION_BATCH, TRANSLATION_MODEL, AsyncTranslator, BatchSession,
+        request_tokens, translate_page
+    )
+    from scripts.translation_local import LocalSeq2SeqBackend, StubBackend
+    from scripts.translation_scheduler import get_translation_scheduler
+    from scripts.translation_memory import get_translation_memory
+except ImportError:
+    from ocr import read_bubbles, read_texts
+    from ocr_readers import resolve_languages
+    from translation import (
+        TRANSLATION_ASYNC, TRANSLATION_BACKEND, TRANSLATION_BATCH, TRANSLATION_MODEL, AsyncTranslator, BatchSession,
+        request_tokens, translate_page
+    )
+    from translation_local import LocalSeq2SeqBackend, StubBackend
+    from translation_scheduler import get_translation_scheduler
+    from translation_memory import get_translation_memory
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
 
-# === CONFIGURATION DETECTRON2 ===
+# === CONFIGURATION DES CHEMINS ===
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 
-cfg = get_cfg()
-cfg.merge_from_file(model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"))
-cfg.MODEL.WEIGHTS = os.path.join(PROJECT_DIR, "models", "model_final.pth")
-cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5
-cfg.MODEL.ROI_HEADS.NUM_CLASSES = 3
-cfg.MODEL.DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-
-predictor = DefaultPredictor(cfg)
-reader = easyocr.Reader(['en'], gpu=True)
+def __getattr__(name):
+    # Compatibilité : "from translate_bubbles import predictor" réutilise le modèle partagé
+    if name == "predictor":
+        return get_predictor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 CLASS_NAMES = {0: "bubble", 1: "floating_text", 2: "narration_box"}
 # Import de la configuration hybride
@@ -53,7 +77,7 @@ CONFIDENCE_THRESHOLD = OCR_CONFIG["confidence_threshold"]
 
 # === OPENAI (nouvelle API) ===
 api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
+if not api_key and TRANSLATION_BACKEND == "openai":
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
 # Initialisation du client OpenAI avec gestion d'erreur robuste
@@ -83,58 +107,136 @@ def create_openai_client():
         # Si rien ne marche, on lève l'erreur originale
         raise e
 
-client = create_openai_client()
+# Sans clé (moteur local ou stub), pas de client OpenAI ; nouvelles tentatives : translation_scheduler
+client = create_openai_client().with_options(max_retries=0) if api_key else None
+async_translator = AsyncTranslator(api_key)
 
-def translate(text):
+def translate(text, requester=None):
     if not text.strip():
         return ""
+    messages = [
+        {"role": "system", "content": "Tu es un traducteur automatique. Ne commente jamais. Donne uniquement la traduction française brute du texte fourni."},
+        {"role": "user", "content": f"Traduis ce texte en français : {text}"}
+    ]
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Tu es un traducteur automatique. Ne commente jamais. Donne uniquement la traduction française brute du texte fourni."},
-                {"role": "user", "content": f"Traduis ce texte en français : {text}"}
-            ],
-            max_tokens=150,
-            temperature=0.3
+        # Limites de débit, files par utilisateur et nouvelles tentatives : translation_scheduler
+        response = get_translation_scheduler().run(
+            lambda: client.chat.completions.create(
+                model=TRANSLATION_MODEL,
+                messages=messages,
+                max_tokens=150,
+                temperature=0.3
+            ),
+            request_tokens(messages, 150),
+            requester
         )
         return response.choices[0].message.content.strip()
     except openai.AuthenticationError:
         logger.error("ERREUR: Erreur d'authentification OpenAI. Verifiez votre cle API.")
-        return f"[ERREUR: Clé API invalide]"
     except openai.RateLimitError:
-        logger.error("ERREUR: Limite de taux depassee. Attendez avant de reessayer.")
-        return f"[ERREUR: Limite de taux]"
+        logger.error("ERREUR: Limite de taux depassee malgre les nouvelles tentatives.")
     except Exception as e:
         logger.error(f"ERREUR: Erreur de traduction: {e}")
-        return f"[ERREUR DE TRADUCTION: {str(e)}]"
+    # Bulle laissée sans traduction plutôt qu'un message d'erreur dessiné dans la page
+    return ""
+
+def translate_texts(texts, source_lang="", requester=None):
+    """Traductions des textes d'une page : une requête groupée (OPENAI_CONFIG["batch_translation"]), sinon une par bulle"""
+    if TRANSLATION_BATCH:
+        return translate_page(texts, client, fallback=partial(translate, requester=requester),
+                              memory=get_translation_memory(), source_lang=source_lang, requester=requester)
+    return [translate(text, requester) for text in texts]
+
+def source_language(languages=None):
+    """Langue source des clés de la mémoire de traduction (jeu de langues OCR)"""
+    return "+".join(resolve_languages(languages))
+
+class OpenAIBackend:
+    """Moteur de traduction par défaut : API OpenAI"""
+
+    name = "openai"
+
+    def session(self, memory=None, source_lang="", requester=None):
+        """Session alimentée au fil de l'OCR (client asynchrone), sinon requêtes groupées en fin d'OCR"""
+        if TRANSLATION_ASYNC:
+            return async_translator.session(fallback=partial(translate, requester=requester), memory=memory,
+                                            source_lang=source_lang, requester=requester)
+        # translate_page consulte déjà la mémoire de traduction
+        return BatchSession(partial(translate_texts, source_lang=source_lang, requester=requester))
+
+TRANSLATION_BACKENDS = {
+    "openai": OpenAIBackend,
+    "local": LocalSeq2SeqBackend,
+    "stub": StubBackend,
+}
+_translation_backends = {}
+_translation_backends_lock = threading.Lock()
+
+def get_translation_backend(name=None):
+    """
+    Moteur de traduction par nom (OPENAI_CONFIG["backend"] par défaut), instancié au premier usage
+
+    Raises:
+        ValueError: moteur inconnu
+    """
+    name = (name or TRANSLATION_BACKEND).lower()
+    if name not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Moteur de traduction inconnu: {name} (attendu: {', '.join(sorted(TRANSLATION_BACKENDS))})")
+    with _translation_backends_lock:
+        if name not in _translation_backends:
+            _translation_backends[name] = TRANSLATION_BACKENDS[name]()
+        return _translation_backends[name]
+
+def start_translation(languages=None, requester=None):
+    """Session de traduction de la page (OPENAI_CONFIG["backend"]), alimentée par l'OCR au fil de l'eau"""
+    return get_translation_backend().session(memory=get_translation_memory(), source_lang=source_language(languages),
+                                             requester=requester)
+
+def on_ocr_texts(session, ids):
+    """Callback OCR : envoie les textes reconnus (positions -> ids) à la session"""
+    return lambda pairs: session.feed([(ids[k], clean_ocr(text)) for k, text in pairs])
+
+def finish_translation(session, items):
+    """Traductions de [(id, texte), ...], dans l'ordre des éléments"""
+    translations = session.finish()
+    return [translations.get(item_id, "") for item_id, _ in items]
 
 def clean_ocr(text):
     return text.replace("\n", " ").replace("  ", " ").strip()
 
-def extract_text_easyocr(image):
-    results = reader.readtext(image)
-    return " ".join([text for _, text, _ in results]).strip()
-
-def extract_and_translate(image, outputs):
-    masks = outputs["instances"].pred_masks.to("cpu").numpy()
+def extract_and_translate(image, outputs, languages=None, ocr_backend=None, requester=None):
+    # languages : langue source de l'OCR ("en", "ja", "ko", "zh"...), OCR_CONFIG["languages"] par défaut
+    # ocr_backend : moteur OCR imposé, sinon par classe de bulle / OCR_CONFIG["backend"]
+    # requester : demandeur de la page (file équitable de translation_scheduler)
+    masks = masks_of(outputs)
     classes = outputs["instances"].pred_classes.to("cpu").numpy()
     scores = outputs["instances"].scores.to("cpu").numpy()
 
-    results = []
+    # Sélection des bulles puis OCR de toute la page (une détection de lignes, textes dans l'ordre des bulles)
+    candidates = []
     for i, (mask, class_id, score) in enumerate(zip(masks, classes, scores)):
         if score < CONFIDENCE_THRESHOLD:
             continue
-
-        class_name = CLASS_NAMES.get(class_id, "unknown")
-        y_indices, x_indices = np.where(mask)
-        if len(x_indices) == 0 or len(y_indices) == 0:
+        if mask.is_empty:
             continue
-        x_min, x_max = np.min(x_indices), np.max(x_indices)
-        y_min, y_max = np.min(y_indices), np.max(y_indices)
+        # Boîte du masque compact, sans parcours de l'image
+        x_min, y_min, x_max, y_max = mask.bbox
+        candidates.append((i, CLASS_NAMES.get(class_id, "unknown"), score, (x_min, y_min, x_max, y_max)))
+    session = start_translation(languages, requester)
+    texts = read_bubbles(
+        image,
+        [bbox for _, _, _, bbox in candidates],
+        masks=[masks[i] for i, _, _, _ in candidates],
+        languages=languages,
+        backend=ocr_backend,
+        classes=[class_name for _, class_name, _, _ in candidates],
+        on_texts=on_ocr_texts(session, [i for i, _, _, _ in candidates])
+    )
 
-        roi = image[y_min:y_max, x_min:x_max]
-        ocr_text = extract_text_easyocr(roi)
+    # Bulles avec texte, puis traduction de toute la page
+    recognized = []
+    for candidate, ocr_text in zip(candidates, texts):
+        i, class_name, score, _ = candidate
         ocr_text = clean_ocr(ocr_text)
 
         logger.info(f"-> BULLE {i+1}: {class_name}, confidence={score:.2f}")
@@ -142,9 +244,11 @@ def extract_and_translate(image, outputs):
 
         if ocr_text.strip() == "":
             continue
+        recognized.append((candidate, ocr_text))
+    translations = finish_translation(session, [(candidate[0], ocr_text) for candidate, ocr_text in recognized])
 
-        translated_text = translate(ocr_text)
-
+    results = []
+    for ((i, class_name, score, (x_min, y_min, x_max, y_max)), ocr_text), translated_text in zip(recognized, translations):
         results.append({
             "index": len(results) + 1,
             "class": class_name,
@@ -158,7 +262,7 @@ def extract_and_translate(image, outputs):
         })
     return results
 
-def extract_and_translate_with_edited_bulles(image_path, edited_bulles):
+def extract_and_translate_with_edited_bulles(image_path, edited_bulles, languages=None, ocr_backend=None):
     """Extrait et traduit le texte des bulles modifiées"""
     import cv2
     import numpy as np
@@ -169,8 +273,8 @@ def extract_and_translate_with_edited_bulles(image_path, edited_bulles):
         logger.error(f"ERREUR: Impossible de charger l'image: {image_path}")
         return []
     
-    results = []
-    
+    # Préparer les régions masquées de toutes les bulles, puis un seul OCR groupé
+    prepared = []
     for i, bulle in enumerate(edited_bulles):
         try:
             # Extraire les points du polygone
@@ -192,9 +296,8 @@ def extract_and_translate_with_edited_bulles(image_path, edited_bulles):
             x_min, x_max = int(min(x_coords)), int(max(x_coords))
             y_min, y_max = int(min(y_coords)), int(max(y_coords))
             
-            # Créer un masque pour la région d'intérêt
-            mask = np.zeros(image.shape[:2], dtype=np.uint8)
-            cv2.fillPoly(mask, [coords], 255)
+            # Masque du polygone, rasterisé dans sa seule boîte englobante
+            mask = CompactMask.from_polygon(coords, *image.shape[:2])
             
             # Extraire la région d'intérêt
             roi = image[y_min:y_max, x_min:x_max]
@@ -202,26 +305,45 @@ def extract_and_translate_with_edited_bulles(image_path, edited_bulles):
                 logger.warning(f"⚠️ Bulle {i+1} a une région d'intérêt vide")
                 continue
             
-            # Appliquer le masque à la ROI
-            roi_mask = mask[y_min:y_max, x_min:x_max]
-            roi_masked = cv2.bitwise_and(roi, roi, mask=roi_mask)
-            
-            # Extraire le texte avec EasyOCR
-            ocr_text = extract_text_easyocr(roi_masked)
-            ocr_text = clean_ocr(ocr_text)
-            
-            confidence = bulle.get("confidence", 0.8)  # Valeur par défaut si pas de confidence
-            
-            logger.info(f"-> BULLE {i+1}: confidence={confidence:.2f}")
-            logger.info(f"   OCR : {ocr_text}")
-            
-            if ocr_text.strip() == "":
-                logger.info(f"   ⚠️ Aucun texte détecté dans la bulle {i+1}")
-                continue
-            
-            # Traduire le texte
-            translated_text = translate(ocr_text)
+            # Masque de la bulle dans la ROI (appliqué par la normalisation OCR, fond blanc)
+            roi_mask = mask.crop_to((y_min, y_min + roi.shape[0], x_min, x_min + roi.shape[1]))
             
+            prepared.append((i, bulle, (x_min, y_min, x_max, y_max), roi, roi_mask))
+        except Exception as e:
+            logger.error(f"ERREUR: Erreur lors du traitement de la bulle {i+1}: {e}")
+            continue
+    
+    # Extraire le texte de toutes les bulles avec EasyOCR (ordre des bulles conservé)
+    session = start_translation(languages)
+    texts = read_texts(
+        [roi for _, _, _, roi, _ in prepared],
+        languages=languages,
+        masks=[roi_mask for _, _, _, _, roi_mask in prepared],
+        backend=ocr_backend,
+        class_name="bubble",
+        on_texts=on_ocr_texts(session, [i for i, _, _, _, _ in prepared])
+    )
+    
+    # Bulles avec texte, puis traduction de toutes les bulles en une fois
+    recognized = []
+    for (i, bulle, box, _, _), ocr_text in zip(prepared, texts):
+        ocr_text = clean_ocr(ocr_text)
+        
+        confidence = bulle.get("confidence", 0.8)  # Valeur par défaut si pas de confidence
+        
+        logger.info(f"-> BULLE {i+1}: confidence={confidence:.2f}")
+        logger.info(f"   OCR : {ocr_text}")
+        
+        if ocr_text.strip() == "":
+            logger.info(f"   ⚠️ Aucun texte détecté dans la bulle {i+1}")
+            continue
+        recognized.append((i, confidence, box, ocr_text))
+    translations = finish_translation(session, [(i, ocr_text) for i, _, _, ocr_text in recognized])
+    
+    results = []
+    
+    for (i, confidence, (x_min, y_min, x_max, y_max), ocr_text), translated_text in zip(recognized, translations):
+        try:
             results.append({
                 "index": len(results) + 1,
                 "class": "bubble",
@@ -247,7 +369,7 @@ if __name__ == "__main__":
 
     image_path = sys.argv[1]
     image = cv2.imread(image_path)
-    outputs = predictor(image)
+    outputs = get_predictor()(image)
     print(f"✅ {len(outputs['instances'])} bulles détectées")
     results = extract_and_translate(image, outputs)
 
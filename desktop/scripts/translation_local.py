@@ -0,0 +1,108 @@
+"""
+Moteurs de traduction hors ligne
+
+- local : modèle seq2seq (MarianMT anglais -> français, ex. opus-mt-en-fr)
+  chargé depuis un dossier local (OPENAI_CONFIG["local_model_path"]), sans
+  réseau ni coût par token. Toutes les bulles d'une page sont traduites par
+  lots (OPENAI_CONFIG["local_batch_size"]), triées par longueur pour limiter
+  le remplissage, sur CPU.
+- stub : traduction déterministe ("[fr] texte"), sans modèle, pour les
+  tests et les benchmarks ; délai simulé optionnel par lot
+  (OPENAI_CONFIG["stub_delay_ms"]).
+
+Un moteur expose name, model (pour les clés de la mémoire de traduction),
+translate_batch(textes) -> traductions, et session(...) qui réunit les
+textes reconnus pendant l'OCR et les traduit en une fois (BatchSession).
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+
+try:
+    from scripts.translation import BatchSession
+except ImportError:
+    from translation import BatchSession
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import OPENAI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_MODEL_PATH = OPENAI_CONFIG["local_model_path"]          # dossier du modèle seq2seq
+TRANSLATION_LOCAL_BATCH_SIZE = OPENAI_CONFIG["local_batch_size"]    # bulles par génération
+TRANSLATION_LOCAL_MAX_LENGTH = OPENAI_CONFIG["local_max_length"]    # tokens, entrée et sortie
+TRANSLATION_LOCAL_BEAMS = OPENAI_CONFIG["local_num_beams"]          # 1 = décodage glouton
+TRANSLATION_STUB_DELAY_MS = OPENAI_CONFIG["stub_delay_ms"]
+
+
+class LocalSeq2SeqBackend:
+    """Traduction sur CPU par un modèle seq2seq local (transformers)"""
+
+    name = "local"
+
+    def __init__(self, model_path=TRANSLATION_MODEL_PATH, batch_size=TRANSLATION_LOCAL_BATCH_SIZE,
+                 max_length=TRANSLATION_LOCAL_MAX_LENGTH, num_beams=TRANSLATION_LOCAL_BEAMS):
+        try:
+            import torch
+            from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+        except ImportError:
+            raise ImportError(
+                "transformers et sentencepiece sont requis pour le moteur de traduction local "
+                "(pip install transformers sentencepiece)"
+            )
+        if not model_path or not os.path.isdir(model_path):
+            raise ValueError(f"Modele de traduction local introuvable: {model_path or '(local_model_path vide)'}")
+        self._torch = torch
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+        self.num_beams = max(1, num_beams)
+        self.model = f"{self.name}:{os.path.basename(os.path.normpath(model_path))}"
+        started = time.perf_counter()
+        self._tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        self._model = AutoModelForSeq2SeqLM.from_pretrained(model_path, local_files_only=True).to("cpu").eval()
+        self._lock = threading.Lock()  # un seul generate à la fois sur le modèle partagé
+        logger.info(f"Modele de traduction local charge ({model_path}) en {time.perf_counter() - started:.1f}s")
+
+    def translate_batch(self, texts):
+        """Traductions de textes, dans l'ordre ("" pour un texte vide)"""
+        translations = ["" for _ in texts]
+        order = sorted((i for i, text in enumerate(texts) if text.strip()), key=lambda i: len(texts[i]))
+        started = time.perf_counter()
+        with self._lock, self._torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                chunk = order[start:start + self.batch_size]
+                inputs = self._tokenizer(
+                    [texts[i] for i in chunk], return_tensors="pt", padding=True, truncation=True,
+                    max_length=self.max_length
+                )
+                outputs = self._model.generate(**inputs, max_new_tokens=self.max_length, num_beams=self.num_beams)
+                for i, text in zip(chunk, self._tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+                    translations[i] = text.strip()
+        logger.info(f"Traduction locale: {len(order)} bulle(s) en {time.perf_counter() - started:.2f}s")
+        return translations
+
+    def session(self, memory=None, source_lang="", requester=None):
+        return BatchSession(self.translate_batch, memory=memory, source_lang=source_lang, model=self.model)
+
+
+class StubBackend:
+    """Traduction déterministe sans réseau ni modèle (tests, benchmarks)"""
+
+    name = "stub"
+    model = "stub"
+
+    def __init__(self, delay_ms=TRANSLATION_STUB_DELAY_MS):
+        self.delay_ms = delay_ms
+
+    def translate_batch(self, texts):
+        if self.delay_ms > 0:
+            time.sleep(self.delay_ms / 1000)
+        return [f"[fr] {text.strip()}" if text.strip() else "" for text in texts]
+
+    def session(self, memory=None, source_lang="", requester=None):
+        # Jamais de mémoire de traduction : les traductions factices n'y ont pas leur place
+        return BatchSession(self.translate_batch)
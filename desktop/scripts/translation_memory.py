@@ -0,0 +1,264 @@
+"""
+Mémoire de traduction
+
+Les phrases récurrentes ("What?!", noms de personnages, onomatopées) et les
+pages retraitées repartaient vers OpenAI à chaque fois. Chaque traduction
+valide est mémorisée sous une clé calculée sur le texte source normalisé
+(Unicode NFKC, espaces, casse), la langue source, la langue cible et le
+modèle :
+
+- un LRU en mémoire (OPENAI_CONFIG["memory_lru_entries"]) garde les phrases
+  fréquentes sans accès disque ;
+- un fichier SQLite (OPENAI_CONFIG["memory_path"]) les conserve d'une
+  session à l'autre. Les entrées inutilisées depuis
+  OPENAI_CONFIG["memory_ttl_days"] jours expirent, et au-delà de
+  OPENAI_CONFIG["memory_max_entries"] les moins récemment utilisées sont
+  supprimées (nettoyage toutes les OPENAI_CONFIG["memory_cleanup_every"]
+  écritures).
+
+Les messages d'erreur et les traductions de secours ne sont jamais mémorisés.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+from collections import OrderedDict
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config import OPENAI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_MEMORY = OPENAI_CONFIG["memory_enabled"]
+TRANSLATION_MEMORY_PATH = OPENAI_CONFIG["memory_path"]
+TRANSLATION_MEMORY_LRU_ENTRIES = OPENAI_CONFIG["memory_lru_entries"]
+TRANSLATION_MEMORY_TTL_DAYS = OPENAI_CONFIG["memory_ttl_days"]        # 0 = pas d'expiration
+TRANSLATION_MEMORY_MAX_ENTRIES = OPENAI_CONFIG["memory_max_entries"]  # 0 = pas de plafond
+TRANSLATION_MEMORY_CLEANUP_EVERY = OPENAI_CONFIG["memory_cleanup_every"]
+
+
+def normalize_source(text):
+    """Texte source normalisé : Unicode NFKC, espaces réduits, sans casse"""
+    return " ".join(unicodedata.normalize("NFKC", text).split()).casefold()
+
+
+def memory_key(text, source_lang, target_lang, model):
+    """Clé d'une traduction (64 caractères hexadécimaux)"""
+    digest = hashlib.blake2b(digest_size=32)
+    for part in (normalize_source(text), source_lang, target_lang, model):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SQLiteStore:
+    """Fichier SQLite embarqué (créé au premier accès)"""
+
+    def __init__(self, path=TRANSLATION_MEMORY_PATH):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS translation_memory ("
+                "key TEXT PRIMARY KEY, source_text TEXT NOT NULL, source_lang TEXT NOT NULL, "
+                "target_lang TEXT NOT NULL, model TEXT NOT NULL, translated_text TEXT NOT NULL, "
+                "hits INTEGER DEFAULT 0, last_used REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_translation_memory_last_used ON translation_memory (last_used)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            connection = self._connect()
+            rows = connection.execute(
+                f"SELECT key, translated_text FROM translation_memory WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            if rows:
+                connection.execute(
+                    f"UPDATE translation_memory SET hits = hits + 1, last_used = ? "
+                    f"WHERE key IN ({','.join('?' * len(rows))})",
+                    [time.time()] + [key for key, _ in rows]
+                )
+                connection.commit()
+        return dict(rows)
+
+    def put_many(self, entries):
+        now = time.time()
+        rows = [
+            (entry["key"], entry["source_text"], entry["source_lang"], entry["target_lang"], entry["model"],
+             entry["translated_text"], now, now)
+            for entry in entries
+        ]
+        with self._lock:
+            connection = self._connect()
+            connection.executemany(
+                "INSERT INTO translation_memory "
+                "(key, source_text, source_lang, target_lang, model, translated_text, hits, last_used, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET translated_text = excluded.translated_text, "
+                "last_used = excluded.last_used",
+                rows
+            )
+            connection.commit()
+        return len(rows)
+
+    def evict(self, ttl_days, max_entries):
+        deleted = 0
+        with self._lock:
+            connection = self._connect()
+            if ttl_days > 0:
+                deleted += connection.execute(
+                    "DELETE FROM translation_memory WHERE last_used < ?", (time.time() - ttl_days * 86400,)
+                ).rowcount
+            if max_entries > 0:
+                deleted += connection.execute(
+                    "DELETE FROM translation_memory WHERE key IN ("
+                    "SELECT key FROM translation_memory ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (max_entries,)
+                ).rowcount
+            connection.commit()
+        return deleted
+
+
+class TranslationMemory:
+    """Mémoire de traduction : LRU en mémoire devant un stockage persistant"""
+
+    def __init__(self, store=None, lru_entries=TRANSLATION_MEMORY_LRU_ENTRIES, ttl_days=TRANSLATION_MEMORY_TTL_DAYS,
+                 max_entries=TRANSLATION_MEMORY_MAX_ENTRIES, cleanup_every=TRANSLATION_MEMORY_CLEANUP_EVERY,
+                 enabled=TRANSLATION_MEMORY):
+        self.enabled = enabled
+        self.store = store
+        self.lru_entries = max(1, lru_entries)
+        self.ttl_days = ttl_days
+        self.max_entries = max_entries
+        self.cleanup_every = max(1, cleanup_every)
+        self._lru = OrderedDict()  # clé -> traduction
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._stats = {"lru_hits": 0, "store_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "store_errors": 0}
+
+    def _insert(self, key, translation):
+        self._lru[key] = translation
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_entries:
+            self._lru.popitem(last=False)
+
+    def lookup(self, items, source_lang, target_lang, model):
+        """Traductions mémorisées de [(id, texte), ...] : {id: traduction}"""
+        if not self.enabled or not items:
+            return {}
+        keys = {item_id: memory_key(text, source_lang, target_lang, model) for item_id, text in items}
+        found, missing = {}, []
+        with self._lock:
+            for item_id, key in keys.items():
+                translation = self._lru.get(key)
+                if translation is None:
+                    missing.append(key)
+                else:
+                    self._lru.move_to_end(key)
+                    found[item_id] = translation
+                    self._stats["lru_hits"] += 1
+
+        stored = {}
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many(sorted(set(missing)))
+            except Exception as e:
+                logger.warning(f"Memoire de traduction indisponible: {e}")
+                with self._lock:
+                    self._stats["store_errors"] += 1
+
+        with self._lock:
+            for key, translation in stored.items():
+                self._insert(key, translation)
+            for item_id, key in keys.items():
+                if item_id in found:
+                    continue
+                if key in stored:
+                    found[item_id] = stored[key]
+                    self._stats["store_hits"] += 1
+                else:
+                    self._stats["misses"] += 1
+        return found
+
+    def remember(self, pairs, source_lang, target_lang, model):
+        """Mémorise [(texte source, traduction), ...]"""
+        if not self.enabled or not pairs:
+            return
+        entries = []
+        with self._lock:
+            for text, translation in pairs:
+                key = memory_key(text, source_lang, target_lang, model)
+                self._insert(key, translation)
+                entries.append({
+                    "key": key,
+                    "source_text": normalize_source(text),
+                    "source_lang": source_lang,
+                    "target_lang": target_lang,
+                    "model": model,
+                    "translated_text": translation,
+                })
+            self._stats["writes"] += len(entries)
+            self._writes += len(entries)
+            cleanup = self._writes >= self.cleanup_every
+            if cleanup:
+                self._writes = 0
+        if self.store is None:
+            return
+        try:
+            self.store.put_many(entries)
+            if cleanup:
+                self.cleanup()
+        except Exception as e:
+            logger.warning(f"Impossible d'enregistrer dans la memoire de traduction: {e}")
+            with self._lock:
+                self._stats["store_errors"] += 1
+
+    def cleanup(self):
+        """Expiration et plafond d'entrées du stockage persistant"""
+        if self.store is None:
+            return 0
+        deleted = self.store.evict(self.ttl_days, self.max_entries)
+        with self._lock:
+            self._stats["evictions"] += deleted
+        if deleted:
+            logger.info(f"Memoire de traduction: {deleted} entree(s) supprimee(s)")
+        return deleted
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["lru_entries"] = len(self._lru)
+        hits = stats["lru_hits"] + stats["store_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / total, 3) if total else 0
+        stats["enabled"] = self.enabled
+        stats["max_lru_entries"] = self.lru_entries
+        stats["ttl_days"] = self.ttl_days
+        stats["max_entries"] = self.max_entries
+        return stats
+
+
+_memory = TranslationMemory(SQLiteStore())
+
+
+def get_translation_memory():
+    """Mémoire de traduction partagée par le processus"""
+    return _memory
@@ -706,4 +706,62 @@ def get_user_subscription_by_stripe_id(db: Session, stripe_subscription_id: str)
     """Récupère un abonnement utilisateur par son ID Stripe"""
     return db.query(models.UsersSubscription).filter(
         models.UsersSubscription.stripe_subscription_id == stripe_subscription_id
-    ).first() 
\ No newline at end of file
+    ).first()
+
+
+# === FONCTIONS POUR LA MÉMOIRE DE TRADUCTION ===
+
+def get_translation_memory_entries(db: Session, keys: list):
+    """Traductions mémorisées {clé: traduction} ; met à jour leur dernière utilisation"""
+    if not keys:
+        return {}
+    entries = db.query(models.TranslationMemory).filter(models.TranslationMemory.key.in_(keys)).all()
+    now = datetime.utcnow()
+    for entry in entries:
+        entry.hits = (entry.hits or 0) + 1
+        entry.last_used = now
+    db.commit()
+    return {entry.key: entry.translated_text for entry in entries}
+
+def save_translation_memory_entries(db: Session, entries: list):
+    """Enregistre ou met à jour des traductions (dicts key, source_text, source_lang, target_lang, model, translated_text)"""
+    if not entries:
+        return 0
+    entries = {entry["key"]: entry for entry in entries}
+    existing = {
+        record.key: record
+        for record in db.query(models.TranslationMemory).filter(models.TranslationMemory.key.in_(list(entries))).all()
+    }
+    now = datetime.utcnow()
+    for key, entry in entries.items():
+        record = existing.get(key)
+        if record is None:
+            db.add(models.TranslationMemory(**entry, hits=0, last_used=now))
+        else:
+            record.translated_text = entry["translated_text"]
+            record.last_used = now
+    db.commit()
+    return len(entries)
+
+def count_translation_memory_entries(db: Session):
+    return db.query(func.count(models.TranslationMemory.id)).scalar() or 0
+
+def cleanup_translation_memory(db: Session, ttl_days: float = 90, max_entries: int = 100000):
+    """Supprime les traductions inutilisées depuis ttl_days, puis les moins récemment utilisées au-delà de max_entries"""
+    deleted = 0
+    if ttl_days > 0:
+        cutoff_date = datetime.utcnow() - timedelta(days=ttl_days)
+        deleted += db.query(models.TranslationMemory).filter(
+            models.TranslationMemory.last_used < cutoff_date
+        ).delete(synchronize_session=False)
+    if max_entries > 0:
+        excess = count_translation_memory_entries(db) - max_entries
+        if excess > 0:
+            oldest = [row.id for row in db.query(models.TranslationMemory.id).order_by(
+                models.TranslationMemory.last_used.asc()
+            ).limit(excess).all()]
+            deleted += db.query(models.TranslationMemory).filter(
+                models.TranslationMemory.id.in_(oldest)
+            ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
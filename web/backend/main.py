@@ -8,6 +8,8 @@ from fastapi.responses import JSONResponse
 
 from fastapi.middleware.cors import CORSMiddleware
 
+from fastapi.concurrency import run_in_threadpool
+
 from sqlalchemy.orm import Session
 
 from datetime import datetime, timedelta
@@ -21,12 +23,38 @@ import os
 
 
 
-from processing.pipeline import process_image_pipeline_with_bubbles
+from processing.pipeline import process_image_pipeline_with_bubbles, finish_pipeline_with_bubbles
 
 from processing.reinsert_translations import draw_translated_text
 
 from processing.bubble_editor import get_bubble_polygons, process_with_custom_polygons
 
+from processing.model_registry import get_memory_stats, is_loaded
+
+from processing.inference_queue import get_scheduler
+
+from processing.detection_cache import get_detection_cache
+
+from processing.ocr_cache import get_ocr_cache
+
+from processing.ocr_executor import get_ocr_executor
+
+from processing.thread_budget import apply_thread_budget, get_thread_settings
+
+from processing.lifecycle import get_lifecycle, WARMUP_RETRY_AFTER
+
+from processing.ocr_readers import resolve_languages
+
+from processing.ocr import get_backend
+
+from processing.translate_bubbles import async_translator
+
+from processing.translation_memory import get_translation_memory
+
+from processing.translation_scheduler import get_translation_scheduler
+
+from processing.translation import TRANSLATION_BACKEND
+
 
 
 # Import des modules de base de données
@@ -67,10 +95,70 @@ models.Base.metadata.create_all(bind=engine)
 
 
 
+# Répartir les cœurs CPU entre torch, OpenCV et EasyOCR avant tout chargement de modèle
+
+apply_thread_budget()
+
+
+
 app = FastAPI(title="Bubble Cleaner API", version="1.0.0")
 
 
 
+@app.on_event("startup")
+async def start_model_warmup():
+    """Charge et préchauffe les modèles en arrière-plan dès le démarrage"""
+    get_lifecycle().start()
+
+
+
+@app.on_event("shutdown")
+async def stop_ocr_executor():
+    """Arrête les processus OCR (s'ils ont été lancés) et la boucle de traduction asynchrone"""
+    executor = get_ocr_executor()
+    if executor is not None:
+        executor.shutdown()
+    async_translator.close()
+
+
+
+def require_models_ready():
+    """Dépendance des routes de traitement : 503 immédiat tant que les modèles ne sont pas prêts"""
+    lifecycle = get_lifecycle()
+    if not lifecycle.is_ready():
+        status_info = lifecycle.status()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Modèles en cours de préparation ({status_info['state']}), réessayez dans quelques secondes",
+            # Après un échec, délai jusqu'à la prochaine tentative de chargement
+
+            headers={"Retry-After": str(max(1, round(status_info["next_retry_s"] or WARMUP_RETRY_AFTER)))},
+        )
+
+
+
+def check_source_lang(source_lang):
+    """Valide la langue source demandée pour l'OCR (400 si non prise en charge)"""
+    try:
+        resolve_languages(source_lang)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return source_lang
+
+
+
+def check_ocr_backend(ocr_backend):
+    """Valide le moteur OCR demandé (400 si inconnu ou indisponible sur ce serveur)"""
+    if ocr_backend is None:
+        return None
+    try:
+        get_backend(ocr_backend)
+    except (ValueError, ImportError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ocr_backend
+
+
+
 # Autoriser le frontend local (à adapter en prod)
 
 
@@ -305,12 +393,18 @@ async def get_user_quotas(current_user: schemas.User = Depends(get_current_activ
 
 @app.post("/process")
 async def process_image(
+    _models_ready: None = Depends(require_models_ready),
     file: UploadFile = File(...),
+    source_lang: str = Form(None),
+    ocr_backend: str = Form(None),
     current_user: schemas.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Traiter une image avec authentification et vérification des quotas"""
     start_time = time.time()
+    # Langue source et moteur de l'OCR (configuration par défaut), validés avant de consommer un quota
+    check_source_lang(source_lang)
+    check_ocr_backend(ocr_backend)
     # Vérifier si l'utilisateur est un superutilisateur
     if current_user.is_superuser:
         # Pour les superusers, on crée un statut spécial
@@ -329,7 +423,10 @@ async def process_image(
     print(f"📊 Image lue: {len(image_bytes)} bytes")
     
     try:
-        result_bytes, bubbles, cleaned_base64 = process_image_pipeline_with_bubbles(image_bytes)
+        # Hors de la boucle d'événements : les détections concurrentes peuvent être regroupées
+        result_bytes, bubbles, cleaned_base64 = await run_in_threadpool(
+            process_image_pipeline_with_bubbles, image_bytes, source_lang, ocr_backend, current_user.id
+        )
         print(f"✅ Traitement terminé: {len(result_bytes)} bytes, {len(bubbles)} bulles détectées")
         
         image_base64 = base64.b64encode(result_bytes).decode('utf-8')
@@ -356,6 +453,8 @@ async def process_image(
 
 async def get_bubbles_for_editing(
 
+    _models_ready: None = Depends(require_models_ready),
+
     file: UploadFile = File(...),
 
     current_user: schemas.User = Depends(get_current_active_user)
@@ -378,7 +477,7 @@ async def get_bubbles_for_editing(
 
     try:
 
-        polygons = get_bubble_polygons(image)
+        polygons = await run_in_threadpool(get_bubble_polygons, image)
 
         return JSONResponse(content={"polygons": polygons})
 
@@ -392,10 +491,16 @@ async def get_bubbles_for_editing(
 
 async def retreat_with_custom_polygons(
 
+    _models_ready: None = Depends(require_models_ready),
+
     file: UploadFile = File(...),
 
     polygons: str = Form(...),
 
+    source_lang: str = Form(None),
+
+    ocr_backend: str = Form(None),
+
     current_user: schemas.User = Depends(get_current_active_user),
 
     db: Session = Depends(get_db)
@@ -406,6 +511,10 @@ async def retreat_with_custom_polygons(
 
     start_time = time.time()
 
+    check_source_lang(source_lang)
+
+    check_ocr_backend(ocr_backend)
+
     
 
     # Vérifier les quotas sans incrémentation (retraitement)
@@ -466,51 +575,19 @@ async def retreat_with_custom_polygons(
 
         from processing.bubble_editor import create_mock_outputs
 
-        mock_outputs = create_mock_outputs(image, polygons_list)
+        mock_outputs = await run_in_threadpool(create_mock_outputs, image, polygons_list)
 
         
 
-        # Extraire et traduire le texte depuis l'image originale
+        # OCR, traduction, nettoyage, réinsertion et encodage hors de la boucle d'événements
 
-        from processing.translate_bubbles import extract_and_translate
+        final_bytes, translations, cleaned_base64 = await run_in_threadpool(
 
-        translations = extract_and_translate(image, mock_outputs)
-
-        
+            finish_pipeline_with_bubbles, image, mock_outputs, source_lang, ocr_backend, current_user.id
 
-        # Nettoyer l'image avec les polygones personnalisés
-
-        from processing.clean_bubbles import clean_bubbles
-
-        cleaned_image = clean_bubbles(image, mock_outputs)
-
-        
-
-        # Convertir l'image nettoyée en base64 (sans texte)
-
-        _, cleaned_buffer = cv2.imencode('.png', cleaned_image)
-
-        cleaned_base64 = base64.b64encode(cleaned_buffer.tobytes()).decode('utf-8')
-
-        
-
-        # Réinsérer le texte traduit
-
-        if translations:
-
-            final_image = draw_translated_text(cleaned_image, translations)
-
-        else:
-
-            final_image = cleaned_image
-
-        
-
-        # Convertir l'image finale en base64 (avec texte)
-
-        _, final_buffer = cv2.imencode('.png', final_image)
+        )
 
-        final_base64 = base64.b64encode(final_buffer.tobytes()).decode('utf-8')
+        final_base64 = base64.b64encode(final_bytes).decode('utf-8')
 
         
 
@@ -615,11 +692,40 @@ async def health_check():
     return {
         "status": "healthy", 
         "message": "Bubble Cleaner API is running",
-        "detectron2": detectron_status
+        "detectron2": detectron_status,
+        "models_loaded": is_loaded(),
+        "memory": get_memory_stats(),
+        "detection_queue": get_scheduler().get_stats(),
+        "detection_cache": get_detection_cache().get_stats(),
+        "ocr_cache": get_ocr_cache().get_stats(),
+        "ocr_executor": get_ocr_executor().get_stats() if get_ocr_executor() else None,
+        "translation_memory": get_translation_memory().get_stats(),
+        "translation_scheduler": get_translation_scheduler().get_stats(),
+        "translation_backend": TRANSLATION_BACKEND,
+        "threads": get_thread_settings(),
+        "lifecycle": get_lifecycle().status()
     }
 
 
 
+@app.get("/health/live")
+async def liveness_check():
+    """Sonde de vivacité : le processus répond, sans dépendre des modèles"""
+    return {"status": "alive"}
+
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Sonde de préparation : 200 une fois les modèles chargés et préchauffés, 503 sinon"""
+    lifecycle_status = get_lifecycle().status()
+    return JSONResponse(
+        content=lifecycle_status,
+        status_code=200 if lifecycle_status["ready"] else 503
+    )
+
+
+
 # ==================== ROUTES DE GESTION DES UTILISATEURS ====================
 
 
@@ -0,0 +1,47 @@
+"""Add translation memory table
+
+Revision ID: a3c9e1f27b40
+Revises: 6f4628a559ea
+Create Date: 2026-10-18 10:12:41.502317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e1f27b40'
+down_revision: Union[str, Sequence[str], None] = '6f4628a559ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Créer la table translation_memory
+    op.create_table('translation_memory',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('source_text', sa.Text(), nullable=False),
+        sa.Column('source_lang', sa.String(length=32), nullable=False),
+        sa.Column('target_lang', sa.String(length=16), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('translated_text', sa.Text(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=True),
+        sa.Column('last_used', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_translation_memory_id'), 'translation_memory', ['id'], unique=False)
+    op.create_index(op.f('ix_translation_memory_key'), 'translation_memory', ['key'], unique=True)
+    op.create_index(op.f('ix_translation_memory_last_used'), 'translation_memory', ['last_used'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_translation_memory_last_used'), table_name='translation_memory')
+    op.drop_index(op.f('ix_translation_memory_key'), table_name='translation_memory')
+    op.drop_index(op.f('ix_translation_memory_id'), table_name='translation_memory')
+    op.drop_table('translation_memory')
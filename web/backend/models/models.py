@@ -173,4 +173,19 @@ class AbuseTracking(Base):
     __table_args__ = (
         Index('ix_abuse_tracking_ip_device', 'ip_address', 'device_fingerprint'),
         Index('ix_abuse_tracking_ip_domain', 'ip_address', 'email_domain'),
-    )
\ No newline at end of file
+    )
+
+
+class TranslationMemory(Base):
+    __tablename__ = "translation_memory"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), unique=True, index=True, nullable=False)  # Empreinte texte normalisé + langues + modèle
+    source_text = Column(Text, nullable=False)  # Texte source normalisé
+    source_lang = Column(String(32), nullable=False)
+    target_lang = Column(String(16), nullable=False)
+    model = Column(String, nullable=False)
+    translated_text = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    last_used = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,8 +1,12 @@
 import cv2
 import numpy as np
 import logging
-from .clean_bubbles import predictor
+from .clean_bubbles import load_predictor
+from .inference_queue import detect_page_queued
+from .detection_cache import detect_cached
+from .pipeline import prepare_page, page_to_original
 from .translate_bubbles import extract_and_translate
+from .masks import CompactMask, CompactMasks, masks_of
 import torch
 
 logger = logging.getLogger(__name__)
@@ -38,12 +42,16 @@ def simplify_polygon(points, target_points=8):
     
     return simplified
 
-def mask_to_polygon(mask):
+def mask_to_polygon(mask, origin=(0, 0)):
     """
-    Convertit un masque binaire en polygone simplifié
+    Convertit un masque binaire en polygone simplifié. Pour un masque local à
+    sa boîte, origin (x0, y0) ramène les points dans le repère de l'image.
     """
+    # Bordure d'un pixel : un masque recadré touche les bords du tableau
+    padded = cv2.copyMakeBorder(mask.astype(np.uint8), 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
     # Trouver les contours du masque
-    contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv2.findContours(padded, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                   offset=(origin[0] - 1, origin[1] - 1))
     
     if not contours:
         return None
@@ -63,12 +71,26 @@ def mask_to_polygon(mask):
 
 def get_bubble_polygons(image):
     """
-    Extrait les masques de bulles et les convertit en polygones simplifiés
+    Extrait les masques de bulles et les convertit en polygones simplifiés,
+    dans le repère de l'image d'origine
+
+    Une page qui tient dans le format fixe (800x1200) est préparée comme pour
+    /process : même clé de cache, la détection de /process est réutilisée.
+    Une page plus grande est détectée à sa résolution d'origine, sous sa
+    propre clé, pour ne pas perdre en précision sur les polygones.
     """
     try:
-        # Détecter les bulles avec le modèle
-        outputs = predictor(image)
-        masks = outputs["instances"].pred_masks.to("cpu").numpy()
+        # Détecter les bulles avec le modèle partagé (cache par contenu, puis micro-batching,
+        # par tuiles pour les longues bandes)
+        load_predictor()
+        height, width = image.shape[:2]
+        if width > 800 or height > 1200:
+            outputs = detect_cached(image, detect_page_queued)
+            to_original = lambda x, y: (x, y)
+        else:
+            outputs = detect_cached(prepare_page(image), detect_page_queued)
+            to_original = page_to_original(image)
+        masks = masks_of(outputs["instances"])
         classes = outputs["instances"].pred_classes.to("cpu").numpy()
         scores = outputs["instances"].scores.to("cpu").numpy()
         
@@ -77,29 +99,30 @@ def get_bubble_polygons(image):
         for i, (mask, class_id, score) in enumerate(zip(masks, classes, scores)):
             if score < 0.5:  # Seuil de confiance
                 continue
+            if mask.is_empty:
+                continue
             
-            # Convertir le masque en polygone
-            polygon = mask_to_polygon(mask)
+            # Convertir le masque local en polygone dans le repère de l'image
+            polygon = mask_to_polygon(mask.mask, (mask.x0, mask.y0))
             
             if polygon is not None:
-                # Calculer les coordonnées de la bounding box
-                y_indices, x_indices = np.where(mask)
-                if len(x_indices) > 0 and len(y_indices) > 0:
-                    x_min, x_max = int(np.min(x_indices)), int(np.max(x_indices))
-                    y_min, y_max = int(np.min(y_indices)), int(np.max(y_indices))
-                    
-                    polygons.append({
-                        "id": i,
-                        "class": int(class_id),
-                        "confidence": float(score),
-                        "polygon": polygon,
-                        "bbox": {
-                            "x_min": x_min,
-                            "x_max": x_max,
-                            "y_min": y_min,
-                            "y_max": y_max
-                        }
-                    })
+                polygon = [list(to_original(x, y)) for x, y in polygon]
+                # La bounding box est celle du masque compact
+                x_min, y_min = to_original(*mask.bbox[:2])
+                x_max, y_max = to_original(*mask.bbox[2:])
+                
+                polygons.append({
+                    "id": i,
+                    "class": int(class_id),
+                    "confidence": float(score),
+                    "polygon": polygon,
+                    "bbox": {
+                        "x_min": x_min,
+                        "x_max": x_max,
+                        "y_min": y_min,
+                        "y_max": y_max
+                    }
+                })
         
         logger.info(f"Extrait {len(polygons)} polygones de bulles")
         return polygons
@@ -119,14 +142,8 @@ def create_mock_outputs(image, custom_polygons):
     scores = []
     
     for polygon_data in custom_polygons:
-        # Créer un masque vide
-        mask = np.zeros((height, width), dtype=np.uint8)
-        
-        # Dessiner le polygone sur le masque
-        polygon = np.array(polygon_data["polygon"], dtype=np.int32)
-        cv2.fillPoly(mask, [polygon], 255)
-        
-        masks.append(mask.astype(bool))
+        # Rasteriser le polygone dans sa seule boîte englobante
+        masks.append(CompactMask.from_polygon(polygon_data["polygon"], height, width))
         # Forcer le type "bubble" pour garantir un effacement total lors du retraitement
         classes.append(0)
         scores.append(1.0)
@@ -134,13 +151,13 @@ def create_mock_outputs(image, custom_polygons):
     # Créer un objet outputs simulé compatible avec Detectron2
     class MockInstances:
         def __init__(self, masks, classes, scores):
-            # Convertir en numpy arrays optimisés puis en tenseurs
-            masks_np = np.array(masks, dtype=bool)
-            classes_np = np.array(classes, dtype=np.int64)
-            scores_np = np.array(scores, dtype=np.float32)
-            self.pred_masks = torch.from_numpy(masks_np)
-            self.pred_classes = torch.from_numpy(classes_np)
-            self.scores = torch.from_numpy(scores_np)
+            # Masques compacts, comme les sorties du détecteur
+            self.compact_masks = CompactMasks(masks, (height, width))
+            self.pred_classes = torch.from_numpy(np.array(classes, dtype=np.int64))
+            self.scores = torch.from_numpy(np.array(scores, dtype=np.float32))
+
+        def __len__(self):
+            return len(self.compact_masks)
     
     class MockOutputs:
         def __init__(self, masks, classes, scores):
@@ -151,7 +168,7 @@ def create_mock_outputs(image, custom_polygons):
     
     return MockOutputs(masks, classes, scores)
 
-def process_with_custom_polygons(image, custom_polygons):
+def process_with_custom_polygons(image, custom_polygons, languages=None, ocr_backend=None, requester=None):
     """
     Traite une image avec des polygones de bulles personnalisés
     au lieu de la détection automatique
@@ -161,7 +178,7 @@ def process_with_custom_polygons(image, custom_polygons):
         outputs = create_mock_outputs(image, custom_polygons)
         
         # Utiliser la fonction existante pour extraire et traduire
-        translations = extract_and_translate(image, outputs)
+        translations = extract_and_translate(image, outputs, languages, ocr_backend, requester)
         
         return translations
         
@@ -1,11 +1,9 @@
 import os
 import cv2
-import torch
 import numpy as np
 import logging
-from detectron2.config import get_cfg
-from detectron2.engine import DefaultPredictor
-from detectron2 import model_zoo
+from .masks import CompactMask, masks_of
+from .model_registry import get_predictor
 
 # Configuration du logging
 logger = logging.getLogger(__name__)
@@ -14,111 +12,22 @@ logger = logging.getLogger(__name__)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 
-print(f"🔧 SCRIPT_DIR: {SCRIPT_DIR}")
-print(f"🔧 PROJECT_DIR: {PROJECT_DIR}")
+_smoke_tested = False
 
-cfg = get_cfg()
-cfg.merge_from_file(model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"))
-
-# Télécharger le modèle depuis Hugging Face si nécessaire
-def get_model_path():
-    """Obtenir le chemin du modèle, le télécharger depuis Hugging Face si nécessaire"""
-    model_path = os.path.join(PROJECT_DIR, "models_ai", "model_final.pth")
-    
-    if os.path.exists(model_path):
-        print(f"✅ Modèle local trouvé: {model_path}")
-        return model_path
-    
-    print("🔧 Modèle local non trouvé, téléchargement depuis Hugging Face...")
+def load_predictor():
+    """Récupérer le predictor Detectron2 partagé (chargé une seule fois par processus)"""
+    global _smoke_tested
     try:
-        from huggingface_hub import hf_hub_download
-        import time
-        
-        # Retry avec timeout
-        for attempt in range(3):
-            try:
-                print(f"🔧 Tentative {attempt + 1}/3...")
-                model_path = hf_hub_download(
-                    repo_id="HaashS/modelev1",
-                    filename="model_final.pth",
-                    local_dir=os.path.join(PROJECT_DIR, "models_ai"),
-                    local_files_only=False,
-                    resume_download=True
-                )
-                print(f"✅ Modèle téléchargé depuis Hugging Face: {model_path}")
-                return model_path
-            except Exception as e:
-                print(f"⚠️  Tentative {attempt + 1} échouée: {e}")
-                if attempt < 2:
-                    print("🔄 Nouvelle tentative dans 5 secondes...")
-                    time.sleep(5)
-                else:
-                    raise e
-    except Exception as e:
-        print(f"❌ Erreur téléchargement Hugging Face après 3 tentatives: {e}")
-        raise Exception(f"Impossible de télécharger le modèle depuis Hugging Face: {e}")
-
-# Obtenir le chemin du modèle
-model_path = get_model_path()
-print(f"🔧 Chemin du modèle: {model_path}")
-
-# Vérifier la taille du fichier
-file_size = os.path.getsize(model_path)
-print(f"🔧 Taille du fichier: {file_size} bytes")
-
-# Vérifier si le fichier est valide
-try:
-    import torch
-    test_model = torch.load(model_path, map_location='cpu', weights_only=False)
-    print(f"✅ Modèle valide (taille: {file_size} bytes)")
-    cfg.MODEL.WEIGHTS = model_path
-    logger.info(f"Chargement du modèle personnalisé: {model_path}")
-except Exception as e:
-    logger.error(f"Erreur lors de la validation du modèle personnalisé: {e}")
-    print(f"❌ Erreur validation modèle personnalisé: {e}")
-    raise Exception(f"Impossible de charger le modèle personnalisé: {e}")
-
-cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5
-cfg.MODEL.ROI_HEADS.NUM_CLASSES = 3  # bubble, floating_text, narration_box
-cfg.MODEL.DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+        predictor = get_predictor()
 
-print(f"🔧 Device utilisé: {cfg.MODEL.DEVICE}")
-print(f"🔧 CUDA disponible: {torch.cuda.is_available()}")
+        if not _smoke_tested:
+            # Test rapide du modèle, une seule fois après le chargement
+            print("🔧 Test du modèle avec une image factice...")
+            test_image = np.zeros((100, 100, 3), dtype=np.uint8)
+            test_output = predictor(test_image)
+            print(f"✅ Test du modèle réussi: {len(test_output['instances'])} détections")
+            _smoke_tested = True
 
-# Chargement paresseux du modèle
-predictor = None
-
-def load_predictor():
-    """Charger le modèle Detectron2 de manière paresseuse"""
-    global predictor
-    if predictor is not None:
-        print("✅ Modèle déjà chargé, réutilisation")
-        return predictor
-    
-    try:
-        print("🔧 Tentative de chargement du modèle Detectron2...")
-        print(f"🔧 Configuration: {cfg.MODEL.WEIGHTS}")
-        print(f"🔧 Device: {cfg.MODEL.DEVICE}")
-        print(f"🔧 Classes: {cfg.MODEL.ROI_HEADS.NUM_CLASSES}")
-        
-        # Vérifier la mémoire disponible
-        import psutil
-        memory = psutil.virtual_memory()
-        print(f"🔧 Mémoire disponible: {memory.available / 1024**3:.1f} GB")
-        print(f"🔧 Mémoire utilisée: {memory.percent}%")
-        
-        predictor = DefaultPredictor(cfg)
-        logger.info("Modèle Detectron2 chargé avec succès")
-        print("✅ Modèle Detectron2 chargé avec succès")
-        print(f"🔧 Type du predictor: {type(predictor)}")
-        
-        # Test rapide du modèle
-        print("🔧 Test du modèle avec une image factice...")
-        import numpy as np
-        test_image = np.zeros((100, 100, 3), dtype=np.uint8)
-        test_output = predictor(test_image)
-        print(f"✅ Test du modèle réussi: {len(test_output['instances'])} détections")
-        
         return predictor
     except Exception as e:
         logger.error(f"Erreur lors du chargement du modèle: {e}")
@@ -136,6 +45,9 @@ CLASS_NAMES = {
     2: "narration_box"
 }
 
+# Marge autour d'un masque couvrant l'érosion (3x3) et le flou du bord (5x5)
+CLEAN_MARGIN = 4
+
 def clean_bubbles(image, outputs):
     """
     Nettoie les bulles de texte détectées dans l'image
@@ -167,15 +79,9 @@ def clean_bubbles(image, outputs):
             instances = outputs.instances
         
         if instances is not None:
-            # Calculer le nombre d'instances de manière robuste (compat MockInstances)
-            try:
-                num_instances = len(instances)
-            except TypeError:
-                # Fallback si l'objet n'implémente pas __len__ (MockInstances)
-                if hasattr(instances, "pred_masks") and hasattr(instances.pred_masks, "shape"):
-                    num_instances = int(instances.pred_masks.shape[0])
-                else:
-                    num_instances = 0
+            # Masques compacts (détection, cache ou MockInstances) : boîte en O(1)
+            masks = masks_of(instances)
+            num_instances = len(masks)
 
             if num_instances == 0:
                 print("ℹ️  Aucune bulle détectée dans l'image")
@@ -184,8 +90,8 @@ def clean_bubbles(image, outputs):
             print(f"🔍 Traitement de {num_instances} bulles détectées")
             
             for i in range(num_instances):
-                # Récupérer le masque de l'instance
-                mask = instances.pred_masks[i].cpu().numpy().astype(np.uint8)
+                # Récupérer le masque compact de l'instance
+                compact = masks[i]
                 # Classe si disponible (0: bubble, 1: floating_text, 2: narration_box)
                 class_id = None
                 if hasattr(instances, "pred_classes"):
@@ -196,32 +102,39 @@ def clean_bubbles(image, outputs):
                 else:
                     class_id = 0
                 
-                # Redimensionner le masque à la taille de l'image si nécessaire
-                if mask.shape != (height, width):
-                    mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+                # Remettre le masque à l'échelle de l'image si nécessaire
+                if masks.image_size != (height, width):
+                    full = compact.to_full(*masks.image_size).astype(np.uint8)
+                    compact = CompactMask.from_full(cv2.resize(full, (width, height), interpolation=cv2.INTER_NEAREST))
+                if compact.is_empty:
+                    continue
+
+                # Tous les traitements se font dans la boîte du masque (plus une marge)
+                y0, y1, x0, x1 = compact.region(CLEAN_MARGIN, (height, width))
+                mask = compact.crop_to((y0, y1, x0, x1)).astype(np.uint8)
+                window = result[y0:y1, x0:x1]
                 
                 # Si c'est une bulle/boîte de narration → remplissage blanc OPAQUE (avec bord doux)
                 if class_id in (0, 2):
-                    mask255 = (mask > 0).astype(np.uint8) * 255
+                    mask255 = mask * 255
                     # Créer une zone intérieure érodée pour garantir un blanc 100% sans fuite de pixels
                     kernel = np.ones((3, 3), np.uint8)
                     eroded = cv2.erode(mask255, kernel, iterations=1)
                     # Bord = masque - intérieur
                     border = cv2.subtract(mask255, eroded)
                     # Remplir en blanc l'intérieur (opaque)
-                    result[eroded > 0] = FILL_COLOR
+                    window[eroded > 0] = FILL_COLOR
                     # Appliquer un léger feather uniquement sur le bord pour éviter une coupure nette
                     if np.any(border):
                         soft = cv2.GaussianBlur(border, (5, 5), 0)
                         soft = soft.astype(np.float32) / 255.0
-                        white = np.full_like(result, FILL_COLOR, dtype=np.uint8)
                         for c in range(3):
-                            result[:, :, c] = (
-                                soft * white[:, :, c] + (1.0 - soft) * result[:, :, c]
+                            window[:, :, c] = (
+                                soft * FILL_COLOR[c] + (1.0 - soft) * window[:, :, c]
                             ).astype(np.uint8)
                 else:
                     # Texte flottant → inpainting local
-                    inpaint_mask = cv2.bitwise_or(inpaint_mask, mask)
+                    inpaint_mask[y0:y1, x0:x1] |= mask
         
         # Appliquer l'inpainting si des bulles ont été détectées
         if np.any(inpaint_mask):
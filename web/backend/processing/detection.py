@@ -0,0 +1,117 @@
+"""
+Détection Detectron2 par lots
+
+DefaultPredictor.__call__ ne traite qu'une image à la fois. Ici, les pages
+sont prétraitées comme le ferait DefaultPredictor, puis passées ensemble au
+modèle : GeneralizedRCNN les regroupe dans un seul tenseur paddé (ImageList)
+et n'effectue qu'une passe avant par lot.
+
+En mode DETECTION_MODE=native, la page n'est plus redimensionnée/paddée en
+800x1200 : la détection tourne à une résolution de travail réduite
+(DETECTION_SIZE, plus petit côté) et le modèle recolle boîtes et masques à la
+résolution d'origine, sur laquelle se font nettoyage, OCR et rendu.
+
+Le post-traitement de Detectron2 est remplacé par postprocess_compact (voir
+mask_postprocess.py) : filtrage par score/classe, puis masques collés dans
+leur seule boîte. Les sorties portent instances.compact_masks (masks.py) au
+lieu de masques pleine image.
+"""
+
+import os
+import logging
+
+import cv2
+import torch
+
+from .clean_bubbles import load_predictor
+from .mask_postprocess import postprocess_compact
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de pages par passe avant (borne la mémoire du tenseur paddé)
+DETECTION_BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "4"))
+
+# "fixed" : page redimensionnée/paddée en 800x1200 (historique)
+# "native" : page conservée, détection à DETECTION_SIZE puis remise à l'échelle
+DETECTION_MODE = os.getenv("DETECTION_MODE", "fixed").lower()
+DETECTION_SIZE = int(os.getenv("DETECTION_SIZE", "800"))
+
+
+def default_detection_size():
+    """Résolution de travail du mode natif, None en mode fixe (augmentation Detectron2)"""
+    return DETECTION_SIZE if DETECTION_MODE == "native" else None
+
+
+def resize_for_detection(image, detection_size, max_size):
+    """
+    Redimensionne une image pour que son plus petit côté vaille detection_size
+    (plus grand côté borné par max_size), sans padding
+    """
+    height, width = image.shape[:2]
+    scale = detection_size / min(height, width)
+    if max(height, width) * scale > max_size:
+        scale = max_size / max(height, width)
+    new_width, new_height = max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+    if (new_width, new_height) == (width, height):
+        return image
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(image, (new_width, new_height), interpolation=interpolation)
+
+
+def prepare_input(predictor, image, detection_size=None):
+    """
+    Prétraite une image BGR comme DefaultPredictor.__call__ et retourne le
+    dictionnaire d'entrée attendu par le modèle. Avec detection_size, l'image
+    est réduite à cette résolution de travail, mais height/width restent ceux
+    de l'original : les sorties sont remises à l'échelle native.
+    """
+    if predictor.input_format == "RGB":
+        image = image[:, :, ::-1]
+    height, width = image.shape[:2]
+    if detection_size:
+        transformed = resize_for_detection(image, detection_size, predictor.cfg.INPUT.MAX_SIZE_TEST)
+    else:
+        transformed = predictor.aug.get_transform(image).apply_image(image)
+    tensor = torch.as_tensor(transformed.astype("float32").transpose(2, 0, 1))
+    tensor = tensor.to(predictor.cfg.MODEL.DEVICE)
+    return {"image": tensor, "height": height, "width": width}
+
+
+def detect_batch(images, batch_size=None, predictor=None, detection_size=None):
+    """
+    Détecte les bulles sur une liste d'images BGR
+
+    Args:
+        images: liste d'images OpenCV (BGR, tailles libres)
+        batch_size: nombre de pages par passe avant (DETECTION_BATCH_SIZE par défaut)
+        predictor: predictor à utiliser (le predictor partagé par défaut)
+        detection_size: résolution de travail (plus petit côté) ; par défaut
+                        DETECTION_SIZE en mode natif, augmentation Detectron2 sinon
+
+    Returns:
+        Liste de sorties {"instances": Instances}, dans l'ordre des images, à la
+        résolution d'origine, avec des masques compacts (compact_masks)
+    """
+    if not images:
+        return []
+
+    predictor = predictor or load_predictor()
+    batch_size = max(1, batch_size or DETECTION_BATCH_SIZE)
+    detection_size = detection_size or default_detection_size()
+
+    if not hasattr(predictor, "model"):
+        # Backends exportés (TorchScript/ONNX) : graphe tracé pour une image à la fois
+        return [predictor(image, detection_size=detection_size) for image in images]
+
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            inputs = [prepare_input(predictor, image, detection_size) for image in chunk]
+            raw = predictor.model.inference(inputs, do_postprocess=False)
+            outputs.extend(
+                {"instances": postprocess_compact(instances, item["height"], item["width"])}
+                for instances, item in zip(raw, inputs)
+            )
+            logger.info(f"Détection par lot: {len(chunk)} image(s) traitée(s) en une passe")
+    return outputs
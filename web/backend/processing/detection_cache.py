@@ -0,0 +1,224 @@
+"""
+Cache de détection adressé par contenu
+
+L'éditeur web envoie souvent la même page plusieurs fois (/process puis
+/get-bubble-polygons...). Les détections sont mises en cache sous une clé
+(empreinte des pixels de la page préparée par prepare_page, version du
+modèle), au format compact : classes, scores, boîtes et masques locaux à leur
+boîte encodés en RLE (pycocotools). Le cache est borné en octets (LRU), expire
+après un TTL et peut être persisté sur disque ; le dossier de persistance est
+soumis aux mêmes limites (balayage à chaque écriture).
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from pycocotools import mask as mask_utils
+from detectron2.structures import Boxes, Instances
+
+from .masks import CompactMask, CompactMasks, masks_of
+from .model_registry import get_model_version
+from .detection import DETECTION_MODE, DETECTION_SIZE
+
+logger = logging.getLogger(__name__)
+
+DETECTION_CACHE_MAX_MB = float(os.getenv("DETECTION_CACHE_MAX_MB", "64"))
+DETECTION_CACHE_TTL = float(os.getenv("DETECTION_CACHE_TTL", "3600"))
+DETECTION_CACHE_DIR = os.getenv("DETECTION_CACHE_DIR", "")
+CACHE_FORMAT = "compact-v1"  # à changer si le format des entrées évolue
+
+
+def image_key(image, model_version):
+    """Clé de cache : empreinte des pixels + forme de l'image + version du modèle"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(image.shape).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    digest.update(model_version.encode())
+    return digest.hexdigest()
+
+
+def encode_outputs(outputs):
+    """Convertit une sortie {"instances": Instances} en entrée de cache compacte"""
+    instances = outputs["instances"].to("cpu")
+    height, width = instances.image_size
+    masks = masks_of(instances)
+    return {
+        "image_size": (height, width),
+        "classes": instances.pred_classes.numpy().astype(np.int64),
+        "scores": instances.scores.numpy().astype(np.float32),
+        "boxes": instances.pred_boxes.tensor.numpy().astype(np.float32),
+        "origins": [(m.x0, m.y0) for m in masks],
+        # None pour un masque vide (pycocotools n'encode pas les tableaux 0x0)
+        "rles": [None if m.is_empty else mask_utils.encode(np.asfortranarray(m.mask.astype(np.uint8))) for m in masks],
+    }
+
+
+def decode_outputs(entry):
+    """Reconstruit une sortie {"instances": Instances} (masques compacts) depuis une entrée de cache"""
+    height, width = entry["image_size"]
+    instances = Instances((height, width))
+    instances.pred_boxes = Boxes(torch.from_numpy(entry["boxes"].copy()))
+    instances.scores = torch.from_numpy(entry["scores"].copy())
+    instances.pred_classes = torch.from_numpy(entry["classes"].copy())
+    masks = []
+    for (x0, y0), rle in zip(entry["origins"], entry["rles"]):
+        masks.append(CompactMask.empty() if rle is None else CompactMask(x0, y0, mask_utils.decode(rle).astype(bool)))
+    instances.compact_masks = CompactMasks(masks, (height, width))
+    return {"instances": instances}
+
+
+def entry_size(entry):
+    """Taille approximative d'une entrée en octets"""
+    size = entry["classes"].nbytes + entry["scores"].nbytes + entry["boxes"].nbytes
+    return size + sum(len(rle["counts"]) for rle in entry["rles"] if rle is not None)
+
+
+class DetectionCache:
+    """Cache LRU borné en octets, avec TTL et persistance disque optionnelle"""
+
+    def __init__(self, max_bytes, ttl_seconds, persist_dir=""):
+        self.max_bytes = int(max_bytes)
+        self.ttl_seconds = ttl_seconds
+        self.persist_dir = persist_dir
+        self._entries = OrderedDict()  # key -> (timestamp, size, entry)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0}
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+            self._sweep_disk()
+
+    def _disk_path(self, key):
+        return os.path.join(self.persist_dir, f"{key}.pkl")
+
+    def _expired(self, timestamp):
+        return self.ttl_seconds > 0 and time.time() - timestamp > self.ttl_seconds
+
+    def _insert(self, key, timestamp, entry):
+        size = entry_size(entry)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (timestamp, size, entry)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._stats["evictions"] += 1
+
+    def _load_from_disk(self, key):
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                timestamp, entry = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Entrée de cache illisible ({path}): {e}")
+            return None
+        if self._expired(timestamp):
+            os.remove(path)
+            return None
+        return timestamp, entry
+
+    def _sweep_disk(self):
+        """Supprime du dossier de persistance les entrées expirées, puis les plus anciennes au-delà de max_bytes"""
+        files = []
+        for name in os.listdir(self.persist_dir):
+            if not name.endswith(".pkl"):
+                continue
+            path = os.path.join(self.persist_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # supprimé entre-temps par un autre worker
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if not self._expired(mtime) and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        """Retourne la sortie en cache ({"instances": ...}) ou None"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self._expired(item[0]):
+                self._bytes -= self._entries.pop(key)[1]
+                item = None
+            if item is None and self.persist_dir:
+                loaded = self._load_from_disk(key)
+                if loaded is not None:
+                    self._stats["disk_hits"] += 1
+                    self._insert(key, *loaded)
+                    item = self._entries.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            entry = item[2]
+        return decode_outputs(entry)
+
+    def put(self, key, outputs):
+        """Enregistre une sortie de détection"""
+        entry = encode_outputs(outputs)
+        timestamp = time.time()
+        with self._lock:
+            self._insert(key, timestamp, entry)
+        if self.persist_dir:
+            try:
+                with open(self._disk_path(key), "wb") as f:
+                    pickle.dump((timestamp, entry), f)
+                with self._lock:
+                    self._sweep_disk()
+            except Exception as e:
+                logger.warning(f"Impossible de persister l'entrée de cache: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 3) if total else 0
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+_cache = DetectionCache(DETECTION_CACHE_MAX_MB * 1024 * 1024, DETECTION_CACHE_TTL, DETECTION_CACHE_DIR)
+
+
+def get_detection_cache():
+    """Cache de détection partagé par le processus"""
+    return _cache
+
+
+def detect_cached(image, detect):
+    """
+    Détection avec cache : retourne la sortie en cache pour cette image et ce
+    modèle, sinon appelle detect(image) et mémorise le résultat
+    """
+    # Le mode de détection change les sorties : il fait partie de la version
+    key = image_key(image, f"{get_model_version()}:{DETECTION_MODE}:{DETECTION_SIZE}:{CACHE_FORMAT}")
+    outputs = _cache.get(key)
+    if outputs is not None:
+        logger.info("Détection servie depuis le cache")
+        return outputs
+    outputs = detect(image)
+    _cache.put(key, outputs)
+    return outputs
@@ -0,0 +1,104 @@
+"""
+Backend d'exécution CPU pour le détecteur exporté (TorchScript ou ONNX Runtime)
+
+Les artefacts sont produits par scripts/export_detector.py. ExportedPredictor
+expose la même interface que DefaultPredictor : predictor(image_bgr) retourne
+{"instances": Instances} avec pred_boxes, scores, pred_classes à la taille de
+l'image, et des masques compacts (compact_masks, voir mask_postprocess.py).
+"""
+
+import os
+import pickle
+import logging
+
+import numpy as np
+import torch
+import detectron2.data.transforms as T
+
+from .mask_postprocess import postprocess_compact
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torchscript", "onnx")
+
+
+def schema_path(artifact_path):
+    """Chemin du schéma de sortie sauvegardé à côté de l'artefact exporté"""
+    return f"{artifact_path}.schema.pkl"
+
+
+class ExportedPredictor:
+    """Predictor basé sur un modèle Mask R-CNN tracé (TorchScript) ou exporté en ONNX"""
+
+    def __init__(self, cfg, artifact_path, backend="torchscript"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+        if not os.path.exists(artifact_path):
+            raise FileNotFoundError(
+                f"Artefact exporté introuvable: {artifact_path} "
+                f"(générez-le avec scripts/export_detector.py --format {backend})"
+            )
+
+        self.cfg = cfg.clone()
+        self.backend = backend
+        self.artifact_path = artifact_path
+        self.artifact_bytes = os.path.getsize(artifact_path)
+        self.aug = T.ResizeShortestEdge(
+            [cfg.INPUT.MIN_SIZE_TEST, cfg.INPUT.MIN_SIZE_TEST], cfg.INPUT.MAX_SIZE_TEST
+        )
+        self.input_format = cfg.INPUT.FORMAT
+
+        with open(schema_path(artifact_path), "rb") as f:
+            self.outputs_schema = pickle.load(f)
+
+        if backend == "torchscript":
+            self._module = torch.jit.load(artifact_path, map_location="cpu")
+            self._module.eval()
+            self._run = self._run_torchscript
+        else:
+            try:
+                import onnxruntime as ort
+            except ImportError:
+                raise ImportError("onnxruntime est requis pour DETECTOR_BACKEND=onnx (pip install onnxruntime)")
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self._session = ort.InferenceSession(
+                artifact_path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            self._input_name = self._session.get_inputs()[0].name
+            self._run = self._run_onnx
+
+        logger.info(f"Détecteur exporté chargé ({backend}): {artifact_path}")
+
+    def _run_torchscript(self, image):
+        return self._module(image)
+
+    def _run_onnx(self, image):
+        outputs = self._session.run(None, {self._input_name: image.numpy()})
+        return tuple(torch.from_numpy(np.asarray(output)) for output in outputs)
+
+    def __call__(self, original_image, detection_size=None):
+        """
+        Args:
+            original_image: image BGR (H, W, C) comme pour DefaultPredictor
+            detection_size: résolution de travail optionnelle (voir detection.py)
+
+        Returns:
+            {"instances": Instances} à la résolution de original_image
+        """
+        with torch.no_grad():
+            if self.input_format == "RGB":
+                original_image = original_image[:, :, ::-1]
+            height, width = original_image.shape[:2]
+            if detection_size:
+                from .detection import resize_for_detection
+                image = resize_for_detection(original_image, detection_size, self.cfg.INPUT.MAX_SIZE_TEST)
+            else:
+                image = self.aug.get_transform(original_image).apply_image(original_image)
+            image = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+
+            flattened = self._run(image)
+            instances = self.outputs_schema(flattened)[0]["instances"]
+            # Le schéma mémorise la taille de l'image de traçage : on remet celle de l'entrée
+            instances._image_size = (image.shape[1], image.shape[2])
+            return {"instances": postprocess_compact(instances, height, width)}
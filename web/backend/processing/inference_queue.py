@@ -0,0 +1,120 @@
+"""
+Ordonnanceur de micro-batching pour la détection Detectron2
+
+Les requêtes de détection qui arrivent dans une courte fenêtre (DETECTION_MAX_WAIT_MS)
+sont regroupées, jusqu'à DETECTION_MAX_BATCH_SIZE images, en une seule passe avant
+via detect_batch. Chaque appelant récupère ensuite sa propre sortie.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+from .detection import detect_batch
+from .tiling import detect_page
+
+logger = logging.getLogger(__name__)
+
+DETECTION_MAX_BATCH_SIZE = int(os.getenv("DETECTION_MAX_BATCH_SIZE", "4"))
+DETECTION_MAX_WAIT_MS = float(os.getenv("DETECTION_MAX_WAIT_MS", "20"))
+
+
+class InferenceScheduler:
+    """File d'attente de détection servie par un thread unique qui forme des lots"""
+
+    def __init__(self, max_batch_size=DETECTION_MAX_BATCH_SIZE, max_wait_ms=DETECTION_MAX_WAIT_MS):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "largest_batch": 0}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+                self._thread.start()
+
+    def submit(self, image):
+        """Ajoute une image BGR à la file et retourne un Future de sa sortie {"instances": ...}"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def detect(self, image, timeout=None):
+        """Équivalent bloquant de predictor(image), servi par le micro-batching"""
+        return self.submit(image).result(timeout=timeout)
+
+    def detect_many(self, images, timeout=None):
+        """Soumet plusieurs images d'un coup (ex. tuiles d'une bande) et retourne leurs sorties dans l'ordre"""
+        futures = [self.submit(image) for image in images]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect_batch(self):
+        """Attend une première requête puis complète le lot pendant au plus max_wait_ms"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Ignorer les requêtes annulées entre-temps
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                outputs = detect_batch([image for image, _ in batch], batch_size=len(batch))
+            except Exception as e:
+                logger.error(f"Erreur lors de la détection groupée: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+    def get_stats(self):
+        """Statistiques de regroupement (taille moyenne des lots, file en attente)"""
+        stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        stats["average_batch"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0
+        stats["max_batch_size"] = self.max_batch_size
+        stats["max_wait_ms"] = self.max_wait_ms
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Ordonnanceur partagé par toutes les routes du processus"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler()
+        return _scheduler
+
+
+def detect_page_queued(image):
+    """Détection d'une page via l'ordonnanceur partagé, par tuiles pour les longues bandes"""
+    scheduler = get_scheduler()
+    return detect_page(image, scheduler.detect, scheduler.detect_many)
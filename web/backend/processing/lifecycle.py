@@ -0,0 +1,168 @@
+"""
+Cycle de vie des modèles : chargement et préchauffage au démarrage
+
+Sans préchauffage, la première requête /process paie le téléchargement et le
+chargement du détecteur, l'inférence de test et l'initialisation d'EasyOCR.
+Ici, un thread lancé au démarrage de l'application charge les modèles puis
+exécute détection et OCR sur des pages synthétiques de taille réaliste
+(WARMUP_PAGE_SIZES). Les routes de traitement consultent is_ready() et
+répondent 503 tant que le préchauffage n'est pas terminé. Avec
+MODEL_WARMUP=0, les modèles sont seulement chargés, sans inférences de
+préchauffage : l'application n'est prête qu'une fois le chargement réussi.
+
+États : idle -> loading -> warming -> ready. Un échec (poids illisibles,
+téléchargement interrompu...) passe en failed, puis le chargement est
+retenté après un délai exponentiel (WARMUP_RETRY_BASE, WARMUP_RETRY_MAX).
+"""
+
+import os
+import time
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+from .clean_bubbles import load_predictor
+from .detection import detect_batch
+from .model_registry import get_reader, get_memory_stats
+from .ocr import read_bubbles
+
+logger = logging.getLogger(__name__)
+
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+# Tailles (largeur x hauteur) des pages de préchauffage
+WARMUP_PAGE_SIZES = [
+    tuple(int(v) for v in size.split("x"))
+    for size in os.getenv("WARMUP_PAGE_SIZES", "800x1200").split(",") if size.strip()
+]
+WARMUP_RETRY_AFTER = int(os.getenv("WARMUP_RETRY_AFTER", "10"))  # secondes suggérées aux clients (503)
+WARMUP_RETRY_BASE = float(os.getenv("WARMUP_RETRY_BASE", "5"))    # secondes avant la 1re nouvelle tentative
+WARMUP_RETRY_MAX = float(os.getenv("WARMUP_RETRY_MAX", "300"))    # délai maximal entre deux tentatives
+
+
+def synthetic_page(width, height):
+    """Page blanche avec une bulle et du texte, pour exercer détection et OCR"""
+    page = np.full((height, width, 3), 255, dtype=np.uint8)
+    center = (width // 2, height // 3)
+    axes = (max(10, width // 4), max(10, height // 10))
+    cv2.ellipse(page, center, axes, 0, 0, 360, (0, 0, 0), 3)
+    cv2.putText(page, "HELLO THERE!", (center[0] - axes[0] // 2, center[1]),
+                cv2.FONT_HERSHEY_SIMPLEX, max(0.5, width / 800), (0, 0, 0), 2)
+    return page, (center[0] - axes[0], center[1] - axes[1], center[0] + axes[0], center[1] + axes[1])
+
+
+class ModelLifecycle:
+    """Charge et préchauffe les modèles en arrière-plan, expose l'état de préparation"""
+
+    def __init__(self, warmup=MODEL_WARMUP, page_sizes=WARMUP_PAGE_SIZES, retry_base=WARMUP_RETRY_BASE,
+                 retry_max=WARMUP_RETRY_MAX):
+        self.warmup = warmup
+        self.page_sizes = page_sizes
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._lock = threading.Lock()
+        self._thread = None
+        self._state = "idle"
+        self._error = None
+        self._timings = {}
+        self._started_at = None
+        self._ready_at = None
+        self._attempts = 0
+        self._next_retry_at = None
+
+    def _set_state(self, state):
+        with self._lock:
+            self._state = state
+        logger.info(f"Cycle de vie des modèles: {state}")
+
+    def start(self):
+        """Lance le chargement/préchauffage en arrière-plan (idempotent)"""
+        with self._lock:
+            if self._started_at is not None:
+                return
+            self._started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Tentatives successives jusqu'au premier chargement réussi"""
+        while not self._attempt():
+            with self._lock:
+                delay = min(self.retry_max, self.retry_base * 2 ** (self._attempts - 1))
+                self._next_retry_at = time.time() + delay
+            logger.info(f"Nouvelle tentative de chargement des modèles dans {delay:.0f}s")
+            time.sleep(delay)
+            with self._lock:
+                self._next_retry_at = None
+
+    def _attempt(self):
+        with self._lock:
+            self._attempts += 1
+        try:
+            self._set_state("loading")
+            t0 = time.perf_counter()
+            load_predictor()
+            self._timings["detector_load_s"] = round(time.perf_counter() - t0, 3)
+            t0 = time.perf_counter()
+            reader = get_reader()
+            self._timings["ocr_load_s"] = round(time.perf_counter() - t0, 3)
+
+            if self.warmup:
+                self._set_state("warming")
+                self._timings["warmup"] = self._warm(reader)
+
+            with self._lock:
+                self._state = "ready"
+                self._error = None
+                self._ready_at = time.time()
+            logger.info(f"Modèles prêts en {self._ready_at - self._started_at:.1f}s")
+            return True
+        except Exception as e:
+            logger.error(f"Échec du chargement/préchauffage des modèles (tentative {self._attempts}): {e}")
+            with self._lock:
+                self._state = "failed"
+                self._error = str(e)
+            return False
+
+    def _warm(self, reader):
+        """Détection et OCR sur les pages synthétiques, latences par taille"""
+        warmup = []
+        for width, height in self.page_sizes:
+            page, (x0, y0, x1, y1) = synthetic_page(width, height)
+            t0 = time.perf_counter()
+            detect_batch([page])
+            detect_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            read_bubbles(page, [(max(0, x0), max(0, y0), x1, y1)], reader=reader)
+            ocr_s = time.perf_counter() - t0
+            warmup.append({"size": f"{width}x{height}", "detect_s": round(detect_s, 3), "ocr_s": round(ocr_s, 3)})
+        return warmup
+
+    def is_ready(self):
+        with self._lock:
+            return self._state == "ready"
+
+    def status(self):
+        """État, latences de chargement/préchauffage et mémoire"""
+        with self._lock:
+            status = {
+                "state": self._state,
+                "ready": self._state == "ready",
+                "error": self._error,
+                "warmup_enabled": self.warmup,
+                "attempts": self._attempts,
+                "next_retry_s": round(max(0.0, self._next_retry_at - time.time()), 1) if self._next_retry_at else None,
+                "timings": dict(self._timings),
+                "startup_s": round((self._ready_at or time.time()) - self._started_at, 3) if self._started_at else None,
+            }
+        status["memory"] = get_memory_stats()
+        return status
+
+
+_lifecycle = ModelLifecycle()
+
+
+def get_lifecycle():
+    """Gestionnaire de cycle de vie partagé par le processus"""
+    return _lifecycle
@@ -0,0 +1,215 @@
+"""
+Registre unique des modèles du backend (Detectron2, EasyOCR)
+
+Chaque consommateur (nettoyage, traduction, éditeur de bulles) récupère ici
+la configuration, le predictor et les lecteurs OCR : les poids ne sont chargés
+qu'une seule fois par processus (un lecteur par jeu de langues, voir
+ocr_readers.py).
+"""
+
+import os
+import time
+import threading
+import logging
+
+import torch
+from detectron2.config import get_cfg
+from detectron2.engine import DefaultPredictor
+from detectron2 import model_zoo
+
+from .quantization import DETECTOR_QUANTIZATION, quantize_predictor
+from .ocr_readers import get_reader_pool
+
+logger = logging.getLogger(__name__)
+
+# === CONFIGURATION DES CHEMINS ===
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+
+CONFIG_FILE = "COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"
+NUM_CLASSES = 3  # bubble, floating_text, narration_box
+SCORE_THRESH_TEST = 0.5
+
+CLASS_NAMES = {0: "bubble", 1: "floating_text", 2: "narration_box"}
+
+# Backend d'exécution du détecteur : "eager" (Detectron2), "torchscript" ou "onnx"
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "eager").lower()
+EXPORT_EXTENSIONS = {"torchscript": ".ts", "onnx": ".onnx"}
+
+_lock = threading.RLock()
+_cfg = None
+_predictor = None
+_memory_stats = {}
+
+
+def _rss_bytes():
+    """Mémoire résidente du processus (0 si psutil indisponible)"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        return 0
+
+
+def _parameters_bytes(model):
+    """Taille des paramètres et buffers d'un module torch"""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def get_model_path():
+    """Obtenir le chemin du modèle, le télécharger depuis Hugging Face si nécessaire"""
+    model_path = os.path.join(PROJECT_DIR, "models_ai", "model_final.pth")
+
+    if os.path.exists(model_path):
+        print(f"✅ Modèle local trouvé: {model_path}")
+        return model_path
+
+    print("🔧 Modèle local non trouvé, téléchargement depuis Hugging Face...")
+    try:
+        from huggingface_hub import hf_hub_download
+
+        # Retry avec timeout
+        for attempt in range(3):
+            try:
+                print(f"🔧 Tentative {attempt + 1}/3...")
+                model_path = hf_hub_download(
+                    repo_id="HaashS/modelev1",
+                    filename="model_final.pth",
+                    local_dir=os.path.join(PROJECT_DIR, "models_ai"),
+                    local_files_only=False,
+                    resume_download=True
+                )
+                print(f"✅ Modèle téléchargé depuis Hugging Face: {model_path}")
+                return model_path
+            except Exception as e:
+                print(f"⚠️  Tentative {attempt + 1} échouée: {e}")
+                if attempt < 2:
+                    print("🔄 Nouvelle tentative dans 5 secondes...")
+                    time.sleep(5)
+                else:
+                    raise e
+    except Exception as e:
+        print(f"❌ Erreur téléchargement Hugging Face après 3 tentatives: {e}")
+        raise Exception(f"Impossible de télécharger le modèle depuis Hugging Face: {e}")
+
+
+def get_export_path(backend=DETECTOR_BACKEND):
+    """Chemin de l'artefact exporté pour un backend (surcharge via DETECTOR_EXPORT_PATH)"""
+    default = os.path.join(PROJECT_DIR, "models_ai", f"model_final{EXPORT_EXTENSIONS.get(backend, '')}")
+    return os.getenv("DETECTOR_EXPORT_PATH", default)
+
+
+def _build_predictor(cfg):
+    """Construit le predictor correspondant à DETECTOR_BACKEND"""
+    if DETECTOR_BACKEND == "eager":
+        return quantize_predictor(DefaultPredictor(cfg))
+
+    from .exported_predictor import ExportedPredictor
+    return ExportedPredictor(cfg, get_export_path(DETECTOR_BACKEND), backend=DETECTOR_BACKEND)
+
+
+def get_detectron_cfg():
+    """Configuration Detectron2 partagée (construite une seule fois)"""
+    global _cfg
+    with _lock:
+        if _cfg is not None:
+            return _cfg
+
+        cfg = get_cfg()
+        cfg.merge_from_file(model_zoo.get_config_file(CONFIG_FILE))
+
+        model_path = get_model_path()
+        # Simple vérification de la taille : le checkpoint n'est désérialisé
+        # qu'une fois, par DefaultPredictor lui-même.
+        file_size = os.path.getsize(model_path)
+        if file_size == 0:
+            raise Exception(f"Fichier modèle vide: {model_path}")
+        print(f"🔧 Chemin du modèle: {model_path} ({file_size} bytes)")
+
+        cfg.MODEL.WEIGHTS = model_path
+        cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = SCORE_THRESH_TEST
+        cfg.MODEL.ROI_HEADS.NUM_CLASSES = NUM_CLASSES
+        cfg.MODEL.DEVICE = (
+            "cuda" if torch.cuda.is_available() and DETECTOR_BACKEND == "eager" and DETECTOR_QUANTIZATION == "none" else "cpu"
+        )
+        print(f"🔧 Device utilisé: {cfg.MODEL.DEVICE}")
+
+        _cfg = cfg
+        return _cfg
+
+
+def get_predictor():
+    """Predictor Detectron2 partagé, chargé paresseusement une fois par processus"""
+    global _predictor
+    if _predictor is not None:
+        return _predictor
+
+    with _lock:
+        if _predictor is not None:
+            return _predictor
+
+        cfg = get_detectron_cfg()
+        rss_before = _rss_bytes()
+        start = time.time()
+        try:
+            print(f"🔧 Chargement du modèle Detectron2 (backend: {DETECTOR_BACKEND})...")
+            predictor = _build_predictor(cfg)
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement du modèle: {e}")
+            raise Exception(f"Impossible de charger le modèle Detectron2: {e}")
+
+        _memory_stats["detector"] = {
+            "load_time_s": round(time.time() - start, 3),
+            "parameters_bytes": (
+                _parameters_bytes(predictor.model) if hasattr(predictor, "model")
+                else getattr(predictor, "artifact_bytes", 0)
+            ),
+            "rss_delta_bytes": max(0, _rss_bytes() - rss_before),
+            "device": cfg.MODEL.DEVICE,
+            "backend": DETECTOR_BACKEND,
+            "quantization": DETECTOR_QUANTIZATION if DETECTOR_BACKEND == "eager" else "none",
+        }
+        logger.info("Modèle Detectron2 chargé avec succès")
+        print(f"✅ Modèle Detectron2 chargé ({_memory_stats['detector']['load_time_s']}s)")
+
+        _predictor = predictor
+        return _predictor
+
+
+def get_reader(languages=None):
+    """
+    Lecteur EasyOCR pour une langue source ("en", "ja", "ko", "zh"...) ou un
+    jeu de langues, créé paresseusement par le pool partagé
+    """
+    return get_reader_pool().get(languages)
+
+
+def get_model_version():
+    """
+    Identifiant de la version du détecteur (poids, backend, quantification),
+    utilisé pour invalider les caches de détection quand le modèle change
+    """
+    cfg = get_detectron_cfg()
+    stat = os.stat(cfg.MODEL.WEIGHTS)
+    return (
+        f"{os.path.basename(cfg.MODEL.WEIGHTS)}:{stat.st_size}:{int(stat.st_mtime)}"
+        f":{DETECTOR_BACKEND}:{DETECTOR_QUANTIZATION}:{cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST}"
+    )
+
+
+def is_loaded():
+    """Indique quels modèles sont déjà résidents"""
+    readers = get_reader_pool().loaded()
+    return {"detector": _predictor is not None, "ocr": bool(readers), "ocr_languages": readers}
+
+
+def get_memory_stats():
+    """Comptabilité mémoire des modèles chargés"""
+    return {
+        "process_rss_bytes": _rss_bytes(),
+        "models": {name: dict(stats) for name, stats in _memory_stats.items()},
+        "ocr_readers": get_reader_pool().get_stats(),
+    }
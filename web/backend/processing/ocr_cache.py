@@ -0,0 +1,221 @@
+"""
+Cache des résultats OCR par empreinte de recadrage
+
+Un chapitre répète beaucoup de bulles (onomatopées, "...", cartouches de
+narration) et /retreat-with-polygons relance l'OCR sur une page déjà lue. Le
+texte reconnu est mis en cache sous une clé calculée sur le recadrage
+normalisé (niveaux de gris) et les langues du lecteur :
+
+- OCR_CACHE_HASH=exact : empreinte blake2b des pixels (aucun faux positif) ;
+- OCR_CACHE_HASH=perceptual : dHash du recadrage réduit, qui tolère le bruit
+  de compression et les décalages d'un pixel entre deux détections.
+
+Le cache est un LRU borné en entrées et en octets, persistable dans un
+fichier (OCR_CACHE_PATH), avec compteurs de succès/échecs.
+"""
+
+import os
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE = os.getenv("OCR_CACHE", "1") == "1"
+OCR_CACHE_ENTRIES = int(os.getenv("OCR_CACHE_ENTRIES", "4096"))
+OCR_CACHE_MAX_MB = float(os.getenv("OCR_CACHE_MAX_MB", "8"))
+OCR_CACHE_HASH = os.getenv("OCR_CACHE_HASH", "exact").lower()  # "exact" ou "perceptual"
+OCR_CACHE_PATH = os.getenv("OCR_CACHE_PATH", "")                # vide = pas de persistance
+HASH_SIZE = 16  # côté de la grille du dHash (HASH_SIZE² bits)
+
+
+def _normalize(crop):
+    if crop.ndim == 3:
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return crop
+
+
+def exact_hash(gray):
+    """Empreinte des pixels et de la forme du recadrage"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(gray.shape).encode())
+    digest.update(np.ascontiguousarray(gray).data)
+    return digest.hexdigest()
+
+
+def perceptual_hash(gray, hash_size=HASH_SIZE):
+    """dHash (gradients horizontaux du recadrage réduit) et rapport d'aspect arrondi"""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    aspect = round(gray.shape[1] / max(1, gray.shape[0]), 1)
+    return f"{np.packbits(bits).tobytes().hex()}:{aspect}"
+
+
+def crop_key(crop, languages=(), method=OCR_CACHE_HASH):
+    """Clé de cache d'un recadrage pour un jeu de langues"""
+    gray = _normalize(crop)
+    fingerprint = perceptual_hash(gray) if method == "perceptual" else exact_hash(gray)
+    return f"{method}:{'+'.join(languages)}:{fingerprint}"
+
+
+class OCRCache:
+    """Cache LRU texte reconnu, borné en entrées et en octets, persistance optionnelle"""
+
+    def __init__(self, max_entries=OCR_CACHE_ENTRIES, max_bytes=OCR_CACHE_MAX_MB * 1024 * 1024,
+                 path=OCR_CACHE_PATH, enabled=OCR_CACHE):
+        self.enabled = enabled
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes)
+        self.path = path
+        self._entries = OrderedDict()  # key -> texte
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if enabled and path:
+            self.load()
+
+    @staticmethod
+    def _size(key, text):
+        return len(key) + len(text.encode("utf-8"))
+
+    def _insert(self, key, text):
+        size = self._size(key, text)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._size(key, self._entries.pop(key))
+        self._entries[key] = text
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            evicted_key, evicted_text = self._entries.popitem(last=False)
+            self._bytes -= self._size(evicted_key, evicted_text)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        """Texte en cache pour cette clé, ou None"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._insert(key, text)
+
+    def load(self):
+        """Recharge les entrées persistées (fichier absent ou illisible : cache vide)"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                entries = pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Cache OCR illisible ({self.path}): {e}")
+            return
+        with self._lock:
+            for key, text in entries:
+                self._insert(key, text)
+        logger.info(f"Cache OCR chargé: {len(self._entries)} entrée(s)")
+
+    def save(self):
+        """Persiste les entrées (ordre LRU conservé)"""
+        if not self.path:
+            return
+        with self._lock:
+            entries = list(self._entries.items())
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"  # workers concurrents
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Impossible de persister le cache OCR: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / total, 3) if total else 0
+        stats["enabled"] = self.enabled
+        stats["max_entries"] = self.max_entries
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+_cache = OCRCache()
+
+
+def get_ocr_cache():
+    """Cache OCR partagé par le processus"""
+    return _cache
+
+
+def recognize_streamed(indices, recognize, on_texts=None):
+    """recognize(indices, on_recognized), textes transmis à on_texts au fil de l'eau puis pour le reste"""
+    if on_texts is None:
+        return recognize(indices, None)
+    emitted = set()
+
+    def on_recognized(pairs):
+        pairs = [(indices[k], text) for k, text in pairs]
+        emitted.update(i for i, _ in pairs)
+        on_texts(pairs)
+
+    texts = recognize(indices, on_recognized)
+    rest = [(i, text) for i, text in zip(indices, texts) if i not in emitted]
+    if rest:
+        on_texts(rest)
+    return texts
+
+
+def cached_texts(crops, languages, recognize, cache=None, on_texts=None):
+    """
+    Textes des recadrages, en ne passant à recognize(indices, on_recognized)
+    -> [textes] que les recadrages absents du cache
+
+    on_texts([(indice, texte), ...]) reçoit les textes dès qu'ils sont
+    connus : ceux du cache d'abord, puis ceux de la reconnaissance. Un moteur
+    qui lit par paquets peut les signaler au fil de l'eau par
+    on_recognized([(position dans indices, texte), ...]) ; les textes non
+    signalés sont transmis à la fin de recognize
+    """
+    cache = cache or _cache
+    if not cache.enabled:
+        return recognize_streamed(list(range(len(crops))), recognize, on_texts)
+
+    texts = [""] * len(crops)
+    keys = [None] * len(crops)
+    missing = []
+    for i, crop in enumerate(crops):
+        if crop is None or crop.size == 0:
+            continue
+        keys[i] = crop_key(crop, languages)
+        text = cache.get(keys[i])
+        if text is None:
+            missing.append(i)
+        else:
+            texts[i] = text
+    if on_texts is not None:
+        on_texts([(i, texts[i]) for i, key in enumerate(keys) if key is not None and i not in missing])
+    if missing:
+        recognized = recognize_streamed(missing, recognize, on_texts)
+        for i, text in zip(missing, recognized):
+            texts[i] = text
+            cache.put(keys[i], text)
+        if cache.path:
+            cache.save()
+    looked_up = sum(key is not None for key in keys)
+    logger.info(f"Cache OCR: {looked_up - len(missing)}/{looked_up} recadrage(s) servi(s) depuis le cache")
+    return texts
@@ -0,0 +1,166 @@
+"""
+Exécuteur OCR multi-processus
+
+L'OCR d'une page tourne dans le thread de la requête et partage le GIL avec
+le reste du worker FastAPI. Ici, un pool de processus (OCR_WORKERS, "auto" :
+la part de cœurs du worker divisée par OCR_WORKER_THREADS) garde dans chaque
+processus un lecteur EasyOCR préchargé. Les recadrages normalisés d'une page
+sont copiés une seule fois dans un segment de mémoire partagée, répartis en
+paquets entre les processus, et les textes remontent au fil de l'eau.
+
+Chaque processus applique sa part du budget de threads (thread_budget) avant
+de charger son lecteur. La lecture se fait en mode "crops" (détection par
+recadrage) : chaque processus détecte et reconnaît ses propres bulles.
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .thread_budget import CPU_CORE_BUDGET, WEB_CONCURRENCY, apply_thread_budget, compute_budget
+
+logger = logging.getLogger(__name__)
+
+OCR_WORKERS = os.getenv("OCR_WORKERS", "0").lower()              # "0" = OCR dans le processus, "auto" ou un nombre
+OCR_WORKER_THREADS = int(os.getenv("OCR_WORKER_THREADS", "2"))   # threads torch/OpenCV par processus OCR
+OCR_CHUNK_SIZE = int(os.getenv("OCR_CHUNK_SIZE", "4"))           # recadrages par tâche
+
+
+def resolve_workers(setting=OCR_WORKERS, threads_per_worker=OCR_WORKER_THREADS):
+    """Nombre de processus OCR : valeur explicite, ou part de cœurs du worker / threads par processus"""
+    if setting == "auto":
+        share = compute_budget(WEB_CONCURRENCY, CPU_CORE_BUDGET)["intra_op_threads"]
+        return max(1, share // max(1, threads_per_worker))
+    return max(0, int(setting))
+
+
+# --- Côté processus OCR -------------------------------------------------------
+
+def _init_worker(total_workers, languages):
+    """Initialiseur : budget de threads puis lecteur préchargé"""
+    apply_thread_budget(workers=total_workers, core_budget=CPU_CORE_BUDGET, pin=False)
+    from .model_registry import get_reader
+    get_reader(languages)
+
+
+def _read_chunk(shm_name, metas, languages, batch_size):
+    """Lit un paquet de recadrages depuis la mémoire partagée ; retourne [(indice, texte), ...]"""
+    from .model_registry import get_reader
+    from .ocr import join_lines, read_crops, read_with_escalation
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        items = [
+            (np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset).copy(), scale)
+            for _, offset, shape, scale in metas
+        ]
+    finally:
+        shm.close()
+
+    reader = get_reader(languages)
+
+    def read(positions, chunk_items, **recognize_kwargs):
+        return read_crops([image for image, _ in chunk_items], reader, batch_size, **recognize_kwargs)
+
+    lines = read_with_escalation(items, read)
+    return [(index, join_lines(lines_of_crop)) for (index, _, _, _), lines_of_crop in zip(metas, lines)]
+
+
+# --- Côté appelant -------------------------------------------------------------
+
+class OCRExecutor:
+    """Pool de processus OCR à lecteurs préchargés, alimenté par mémoire partagée"""
+
+    def __init__(self, workers, languages=None, chunk_size=OCR_CHUNK_SIZE):
+        self.workers = workers
+        self.languages = languages
+        self.chunk_size = max(1, chunk_size)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._stats = {"pages": 0, "crops": 0, "tasks": 0}
+
+    def _ensure_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn : pas de fork d'un processus où torch a déjà démarré ses threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(WEB_CONCURRENCY * self.workers, self.languages),
+                )
+                logger.info(f"Exécuteur OCR: {self.workers} processus")
+            return self._pool
+
+    def iter_texts(self, prepared, languages=None, batch_size=16):
+        """
+        Lit des recadrages normalisés [(image gris, échelle), ...] dans le
+        pool ; produit la liste [(indice, texte), ...] de chaque paquet dès sa fin
+        """
+        valid = [i for i, (image, _) in enumerate(prepared) if image is not None and image.size > 0]
+        if not valid:
+            return
+        pool = self._ensure_pool()
+
+        sizes = [prepared[i][0].size for i in valid]
+        shm = shared_memory.SharedMemory(create=True, size=sum(sizes))
+        try:
+            metas, offset = [], 0
+            for i, size in zip(valid, sizes):
+                image, scale = prepared[i]
+                np.ndarray(image.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)[:] = image
+                metas.append((i, offset, image.shape, scale))
+                offset += size
+
+            futures = [
+                pool.submit(_read_chunk, shm.name, metas[start:start + self.chunk_size], languages, batch_size)
+                for start in range(0, len(metas), self.chunk_size)
+            ]
+            with self._lock:
+                self._stats["pages"] += 1
+                self._stats["crops"] += len(metas)
+                self._stats["tasks"] += len(futures)
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def read_texts(self, prepared, languages=None, batch_size=16):
+        """Textes des recadrages normalisés, dans l'ordre de prepared"""
+        texts = [""] * len(prepared)
+        for pairs in self.iter_texts(prepared, languages, batch_size):
+            for index, text in pairs:
+                texts[index] = text
+        return texts
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def get_stats(self):
+        with self._lock:
+            return {**self._stats, "workers": self.workers, "started": self._pool is not None}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_ocr_executor():
+    """Exécuteur OCR partagé par le processus, ou None si OCR_WORKERS=0"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = resolve_workers()
+            if workers == 0:
+                return None
+            _executor = OCRExecutor(workers)
+        return _executor
@@ -2,9 +2,13 @@ import cv2
 import numpy as np
 import logging
 import traceback
-from .clean_bubbles import clean_bubbles
-from .translate_bubbles import extract_and_translate, predictor as translate_predictor
+from .clean_bubbles import clean_bubbles, load_predictor
+from .translate_bubbles import extract_and_translate
 from .reinsert_translations import draw_translated_text
+from .detection import detect_batch, DETECTION_MODE
+from .inference_queue import detect_page_queued
+from .tiling import is_tall, detect_tiled
+from .detection_cache import detect_cached
 import base64
 from PIL import Image  # Ajouté pour le redimensionnement
 
@@ -14,21 +18,55 @@ def resize_and_pad_cv2(image_cv2, target_size=(800, 1200), fill_color=(255, 255,
     """
     Redimensionne une image OpenCV à target_size sans déformation, avec padding si besoin.
     """
-    original_height, original_width = image_cv2.shape[:2]
     target_width, target_height = target_size
-    # Calcul du ratio d'échelle
-    ratio = min(target_width / original_width, target_height / original_height)
-    new_width = int(original_width * ratio)
-    new_height = int(original_height * ratio)
+    new_width, new_height, paste_x, paste_y = fit_geometry(image_cv2.shape[:2], target_size)
     # Redimensionnement
     resized = cv2.resize(image_cv2, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
     # Création du fond
     result = np.full((target_height, target_width, 3), fill_color, dtype=np.uint8)
-    paste_x = (target_width - new_width) // 2
-    paste_y = (target_height - new_height) // 2
     result[paste_y:paste_y+new_height, paste_x:paste_x+new_width] = resized
     return result
 
+def fit_geometry(image_shape, target_size):
+    """
+    Taille de l'image redimensionnée et position dans le fond de resize_and_pad_cv2 :
+    (largeur, hauteur, décalage x, décalage y)
+    """
+    original_height, original_width = image_shape[:2]
+    target_width, target_height = target_size
+    # Calcul du ratio d'échelle
+    ratio = min(target_width / original_width, target_height / original_height)
+    new_width = int(original_width * ratio)
+    new_height = int(original_height * ratio)
+    return new_width, new_height, (target_width - new_width) // 2, (target_height - new_height) // 2
+
+def prepare_page(image_cv2):
+    """
+    Mode fixe : page redimensionnée/paddée en 800x1200 (historique).
+    Mode natif : page conservée à sa résolution, la détection gère sa propre résolution de travail.
+    Les longues bandes (webtoons) sont toujours conservées : elles seront détectées par tuiles.
+    """
+    if DETECTION_MODE == "native" or is_tall(image_cv2):
+        return image_cv2
+    return resize_and_pad_cv2(image_cv2, target_size=(800, 1200))
+
+def page_to_original(image_cv2):
+    """
+    Retourne une fonction (x, y) -> (x, y) qui ramène les coordonnées de la page
+    préparée par prepare_page dans le repère de l'image d'origine
+    """
+    if DETECTION_MODE == "native" or is_tall(image_cv2):
+        return lambda x, y: (x, y)
+    original_height, original_width = image_cv2.shape[:2]
+    new_width, new_height, paste_x, paste_y = fit_geometry(image_cv2.shape, (800, 1200))
+    scale_x, scale_y = original_width / new_width, original_height / new_height
+
+    def to_original(x, y):
+        x = min(max(round((x - paste_x) * scale_x), 0), original_width - 1)
+        y = min(max(round((y - paste_y) * scale_y), 0), original_height - 1)
+        return x, y
+    return to_original
+
 def process_image_pipeline(image_bytes: bytes) -> bytes:
     """
     Pipeline complet de traitement d'image pour l'API web
@@ -43,14 +81,14 @@ def process_image_pipeline(image_bytes: bytes) -> bytes:
             logger.error("Impossible de décoder l'image")
             return image_bytes
         
-        # Redimensionnement à 800x1200 avec padding
-        image = resize_and_pad_cv2(image, target_size=(800, 1200))
+        # Redimensionnement à 800x1200 avec padding (ou résolution native)
+        image = prepare_page(image)
         
         logger.info("Début du pipeline de traitement")
         
         # Étape 1: Détection et nettoyage des bulles
         logger.info("Étape 1: Détection et nettoyage des bulles...")
-        outputs = clean_predictor(image)
+        outputs = detect_tiled(image, detect_batch) if is_tall(image) else detect_batch([image])[0]
         cleaned_image = clean_bubbles(image, outputs)
         logger.info("Nettoyage terminé")
         
@@ -81,9 +119,12 @@ def process_image_pipeline(image_bytes: bytes) -> bytes:
         # En cas d'erreur, retourner l'image originale
         return image_bytes 
 
-def process_image_pipeline_with_bubbles(image_bytes: bytes):
+def process_image_pipeline_with_bubbles(image_bytes: bytes, languages=None, ocr_backend=None, requester=None):
     """
     Pipeline complet qui retourne l'image traitée, l'image nettoyée ET la liste des bulles (texte, coordonnées, etc.)
+    languages : langue source de l'OCR ("en", "ja", "ko", "zh"...), OCR_LANGUAGES par défaut
+    ocr_backend : moteur OCR ("easyocr", "tesseract"), sinon selon la configuration
+    requester : utilisateur à l'origine de la page (file équitable des traductions)
     """
     try:
         nparr = np.frombuffer(image_bytes, np.uint8)
@@ -91,12 +132,11 @@ def process_image_pipeline_with_bubbles(image_bytes: bytes):
         if image is None:
             logger.error("Impossible de décoder l'image")
             return image_bytes, [], None
-        # Redimensionnement à 800x1200 avec padding
-        image = resize_and_pad_cv2(image, target_size=(800, 1200))
+        # Redimensionnement à 800x1200 avec padding (ou résolution native)
+        image = prepare_page(image)
         logger.info("Début du pipeline de traitement (with bubbles)")
         
-        # Charger le modèle de manière paresseuse
-        from .clean_bubbles import load_predictor
+        # Récupérer le modèle partagé (chargé une seule fois par processus)
         try:
             print("🔧 Chargement du modèle Detectron2...")
             predictor = load_predictor()
@@ -106,20 +146,28 @@ def process_image_pipeline_with_bubbles(image_bytes: bytes):
             raise Exception(f"Modèle Detectron2 requis mais non disponible: {e}")
         
         print("🔧 Exécution de la détection...")
-        outputs = predictor(image)
+        # Cache par contenu, puis ordonnanceur : les requêtes concurrentes partagent une passe avant
+        outputs = detect_cached(image, detect_page_queued)
         print(f"✅ Détection terminée: {len(outputs['instances'])} objets détectés")
-        cleaned_image = clean_bubbles(image, outputs)
-        translations = extract_and_translate(image, outputs)
-        if translations:
-            final_image = draw_translated_text(cleaned_image, translations)
-        else:
-            final_image = cleaned_image
-        _, buffer_final = cv2.imencode('.png', final_image)
-        result_bytes = buffer_final.tobytes()
-        _, buffer_cleaned = cv2.imencode('.png', cleaned_image)
-        cleaned_base64 = base64.b64encode(buffer_cleaned.tobytes()).decode('utf-8')
-        return result_bytes, translations, cleaned_base64
+        return finish_pipeline_with_bubbles(image, outputs, languages, ocr_backend, requester)
     except Exception as e:
         logger.error(f"Erreur dans le pipeline: {e}")
         traceback.print_exc()
-        return image_bytes, [], None 
\ No newline at end of file
+        return image_bytes, [], None
+
+def finish_pipeline_with_bubbles(image, outputs, languages=None, ocr_backend=None, requester=None):
+    """
+    Nettoyage, traduction et réinsertion à partir de détections déjà calculées.
+    Retourne (image finale en bytes PNG, bulles, image nettoyée en base64)
+    """
+    cleaned_image = clean_bubbles(image, outputs)
+    translations = extract_and_translate(image, outputs, languages, ocr_backend, requester)
+    if translations:
+        final_image = draw_translated_text(cleaned_image, translations)
+    else:
+        final_image = cleaned_image
+    _, buffer_final = cv2.imencode('.png', final_image)
+    result_bytes = buffer_final.tobytes()
+    _, buffer_cleaned = cv2.imencode('.png', cleaned_image)
+    cleaned_base64 = base64.b64encode(buffer_cleaned.tobytes()).decode('utf-8')
+    return result_bytes, translations, cleaned_base64
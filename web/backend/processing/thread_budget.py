@@ -0,0 +1,120 @@
+"""
+Budget de threads CPU partagé entre torch, OpenCV et EasyOCR
+
+Par défaut, chaque processus (worker uvicorn) lance autant de threads torch
+que de cœurs, OpenCV son propre pool, et EasyOCR (qui passe par torch) s'y
+ajoute : sur une machine multi-cœurs, les workers se disputent les mêmes
+cœurs. Ici, un budget global (CPU_CORE_BUDGET, tous les cœurs disponibles par
+défaut) est réparti entre les WEB_CONCURRENCY workers. Chaque processus règle
+torch (intra/inter-op), OpenCV et les variables OMP/MKL sur sa part, et peut
+optionnellement être épinglé sur ses cœurs (CPU_PINNING=1).
+"""
+
+import os
+import logging
+import threading
+
+import cv2
+import torch
+
+logger = logging.getLogger(__name__)
+
+CPU_CORE_BUDGET = int(os.getenv("CPU_CORE_BUDGET", "0"))            # 0 = tous les cœurs disponibles
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))            # workers uvicorn se partageant le budget
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "1"))
+CPU_PINNING = os.getenv("CPU_PINNING", "0") == "1"
+WORKER_INDEX = os.getenv("WORKER_INDEX")                            # rang du worker, pour l'épinglage
+
+
+def available_cores():
+    """Cœurs utilisables par le processus (affinité comprise)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def compute_budget(workers=1, core_budget=0, interop_threads=TORCH_INTEROP_THREADS):
+    """Répartit le budget de cœurs entre workers et retourne la part d'un worker"""
+    cores = available_cores()
+    total = min(core_budget, len(cores)) if core_budget > 0 else len(cores)
+    workers = max(1, int(workers))
+    per_worker = max(1, total // workers)
+    return {
+        "cores": total,
+        "workers": workers,
+        "intra_op_threads": per_worker,
+        "interop_threads": max(1, min(interop_threads, per_worker)),
+        "opencv_threads": per_worker,
+    }
+
+
+def worker_cores(budget, worker_index):
+    """Cœurs attribués au worker worker_index (tranches contiguës du budget)"""
+    cores = available_cores()[:budget["cores"]]
+    per_worker = budget["intra_op_threads"]
+    start = (worker_index % budget["workers"]) * per_worker
+    return cores[start:start + per_worker] or cores
+
+
+_settings = None
+_lock = threading.Lock()
+
+
+def apply_thread_budget(workers=WEB_CONCURRENCY, core_budget=CPU_CORE_BUDGET, pin=CPU_PINNING, worker_index=None):
+    """
+    Applique le budget au processus courant. À appeler au démarrage, avant le
+    chargement des modèles : torch refuse de changer les threads inter-op une
+    fois du travail parallèle lancé.
+
+    Returns:
+        Réglages effectifs (voir get_thread_settings)
+    """
+    global _settings
+    with _lock:
+        budget = compute_budget(workers, core_budget)
+        threads = budget["intra_op_threads"]
+
+        # Bibliothèques natives pas encore initialisées (MKL, OpenMP)
+        os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+        os.environ.setdefault("MKL_NUM_THREADS", str(threads))
+
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(budget["interop_threads"])
+        except RuntimeError as e:
+            logger.warning(f"Threads inter-op déjà fixés, réglage ignoré: {e}")
+        cv2.setNumThreads(budget["opencv_threads"])
+
+        pinned = None
+        if pin and hasattr(os, "sched_setaffinity"):
+            if worker_index is None and WORKER_INDEX is not None:
+                worker_index = int(WORKER_INDEX)
+            # Sans rang connu, le worker est borné à l'ensemble des cœurs du budget
+            pinned = worker_cores(budget, worker_index) if worker_index is not None else available_cores()[:budget["cores"]]
+            try:
+                os.sched_setaffinity(0, pinned)
+            except OSError as e:
+                logger.warning(f"Épinglage CPU impossible: {e}")
+                pinned = None
+
+        _settings = {"budget": budget, "pinned_cores": pinned}
+    settings = get_thread_settings()
+    logger.info(
+        f"Budget CPU: {budget['cores']} cœurs / {budget['workers']} worker(s) -> "
+        f"torch={settings['torch_threads']} (inter-op {settings['torch_interop_threads']}), "
+        f"opencv={settings['opencv_threads']}"
+    )
+    return settings
+
+
+def get_thread_settings():
+    """Réglages de threads effectivement en vigueur dans le processus"""
+    return {
+        "budget": _settings["budget"] if _settings else None,
+        "pinned_cores": _settings["pinned_cores"] if _settings else None,
+        "torch_threads": torch.get_num_threads(),
+        "torch_interop_threads": torch.get_num_interop_threads(),
+        "opencv_threads": cv2.getNumThreads(),
+        "omp_num_threads": os.environ.get("OMP_NUM_THREADS"),
+        "affinity": available_cores(),
+    }
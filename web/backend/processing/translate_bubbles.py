@@ -16,12 +16,14 @@ import json
 
 import numpy as np
 
-import easyocr
-
 import openai
 
 import logging
 
+import threading
+
+from functools import partial
+
 from pathlib import Path
 
 
@@ -46,97 +48,28 @@ except ImportError:
 
 
 
-from detectron2.config import get_cfg
-
-from detectron2.engine import DefaultPredictor
+from .masks import masks_of
 
-from detectron2 import model_zoo
+from .ocr import read_bubbles
 
+from .ocr_readers import resolve_languages
 
+from .translation import (
+    TRANSLATION_ASYNC, TRANSLATION_BACKEND, TRANSLATION_BATCH, TRANSLATION_MODEL, AsyncTranslator, BatchSession,
+    request_tokens, translate_page
+)
 
-# Configuration du logging
-
-logger = logging.getLogger(__name__)
-
+from .translation_local import LocalSeq2SeqBackend, StubBackend
 
+from .translation_scheduler import get_translation_scheduler
 
-# === CONFIGURATION DETECTRON2 ===
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
-
-cfg = get_cfg()
-cfg.merge_from_file(model_zoo.get_config_file("COCO-InstanceSegmentation/mask_rcnn_R_50_FPN_3x.yaml"))
-
-# Télécharger le modèle depuis Hugging Face si nécessaire
-def get_model_path():
-    """Obtenir le chemin du modèle, le télécharger depuis Hugging Face si nécessaire"""
-    model_path = os.path.join(PROJECT_DIR, "models_ai", "model_final.pth")
-    
-    if os.path.exists(model_path):
-        print(f"✅ Modèle local trouvé: {model_path}")
-        return model_path
-    
-    print("🔧 Modèle local non trouvé, téléchargement depuis Hugging Face...")
-    try:
-        from huggingface_hub import hf_hub_download
-        import time
-        
-        # Retry avec timeout
-        for attempt in range(3):
-            try:
-                print(f"🔧 Tentative {attempt + 1}/3...")
-                model_path = hf_hub_download(
-                    repo_id="HaashS/modelev1",
-                    filename="model_final.pth",
-                    local_dir=os.path.join(PROJECT_DIR, "models_ai"),
-                    local_files_only=False,
-                    resume_download=True
-                )
-                print(f"✅ Modèle téléchargé depuis Hugging Face: {model_path}")
-                return model_path
-            except Exception as e:
-                print(f"⚠️  Tentative {attempt + 1} échouée: {e}")
-                if attempt < 2:
-                    print("🔄 Nouvelle tentative dans 5 secondes...")
-                    time.sleep(5)
-                else:
-                    raise e
-    except Exception as e:
-        print(f"❌ Erreur téléchargement Hugging Face après 3 tentatives: {e}")
-        raise Exception(f"Impossible de télécharger le modèle depuis Hugging Face: {e}")
-
-# Obtenir le chemin du modèle
-model_path = get_model_path()
-print(f"🔧 Chemin du modèle: {model_path}")
+from .translation_memory import get_translation_memory
 
-# Vérifier la taille du fichier
-file_size = os.path.getsize(model_path)
-print(f"🔧 Taille du fichier: {file_size} bytes")
 
-# Vérifier si le fichier est valide
-try:
-    import torch
-    test_model = torch.load(model_path, map_location='cpu', weights_only=False)
-    print(f"✅ Modèle valide (taille: {file_size} bytes)")
-    cfg.MODEL.WEIGHTS = model_path
-    logger.info(f"Chargement du modèle personnalisé: {model_path}")
-except Exception as e:
-    logger.error(f"Erreur lors de la validation du modèle personnalisé: {e}")
-    print(f"❌ Erreur validation modèle personnalisé: {e}")
-    raise Exception(f"Impossible de charger le modèle personnalisé: {e}")
-
-cfg.MODEL.ROI_HEADS.SCORE_THRESH_TEST = 0.5
-cfg.MODEL.ROI_HEADS.NUM_CLASSES = 3
-cfg.MODEL.DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
-try:
-    predictor = DefaultPredictor(cfg)
-    logger.info("Modèle Detectron2 chargé avec succès")
-except Exception as e:
-    logger.error(f"Erreur lors du chargement du modèle: {e}")
-    predictor = None
+# Configuration du logging
 
-reader = easyocr.Reader(['en'], gpu=True)
+logger = logging.getLogger(__name__)
 
 
 
@@ -154,7 +87,7 @@ CONFIDENCE_THRESHOLD = 0.5
 
 api_key = os.getenv("OPENAI_API_KEY")
 
-if not api_key:
+if not api_key and TRANSLATION_BACKEND == "openai":
 
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
@@ -214,33 +147,49 @@ def create_openai_client():
 
 
 
-client = create_openai_client()
+# Sans clé (moteur local ou stub), pas de client OpenAI ; nouvelles tentatives : translation_scheduler
+
+client = create_openai_client().with_options(max_retries=0) if api_key else None
 
+async_translator = AsyncTranslator(api_key)
 
 
-def translate(text):
+
+def translate(text, requester=None):
 
     if not text.strip():
 
         return ""
 
+    messages = [
+
+        {"role": "system", "content": "Tu es un traducteur automatique. Ne commente jamais. Donne uniquement la traduction française brute du texte fourni."},
+
+        {"role": "user", "content": f"Traduis ce texte en français : {text}"}
+
+    ]
+
     try:
 
-        response = client.chat.completions.create(
+        # Limites de débit, files par utilisateur et nouvelles tentatives : translation_scheduler
+
+        response = get_translation_scheduler().run(
 
-            model="gpt-3.5-turbo",
+            lambda: client.chat.completions.create(
 
-            messages=[
+                model=TRANSLATION_MODEL,
 
-                {"role": "system", "content": "Tu es un traducteur automatique. Ne commente jamais. Donne uniquement la traduction française brute du texte fourni."},
+                messages=messages,
 
-                {"role": "user", "content": f"Traduis ce texte en français : {text}"}
+                max_tokens=150,
 
-            ],
+                temperature=0.3
 
-            max_tokens=150,
+            ),
 
-            temperature=0.3
+            request_tokens(messages, 150),
+
+            requester
 
         )
 
@@ -250,37 +199,155 @@ def translate(text):
 
         logger.error("ERREUR: Erreur d'authentification OpenAI. Verifiez votre cle API.")
 
-        return f"[ERREUR: Clé API invalide]"
-
     except openai.RateLimitError:
 
-        logger.error("ERREUR: Limite de taux depassee. Attendez avant de reessayer.")
-
-        return f"[ERREUR: Limite de taux]"
+        logger.error("ERREUR: Limite de taux depassee malgre les nouvelles tentatives.")
 
     except Exception as e:
 
         logger.error(f"ERREUR: Erreur de traduction: {e}")
 
-        return f"[ERREUR DE TRADUCTION: {str(e)}]"
+    # Bulle laissée sans traduction plutôt qu'un message d'erreur dessiné dans la page
 
+    return ""
 
 
-def clean_ocr(text):
 
-    return text.replace("\n", " ").replace("  ", " ").strip()
+def translate_texts(texts, source_lang="", requester=None):
+
+    """Traductions des textes d'une page : une requête groupée (TRANSLATION_BATCH), sinon une par bulle"""
+
+    if TRANSLATION_BATCH:
+
+        return translate_page(texts, client, fallback=partial(translate, requester=requester),
+
+                              memory=get_translation_memory(), source_lang=source_lang, requester=requester)
+
+    return [translate(text, requester) for text in texts]
+
+
+
+def source_language(languages=None):
+
+    """Langue source des clés de la mémoire de traduction (jeu de langues OCR)"""
+
+    return "+".join(resolve_languages(languages))
+
+
+
+class OpenAIBackend:
+
+    """Moteur de traduction par défaut : API OpenAI"""
+
+
+
+    name = "openai"
+
+
+
+    def session(self, memory=None, source_lang="", requester=None):
+
+        """Session alimentée au fil de l'OCR (client asynchrone), sinon requêtes groupées en fin d'OCR"""
+
+        if TRANSLATION_ASYNC:
+
+            return async_translator.session(fallback=partial(translate, requester=requester), memory=memory,
+
+                                            source_lang=source_lang, requester=requester)
+
+        # translate_page consulte déjà la mémoire de traduction
+
+        return BatchSession(partial(translate_texts, source_lang=source_lang, requester=requester))
+
+
 
+TRANSLATION_BACKENDS = {
 
+    "openai": OpenAIBackend,
 
-def extract_text_easyocr(image):
+    "local": LocalSeq2SeqBackend,
 
-    results = reader.readtext(image)
+    "stub": StubBackend,
 
-    return " ".join([text for _, text, _ in results]).strip()
+}
 
+_translation_backends = {}
 
+_translation_backends_lock = threading.Lock()
 
-def extract_and_translate(image, outputs):
+
+
+def get_translation_backend(name=None):
+
+    """
+
+    Moteur de traduction par nom (TRANSLATION_BACKEND par défaut), instancié au premier usage
+
+
+
+    Raises:
+
+        ValueError: moteur inconnu
+
+    """
+
+    name = (name or TRANSLATION_BACKEND).lower()
+
+    if name not in TRANSLATION_BACKENDS:
+
+        raise ValueError(f"Moteur de traduction inconnu: {name} (attendu: {', '.join(sorted(TRANSLATION_BACKENDS))})")
+
+    with _translation_backends_lock:
+
+        if name not in _translation_backends:
+
+            _translation_backends[name] = TRANSLATION_BACKENDS[name]()
+
+        return _translation_backends[name]
+
+
+
+def start_translation(languages=None, requester=None):
+
+    """Session de traduction de la page (TRANSLATION_BACKEND), alimentée par l'OCR au fil de l'eau"""
+
+    return get_translation_backend().session(memory=get_translation_memory(), source_lang=source_language(languages),
+
+                                             requester=requester)
+
+
+
+def on_ocr_texts(session, ids):
+
+    """Callback OCR : envoie les textes reconnus (positions -> ids) à la session"""
+
+    return lambda pairs: session.feed([(ids[k], clean_ocr(text)) for k, text in pairs])
+
+
+
+def finish_translation(session, items):
+
+    """Traductions de [(id, texte), ...], dans l'ordre des éléments"""
+
+    translations = session.finish()
+
+    return [translations.get(item_id, "") for item_id, _ in items]
+
+
+
+def clean_ocr(text):
+
+    return text.replace("\n", " ").replace("  ", " ").strip()
+
+
+
+def extract_and_translate(image, outputs, languages=None, ocr_backend=None, requester=None):
+
+    # languages : langue source de l'OCR ("en", "ja", "ko", "zh"...), OCR_LANGUAGES par défaut
+
+    # ocr_backend : moteur OCR imposé par la requête, sinon par classe de bulle / OCR_BACKEND
+
+    # requester : utilisateur à l'origine de la page (file équitable de translation_scheduler)
 
     # Gérer à la fois les outputs de Detectron2 et nos MockOutputs
 
@@ -298,7 +365,7 @@ def extract_and_translate(image, outputs):
 
     
 
-    masks = instances.pred_masks.to("cpu").numpy()
+    masks = masks_of(instances)
 
     classes = instances.pred_classes.to("cpu").numpy()
 
@@ -306,7 +373,9 @@ def extract_and_translate(image, outputs):
 
 
 
-    results = []
+    # Sélection des bulles puis OCR de toute la page (une détection de lignes, textes dans l'ordre des bulles)
+
+    candidates = []
 
     for i, (mask, class_id, score) in enumerate(zip(masks, classes, scores)):
 
@@ -314,25 +383,45 @@ def extract_and_translate(image, outputs):
 
             continue
 
+        if mask.is_empty:
 
+            continue
 
-        class_name = CLASS_NAMES.get(class_id, "unknown")
+        # Boîte du masque compact, sans parcours de l'image
 
-        y_indices, x_indices = np.where(mask)
+        x_min, y_min, x_max, y_max = mask.bbox
 
-        if len(x_indices) == 0 or len(y_indices) == 0:
+        candidates.append((i, CLASS_NAMES.get(class_id, "unknown"), score, (x_min, y_min, x_max, y_max)))
 
-            continue
+    session = start_translation(languages, requester)
+
+    texts = read_bubbles(
+
+        image,
+
+        [bbox for _, _, _, bbox in candidates],
+
+        masks=[masks[i] for i, _, _, _ in candidates],
 
-        x_min, x_max = np.min(x_indices), np.max(x_indices)
+        languages=languages,
 
-        y_min, y_max = np.min(y_indices), np.max(y_indices)
+        backend=ocr_backend,
 
+        classes=[class_name for _, class_name, _, _ in candidates],
 
+        on_texts=on_ocr_texts(session, [i for i, _, _, _ in candidates])
 
-        roi = image[y_min:y_max, x_min:x_max]
+    )
 
-        ocr_text = extract_text_easyocr(roi)
+
+
+    # Bulles avec texte, puis traduction de toute la page
+
+    recognized = []
+
+    for candidate, ocr_text in zip(candidates, texts):
+
+        i, class_name, score, _ = candidate
 
         ocr_text = clean_ocr(ocr_text)
 
@@ -348,11 +437,15 @@ def extract_and_translate(image, outputs):
 
             continue
 
+        recognized.append((candidate, ocr_text))
+
+    translations = finish_translation(session, [(candidate[0], ocr_text) for candidate, ocr_text in recognized])
 
 
-        translated_text = translate(ocr_text)
 
+    results = []
 
+    for ((i, class_name, score, (x_min, y_min, x_max, y_max)), ocr_text), translated_text in zip(recognized, translations):
 
         results.append({
 
@@ -0,0 +1,387 @@
+"""
+Traduction groupée des bulles d'une page
+
+translate() envoie une requête chat.completions par bulle, avec le même
+prompt système à chaque fois : une page de 30 bulles coûte 30 allers-retours
+et 30 copies du prompt. Ici, tous les textes OCR d'une page partent dans une
+seule requête, sous forme de liste JSON indexée, et la réponse est une liste
+indexée de traductions.
+
+- Les lots sont découpés selon un budget de tokens (TRANSLATION_TOKEN_BUDGET).
+- Seuls les éléments absents ou invalides de la réponse sont renvoyés, dans
+  une nouvelle requête (TRANSLATION_MAX_RETRIES fois au plus).
+- Les éléments encore manquants passent par la traduction bulle par bulle.
+- Avec une mémoire de traduction (translation_memory), les textes déjà
+  traduits ne sont pas envoyés et les nouvelles traductions valides y sont
+  enregistrées.
+
+Avec TRANSLATION_ASYNC=1, les requêtes partent du client OpenAI asynchrone,
+sur une boucle asyncio dédiée : l'OCR alimente une session de page
+(AsyncTranslator.session) dès que des textes sont reconnus, les lots partent
+aussitôt, en parallèle (TRANSLATION_CONCURRENCY requêtes au plus, chacune
+bornée par TRANSLATION_TIMEOUT secondes), et finish() réunit les résultats.
+
+Toutes les requêtes passent par translation_scheduler (limites de débit,
+files par utilisateur, nouvelles tentatives) ; requester identifie
+l'utilisateur à l'origine de la page.
+"""
+
+import os
+import re
+import json
+import asyncio
+import logging
+import threading
+
+from .translation_scheduler import get_translation_scheduler
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_BATCH = os.getenv("TRANSLATION_BATCH", "1") == "1"
+TRANSLATION_TOKEN_BUDGET = int(os.getenv("TRANSLATION_TOKEN_BUDGET", "1500"))  # tokens de texte source par requête
+TRANSLATION_MAX_RETRIES = int(os.getenv("TRANSLATION_MAX_RETRIES", "2"))
+TRANSLATION_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+TRANSLATION_TEMPERATURE = 0.3
+TRANSLATION_TARGET_LANGUAGE = "fr"
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "openai").lower()  # "openai", "local" ou "stub"
+TRANSLATION_ASYNC = os.getenv("TRANSLATION_ASYNC", "1") == "1"
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "4"))  # requêtes simultanées
+TRANSLATION_TIMEOUT = float(os.getenv("TRANSLATION_TIMEOUT", "30"))       # secondes par requête
+TOKENS_PER_ITEM = 12  # surcoût JSON d'un élément (id, guillemets, séparateurs)
+
+SYSTEM_PROMPT = (
+    "Tu es un traducteur automatique de bulles de bande dessinée. Ne commente jamais. "
+    "Tu reçois un objet JSON {\"items\": [{\"id\": ..., \"text\": ...}]}. Traduis chaque texte en français "
+    "et réponds uniquement avec un objet JSON {\"translations\": [{\"id\": ..., \"text\": ...}]} "
+    "contenant exactement un élément par id reçu."
+)
+
+
+def estimate_tokens(text):
+    """Estimation prudente du nombre de tokens (environ 3 caractères par token)"""
+    return len(text) // 3 + 1
+
+
+def split_batches(items, token_budget=TRANSLATION_TOKEN_BUDGET):
+    """Découpe [(id, texte), ...] en lots dont le texte source tient dans le budget de tokens"""
+    batches, current, used = [], [], 0
+    for item in items:
+        cost = estimate_tokens(item[1]) + TOKENS_PER_ITEM
+        if current and used + cost > token_budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_messages(batch):
+    payload = {"items": [{"id": item_id, "text": text} for item_id, text in batch]}
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+    ]
+
+
+def max_output_tokens(batch):
+    """Marge de sortie : le français est plus long que l'anglais, plus le JSON"""
+    return min(4096, sum(2 * estimate_tokens(text) + TOKENS_PER_ITEM for _, text in batch) + 50)
+
+
+def request_tokens(messages, max_tokens):
+    """Tokens décomptés par l'API pour une requête : prompt estimé et sortie maximale"""
+    return sum(estimate_tokens(message["content"]) for message in messages) + max_tokens
+
+
+def parse_response(content, expected_ids):
+    """
+    Traductions valides d'une réponse indexée : {id: texte} pour les ids
+    attendus dont la traduction est une chaîne non vide
+    """
+    match = re.search(r"\{.*\}", content or "", re.DOTALL)
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    entries = data.get("translations") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return {}
+
+    valid = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        item_id, text = entry.get("id"), entry.get("text")
+        if isinstance(item_id, str) and item_id.isdigit():
+            item_id = int(item_id)
+        if item_id in expected_ids and isinstance(text, str) and text.strip():
+            valid[item_id] = text.strip()
+    return valid
+
+
+def request_batch(client, batch, model=TRANSLATION_MODEL, requester=None):
+    """Une requête pour un lot, via l'ordonnanceur ; retourne les traductions valides {id: texte}"""
+    messages, max_tokens = build_messages(batch), max_output_tokens(batch)
+
+    def call():
+        return client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=TRANSLATION_TEMPERATURE,
+        )
+
+    response = get_translation_scheduler().run(call, request_tokens(messages, max_tokens), requester)
+    return parse_response(response.choices[0].message.content, {item_id for item_id, _ in batch})
+
+
+def translate_page(texts, client, fallback=None, token_budget=TRANSLATION_TOKEN_BUDGET,
+                   max_retries=TRANSLATION_MAX_RETRIES, model=TRANSLATION_MODEL, memory=None, source_lang="",
+                   requester=None):
+    """
+    Traduit tous les textes d'une page en un minimum de requêtes
+
+    Args:
+        texts: textes OCR, dans l'ordre des bulles
+        client: client OpenAI
+        fallback: fallback(texte) -> traduction, pour les éléments restés
+                  invalides après les nouvelles tentatives
+        memory: mémoire de traduction (lookup/remember), optionnelle
+        source_lang: langue source, pour les clés de la mémoire
+        requester: utilisateur à l'origine de la page (file de l'ordonnanceur)
+
+    Returns:
+        Traductions dans l'ordre de texts ("" pour un texte vide)
+    """
+    translations = ["" for _ in texts]
+    pending = [(i, text) for i, text in enumerate(texts) if text.strip()]
+    if memory is not None:
+        remembered = memory.lookup(pending, source_lang, TRANSLATION_TARGET_LANGUAGE, model)
+        for item_id, translation in remembered.items():
+            translations[item_id] = translation
+        pending = [(item_id, text) for item_id, text in pending if item_id not in remembered]
+    requests = 0
+    learned = []
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        failed = []
+        for batch in split_batches(pending, token_budget):
+            requests += 1
+            try:
+                valid = request_batch(client, batch, model, requester)
+            except Exception as e:
+                logger.error(f"ERREUR: Erreur de traduction groupée ({len(batch)} bulle(s)): {e}")
+                valid = {}
+            for item_id, text in batch:
+                if item_id in valid:
+                    translations[item_id] = valid[item_id]
+                    learned.append((text, valid[item_id]))
+                else:
+                    failed.append((item_id, text))
+        if failed and attempt < max_retries:
+            logger.warning(f"Traduction groupée: {len(failed)} élément(s) invalide(s), nouvelle tentative")
+        pending = failed
+
+    if memory is not None:
+        memory.remember(learned, source_lang, TRANSLATION_TARGET_LANGUAGE, model)
+    if pending and fallback is not None:
+        logger.warning(f"Traduction groupée: {len(pending)} élément(s) traduit(s) bulle par bulle")
+        for item_id, text in pending:
+            translations[item_id] = fallback(text)
+    logger.info(f"Traduction groupée: {len(texts)} bulle(s) en {requests} requête(s)")
+    return translations
+
+
+class AsyncTranslator:
+    """
+    Client OpenAI asynchrone sur une boucle asyncio dédiée, partagé par les
+    pages ; les appels se font depuis des threads ordinaires (submit)
+    """
+
+    def __init__(self, api_key, concurrency=TRANSLATION_CONCURRENCY, timeout=TRANSLATION_TIMEOUT,
+                 model=TRANSLATION_MODEL):
+        self.api_key = api_key
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.model = model
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="translation-loop", daemon=True).start()
+            return self._loop
+
+    async def _request(self, batch, requester=None):
+        # Client et sémaphore créés dans la boucle dédiée, qui est seule à les utiliser
+        if self._client is None:
+            import openai
+            # Nouvelles tentatives : translation_scheduler, pas le client
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, timeout=self.timeout, max_retries=0)
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        messages, max_tokens = build_messages(batch), max_output_tokens(batch)
+
+        async def call():
+            async with self._semaphore:
+                return await asyncio.wait_for(
+                    self._client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=TRANSLATION_TEMPERATURE,
+                    ),
+                    self.timeout,
+                )
+
+        response = await get_translation_scheduler().run_async(call, request_tokens(messages, max_tokens), requester)
+        return parse_response(response.choices[0].message.content, {item_id for item_id, _ in batch})
+
+    def submit(self, batch, requester=None):
+        """Envoie un lot [(id, texte), ...] ; retourne un Future de {id: texte}"""
+        return asyncio.run_coroutine_threadsafe(self._request(batch, requester), self._ensure_loop())
+
+    def session(self, fallback=None, memory=None, source_lang="", requester=None):
+        """Session de traduction d'une page (lots groupés si TRANSLATION_BATCH, sinon un élément par requête)"""
+        return PageSession(self, fallback, TRANSLATION_TOKEN_BUDGET if TRANSLATION_BATCH else 0,
+                           memory=memory, source_lang=source_lang, requester=requester)
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+
+
+class PageSession:
+    """Traductions d'une page : chaque lot part dès que ses textes arrivent, finish() réunit les résultats"""
+
+    def __init__(self, translator, fallback=None, token_budget=TRANSLATION_TOKEN_BUDGET,
+                 max_retries=TRANSLATION_MAX_RETRIES, memory=None, source_lang="", requester=None):
+        self.translator = translator
+        self.fallback = fallback
+        self.token_budget = token_budget
+        self.max_retries = max_retries
+        self.memory = memory
+        self.source_lang = source_lang
+        self.requester = requester
+        self._submitted = []  # [(lot, future), ...]
+        self._remembered = {}  # id -> traduction trouvée dans la mémoire
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    def feed(self, items):
+        """
+        Envoie [(id, texte), ...] sans attendre la réponse ; les textes vides
+        et ceux déjà dans la mémoire de traduction ne partent pas
+        """
+        items = [(item_id, text) for item_id, text in items if text.strip()]
+        if self.memory is not None:
+            remembered = self.memory.lookup(items, self.source_lang, TRANSLATION_TARGET_LANGUAGE,
+                                            self.translator.model)
+            with self._lock:
+                self._remembered.update(remembered)
+            items = [(item_id, text) for item_id, text in items if item_id not in remembered]
+        self._submit(items)
+
+    def _submit(self, items):
+        submitted = [
+            (batch, self.translator.submit(batch, self.requester)) for batch in split_batches(items, self.token_budget)
+        ]
+        with self._lock:
+            self._submitted.extend(submitted)
+            self._requests += len(submitted)
+
+    def finish(self):
+        """Attend les lots envoyés, renvoie les éléments invalides ; retourne {id: traduction}"""
+        translations, failed, learned = {}, [], []
+        items = 0
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                submitted, self._submitted = self._submitted, []
+            failed = []
+            for batch, future in submitted:
+                try:
+                    valid = future.result()
+                except Exception as e:
+                    logger.error(f"ERREUR: Erreur de traduction asynchrone ({len(batch)} bulle(s)): {e}")
+                    valid = {}
+                for item_id, text in batch:
+                    if item_id in valid:
+                        translations[item_id] = valid[item_id]
+                        learned.append((text, valid[item_id]))
+                    else:
+                        failed.append((item_id, text))
+            if attempt == 0:
+                items = sum(len(batch) for batch, _ in submitted)
+            if not failed or attempt == self.max_retries:
+                break
+            logger.warning(f"Traduction asynchrone: {len(failed)} élément(s) invalide(s), nouvelle tentative")
+            self._submit(failed)
+
+        if self.memory is not None:
+            self.memory.remember(learned, self.source_lang, TRANSLATION_TARGET_LANGUAGE, self.translator.model)
+            with self._lock:
+                translations.update(self._remembered)
+        if failed and self.fallback is not None:
+            logger.warning(f"Traduction asynchrone: {len(failed)} élément(s) traduit(s) bulle par bulle")
+            for item_id, text in failed:
+                translations[item_id] = self.fallback(text)
+        logger.info(f"Traduction asynchrone: {items} bulle(s) en {self._requests} requête(s)")
+        return translations
+
+
+class BatchSession:
+    """
+    Session sans envoi au fil de l'eau : les textes reconnus sont réunis
+    pendant l'OCR puis traduits en une fois par translate_batch(textes)
+    à finish() (moteurs locaux, requêtes OpenAI synchrones)
+    """
+
+    def __init__(self, translate_batch, memory=None, source_lang="", model=""):
+        self.translate_batch = translate_batch
+        self.memory = memory
+        self.source_lang = source_lang
+        self.model = model
+        self._items = []
+        self._lock = threading.Lock()
+
+    def feed(self, items):
+        with self._lock:
+            self._items.extend((item_id, text) for item_id, text in items if text.strip())
+
+    def finish(self):
+        """Traduit les textes réunis ; retourne {id: traduction}"""
+        with self._lock:
+            items, self._items = self._items, []
+        translations = {}
+        if self.memory is not None:
+            translations = self.memory.lookup(items, self.source_lang, TRANSLATION_TARGET_LANGUAGE, self.model)
+            items = [(item_id, text) for item_id, text in items if item_id not in translations]
+        if not items:
+            return translations
+        try:
+            texts = self.translate_batch([text for _, text in items])
+        except Exception as e:
+            logger.error(f"ERREUR: Erreur de traduction ({self.model or 'lot'}): {e}")
+            return translations
+        learned = []
+        for (item_id, text), translation in zip(items, texts):
+            translations[item_id] = translation
+            if translation:
+                learned.append((text, translation))
+        if self.memory is not None:
+            self.memory.remember(learned, self.source_lang, TRANSLATION_TARGET_LANGUAGE, self.model)
+        return translations
@@ -0,0 +1,199 @@
+"""
+Mémoire de traduction
+
+Les phrases récurrentes ("What?!", noms de personnages, onomatopées) et les
+pages retraitées repartaient vers OpenAI à chaque fois. Chaque traduction
+valide est mémorisée sous une clé calculée sur le texte source normalisé
+(Unicode NFKC, espaces, casse), la langue source, la langue cible et le
+modèle :
+
+- un LRU en mémoire (TRANSLATION_MEMORY_LRU_ENTRIES) garde les phrases
+  fréquentes sans aller-retour vers la base ;
+- la table translation_memory de la base de l'application les partage entre
+  workers et redémarrages. Les entrées inutilisées depuis
+  TRANSLATION_MEMORY_TTL_DAYS jours expirent, et au-delà de
+  TRANSLATION_MEMORY_MAX_ENTRIES les moins récemment utilisées sont
+  supprimées (nettoyage toutes les TRANSLATION_MEMORY_CLEANUP_EVERY écritures).
+
+Les messages d'erreur et les traductions de secours ne sont jamais mémorisés.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_MEMORY = os.getenv("TRANSLATION_MEMORY", "1") == "1"
+TRANSLATION_MEMORY_LRU_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_LRU_ENTRIES", "2048"))
+TRANSLATION_MEMORY_TTL_DAYS = float(os.getenv("TRANSLATION_MEMORY_TTL_DAYS", "90"))         # 0 = pas d'expiration
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "100000"))  # 0 = pas de plafond
+TRANSLATION_MEMORY_CLEANUP_EVERY = int(os.getenv("TRANSLATION_MEMORY_CLEANUP_EVERY", "500"))
+
+
+def normalize_source(text):
+    """Texte source normalisé : Unicode NFKC, espaces réduits, sans casse"""
+    return " ".join(unicodedata.normalize("NFKC", text).split()).casefold()
+
+
+def memory_key(text, source_lang, target_lang, model):
+    """Clé d'une traduction (64 caractères hexadécimaux)"""
+    digest = hashlib.blake2b(digest_size=32)
+    for part in (normalize_source(text), source_lang, target_lang, model):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DatabaseStore:
+    """Table translation_memory de la base SQLAlchemy de l'application"""
+
+    @staticmethod
+    def _run(operation, *args):
+        from database.database import SessionLocal
+        from crud import crud
+
+        db = SessionLocal()
+        try:
+            return getattr(crud, operation)(db, *args)
+        finally:
+            db.close()
+
+    def get_many(self, keys):
+        return self._run("get_translation_memory_entries", keys)
+
+    def put_many(self, entries):
+        return self._run("save_translation_memory_entries", entries)
+
+    def evict(self, ttl_days, max_entries):
+        return self._run("cleanup_translation_memory", ttl_days, max_entries)
+
+
+class TranslationMemory:
+    """Mémoire de traduction : LRU en mémoire devant un stockage persistant"""
+
+    def __init__(self, store=None, lru_entries=TRANSLATION_MEMORY_LRU_ENTRIES, ttl_days=TRANSLATION_MEMORY_TTL_DAYS,
+                 max_entries=TRANSLATION_MEMORY_MAX_ENTRIES, cleanup_every=TRANSLATION_MEMORY_CLEANUP_EVERY,
+                 enabled=TRANSLATION_MEMORY):
+        self.enabled = enabled
+        self.store = store
+        self.lru_entries = max(1, lru_entries)
+        self.ttl_days = ttl_days
+        self.max_entries = max_entries
+        self.cleanup_every = max(1, cleanup_every)
+        self._lru = OrderedDict()  # clé -> traduction
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._stats = {"lru_hits": 0, "store_hits": 0, "misses": 0, "writes": 0, "evictions": 0, "store_errors": 0}
+
+    def _insert(self, key, translation):
+        self._lru[key] = translation
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_entries:
+            self._lru.popitem(last=False)
+
+    def lookup(self, items, source_lang, target_lang, model):
+        """Traductions mémorisées de [(id, texte), ...] : {id: traduction}"""
+        if not self.enabled or not items:
+            return {}
+        keys = {item_id: memory_key(text, source_lang, target_lang, model) for item_id, text in items}
+        found, missing = {}, []
+        with self._lock:
+            for item_id, key in keys.items():
+                translation = self._lru.get(key)
+                if translation is None:
+                    missing.append(key)
+                else:
+                    self._lru.move_to_end(key)
+                    found[item_id] = translation
+                    self._stats["lru_hits"] += 1
+
+        stored = {}
+        if missing and self.store is not None:
+            try:
+                stored = self.store.get_many(sorted(set(missing)))
+            except Exception as e:
+                logger.warning(f"Mémoire de traduction indisponible: {e}")
+                with self._lock:
+                    self._stats["store_errors"] += 1
+
+        with self._lock:
+            for key, translation in stored.items():
+                self._insert(key, translation)
+            for item_id, key in keys.items():
+                if item_id in found:
+                    continue
+                if key in stored:
+                    found[item_id] = stored[key]
+                    self._stats["store_hits"] += 1
+                else:
+                    self._stats["misses"] += 1
+        return found
+
+    def remember(self, pairs, source_lang, target_lang, model):
+        """Mémorise [(texte source, traduction), ...]"""
+        if not self.enabled or not pairs:
+            return
+        entries = []
+        with self._lock:
+            for text, translation in pairs:
+                key = memory_key(text, source_lang, target_lang, model)
+                self._insert(key, translation)
+                entries.append({
+                    "key": key,
+                    "source_text": normalize_source(text),
+                    "source_lang": source_lang,
+                    "target_lang": target_lang,
+                    "model": model,
+                    "translated_text": translation,
+                })
+            self._stats["writes"] += len(entries)
+            self._writes += len(entries)
+            cleanup = self._writes >= self.cleanup_every
+            if cleanup:
+                self._writes = 0
+        if self.store is None:
+            return
+        try:
+            self.store.put_many(entries)
+            if cleanup:
+                self.cleanup()
+        except Exception as e:
+            logger.warning(f"Impossible d'enregistrer dans la mémoire de traduction: {e}")
+            with self._lock:
+                self._stats["store_errors"] += 1
+
+    def cleanup(self):
+        """Expiration et plafond d'entrées du stockage persistant"""
+        if self.store is None:
+            return 0
+        deleted = self.store.evict(self.ttl_days, self.max_entries)
+        with self._lock:
+            self._stats["evictions"] += deleted
+        if deleted:
+            logger.info(f"Mémoire de traduction: {deleted} entrée(s) supprimée(s)")
+        return deleted
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["lru_entries"] = len(self._lru)
+        hits = stats["lru_hits"] + stats["store_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / total, 3) if total else 0
+        stats["enabled"] = self.enabled
+        stats["max_lru_entries"] = self.lru_entries
+        stats["ttl_days"] = self.ttl_days
+        stats["max_entries"] = self.max_entries
+        return stats
+
+
+_memory = TranslationMemory(DatabaseStore())
+
+
+def get_translation_memory():
+    """Mémoire de traduction partagée par le processus"""
+    return _memory
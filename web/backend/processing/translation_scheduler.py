@@ -0,0 +1,254 @@
+"""
+Ordonnanceur des requêtes de traduction (limites de débit OpenAI)
+
+Sous charge, les requêtes de traduction partaient sans coordination et les
+erreurs 429 finissaient en "[ERREUR: Limite de taux]" dessiné dans la page.
+Ici, toute requête OpenAI du processus passe d'abord par l'ordonnanceur :
+
+- deux seaux à jetons, requêtes/minute (TRANSLATION_RPM) et tokens/minute
+  (TRANSLATION_TPM), limites du compte partagées entre les WEB_CONCURRENCY
+  workers ;
+- une file par utilisateur, servies à tour de rôle : une page de 60 bulles
+  ne fait pas attendre les autres utilisateurs derrière elle ;
+- en cas d'erreur transitoire (429, délai dépassé, 5xx), nouvelle tentative
+  après un délai exponentiel avec gigue (TRANSLATION_BACKOFF_BASE,
+  TRANSLATION_BACKOFF_MAX), ou après le délai indiqué par l'API
+  (retry-after-ms, retry-after, x-ratelimit-reset-*). Un 429 suspend toutes
+  les requêtes du processus pendant ce délai.
+
+Un quota épuisé (insufficient_quota) ou une clé invalide ne sont pas retentés.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import openai
+
+from .thread_budget import WEB_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+TRANSLATION_RPM = int(os.getenv("TRANSLATION_RPM", "500"))                  # requêtes/minute du compte, 0 = illimité
+TRANSLATION_TPM = int(os.getenv("TRANSLATION_TPM", "200000"))               # tokens/minute du compte, 0 = illimité
+TRANSLATION_RATE_RETRIES = int(os.getenv("TRANSLATION_RATE_RETRIES", "5"))
+TRANSLATION_BACKOFF_BASE = float(os.getenv("TRANSLATION_BACKOFF_BASE", "1.0"))  # secondes
+TRANSLATION_BACKOFF_MAX = float(os.getenv("TRANSLATION_BACKOFF_MAX", "60"))     # secondes
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+    TimeoutError,
+)
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """Durée des en-têtes x-ratelimit-reset-* ("1s", "6m0s", "250ms") en secondes, ou None"""
+    if not value:
+        return None
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def retry_after(error):
+    """Délai demandé par l'API pour cette erreur, en secondes, ou None"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    resets = [parse_duration(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def is_retryable(error):
+    """Erreur transitoire : limite de débit (hors quota épuisé), délai dépassé, connexion, 5xx"""
+    if isinstance(error, openai.RateLimitError) and getattr(error, "code", None) == "insufficient_quota":
+        return False
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class TokenBucket:
+    """Seau à jetons rempli en continu, capacity jetons par minute (0 = illimité)"""
+
+    def __init__(self, per_minute):
+        self.capacity = max(0.0, float(per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Secondes avant de pouvoir prendre amount jetons"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        if self.capacity:
+            self.tokens -= min(amount, self.capacity)
+
+
+class TranslationScheduler:
+    """Files équitables par utilisateur, servies selon les seaux de requêtes et de tokens"""
+
+    def __init__(self, requests_per_minute=TRANSLATION_RPM, tokens_per_minute=TRANSLATION_TPM,
+                 max_retries=TRANSLATION_RATE_RETRIES, backoff_base=TRANSLATION_BACKOFF_BASE,
+                 backoff_max=TRANSLATION_BACKOFF_MAX):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._queues = OrderedDict()  # demandeur -> deque[(tokens, future)], servis à tour de rôle
+        self._paused_until = 0.0
+        self._thread = None
+        self._condition = threading.Condition()
+        self._stats = {"requests": 0, "retries": 0, "rate_limited": 0, "failures": 0, "throttled_seconds": 0.0}
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="translation-scheduler", daemon=True)
+            self._thread.start()
+
+    def acquire(self, tokens, requester=None):
+        """Retourne un Future résolu quand une requête de tokens tokens peut partir"""
+        future = Future()
+        with self._condition:
+            self._ensure_started()
+            self._queues.setdefault(requester, deque()).append((tokens, future))
+            self._condition.notify()
+        return future
+
+    def _run(self):
+        with self._condition:
+            while True:
+                if not self._queues:
+                    self._condition.wait()
+                    continue
+                requester, queue = next(iter(self._queues.items()))
+                tokens, future = queue[0]
+                now = time.monotonic()
+                wait = max(self._paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                if wait > 0:
+                    self._condition.wait(wait)
+                    self._stats["throttled_seconds"] += time.monotonic() - now
+                    continue
+
+                queue.popleft()
+                del self._queues[requester]
+                if queue:
+                    self._queues[requester] = queue  # en fin de tour
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                self._stats["requests"] += 1
+                future.set_result(None)
+
+    def backoff(self, attempt, error):
+        """Délai avant la tentative suivante ; un 429 suspend tout le processus pendant ce délai"""
+        delay = retry_after(error)
+        if delay is None:
+            # Gigue complète : tirage uniforme sous la borne exponentielle
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        delay = min(delay, self.backoff_max)
+        with self._condition:
+            self._stats["retries"] += 1
+            if isinstance(error, openai.RateLimitError):
+                self._stats["rate_limited"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._condition.notify()
+        return delay
+
+    def _give_up(self, error):
+        with self._condition:
+            self._stats["failures"] += 1
+        logger.error(f"ERREUR: Requête de traduction abandonnée: {error}")
+
+    def run(self, call, tokens, requester=None):
+        """Exécute call() quand les limites le permettent, avec nouvelles tentatives sur erreur transitoire"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(tokens, requester).result()
+            try:
+                return call()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self._give_up(e)
+                    raise
+                delay = self.backoff(attempt, e)
+                logger.warning(f"Traduction: {type(e).__name__}, nouvelle tentative dans {delay:.1f}s")
+                time.sleep(delay)
+
+    async def run_async(self, call, tokens, requester=None):
+        """Variante asynchrone de run : call() retourne une coroutine"""
+        for attempt in range(self.max_retries + 1):
+            await asyncio.wrap_future(self.acquire(tokens, requester))
+            try:
+                return await call()
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self._give_up(e)
+                    raise
+                delay = self.backoff(attempt, e)
+                logger.warning(f"Traduction: {type(e).__name__}, nouvelle tentative dans {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats["pending"] = sum(len(queue) for queue in self._queues.values())
+            stats["requesters"] = len(self._queues)
+            stats["paused_seconds"] = round(max(0.0, self._paused_until - time.monotonic()), 2)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 2)
+        stats["requests_per_minute"] = self.requests.capacity
+        stats["tokens_per_minute"] = self.tokens.capacity
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_translation_scheduler():
+    """Ordonnanceur partagé par le processus (part des limites du compte revenant à ce worker)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            workers = max(1, WEB_CONCURRENCY)
+            _scheduler = TranslationScheduler(TRANSLATION_RPM / workers, TRANSLATION_TPM / workers)
+        return _scheduler
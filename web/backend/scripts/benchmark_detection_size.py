@@ -0,0 +1,55 @@
+"""
+Compromis latence/qualité de la résolution de détection (DETECTION_SIZE)
+
+Usage:
+    python scripts/benchmark_detection_size.py --sample-dir samples/ --sizes 480 640 800 [--report rapport.json]
+
+Chaque page est détectée à sa résolution native avec l'augmentation standard
+de Detectron2 (référence), puis à chaque résolution de travail demandée. Les
+masques sont toujours comparés à la résolution d'origine.
+"""
+import sys
+import os
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.clean_bubbles import load_predictor
+from processing.detection import detect_batch
+from detector_eval import load_pages, timed_run, summarize, compare
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la résolution de détection")
+    parser.add_argument("--sample-dir", required=True, help="Dossier de pages locales")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[480, 640, 800, 1024])
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--report", help="Fichier JSON de sortie du rapport")
+    args = parser.parse_args()
+
+    pages = load_pages(args.sample_dir, args.limit)
+    if not pages:
+        print(f"❌ Aucune page trouvée dans {args.sample_dir}")
+        sys.exit(1)
+
+    predictor = load_predictor()
+    ref_latencies, ref_outputs = timed_run(lambda image: predictor(image)["instances"], pages)
+    report = {"pages": len(pages), "reference": summarize(ref_latencies), "sizes": {}}
+
+    for size in args.sizes:
+        latencies, outputs = timed_run(
+            lambda image: detect_batch([image], predictor=predictor, detection_size=size)[0]["instances"],
+            pages,
+        )
+        report["sizes"][str(size)] = {**summarize(latencies), "mask_iou": compare(ref_outputs, outputs)}
+        print(f"🔧 DETECTION_SIZE={size}: {report['sizes'][str(size)]}")
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Rapport enregistré: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
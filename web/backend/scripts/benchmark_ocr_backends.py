@@ -0,0 +1,74 @@
+"""
+Comparaison des moteurs OCR (débit et taux d'erreur caractère)
+
+Usage:
+    python scripts/benchmark_ocr_backends.py --sample-dir crops/ --backends easyocr tesseract [--report rapport.json]
+
+Les recadrages sont normalisés comme dans le pipeline (ocr_preprocess), puis
+lus par chaque moteur : d'abord un par un (latence), puis tous ensemble
+(débit en bulles/s). Le CER est calculé sur les recadrages accompagnés d'un
+fichier .txt ; sans vérité terrain, les moteurs sont comparés au premier.
+"""
+import sys
+import os
+import json
+import time
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.ocr import get_backend
+from processing.ocr_preprocess import normalize_crop
+from processing.ocr_readers import resolve_languages
+from detector_eval import summarize
+from ocr_eval import load_crops, timed_texts, character_error_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des moteurs OCR")
+    parser.add_argument("--sample-dir", required=True, help="Dossier de recadrages de bulles")
+    parser.add_argument("--backends", nargs="+", default=["easyocr", "tesseract"])
+    parser.add_argument("--languages", default=None, help="Langue source (OCR_LANGUAGES par défaut)")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--report", help="Fichier JSON de sortie du rapport")
+    args = parser.parse_args()
+
+    crops = load_crops(args.sample_dir, args.limit)
+    if not crops:
+        print(f"❌ Aucun recadrage trouvé dans {args.sample_dir}")
+        sys.exit(1)
+
+    languages = resolve_languages(args.languages)
+    prepared = [normalize_crop(image) for _, image, _ in crops]
+    normalized = [(name, image, truth) for (name, _, truth), (image, _) in zip(crops, prepared)]
+    truths = [truth for _, _, truth in crops]
+    has_truth = any(truth is not None for truth in truths)
+    report = {"crops": len(crops), "languages": list(languages), "backends": {}}
+
+    reference_texts = None
+    for name in args.backends:
+        backend = get_backend(name)
+        latencies, texts = timed_texts(lambda image: backend.read([(image, 1.0)], languages)[0], normalized)
+        start = time.perf_counter()
+        backend.read(prepared, languages)
+        batch_s = time.perf_counter() - start
+
+        if reference_texts is None:
+            reference_texts = texts
+        report["backends"][name] = {
+            **summarize(latencies),
+            "batch_crops_per_s": round(len(prepared) / batch_s, 2) if batch_s > 0 else None,
+            "cer": character_error_rate(texts, truths if has_truth else reference_texts),
+        }
+        print(f"🔧 {name}: {report['backends'][name]}")
+    if not has_truth:
+        print(f"⚠️ Pas de vérité terrain : CER calculé par rapport à {args.backends[0]}")
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Rapport enregistré: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
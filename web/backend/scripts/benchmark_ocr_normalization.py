@@ -0,0 +1,73 @@
+"""
+Compromis latence/précision de la normalisation des recadrages avant OCR
+
+Usage:
+    python scripts/benchmark_ocr_normalization.py --sample-dir crops/ --heights 0 24 32 48 [--binarize] [--report rapport.json]
+
+Chaque recadrage est lu tel quel (référence), puis normalisé à chaque hauteur
+de texte cible demandée (0 = masque seulement, sans remise à l'échelle). Le
+CER est calculé sur les recadrages accompagnés d'un fichier .txt ; sans
+vérité terrain, les textes sont comparés à ceux de la référence.
+"""
+import sys
+import os
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.model_registry import get_reader
+from processing.ocr import read_crops, join_lines
+from processing.ocr_preprocess import normalize_crop
+from detector_eval import summarize
+from ocr_eval import load_crops, timed_texts, character_error_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la normalisation OCR")
+    parser.add_argument("--sample-dir", required=True, help="Dossier de recadrages de bulles")
+    parser.add_argument("--heights", type=float, nargs="+", default=[0, 24, 32, 48])
+    parser.add_argument("--binarize", action="store_true", help="Mesurer aussi chaque hauteur avec binarisation")
+    parser.add_argument("--languages", default=None, help="Langue source (OCR_LANGUAGES par défaut)")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--report", help="Fichier JSON de sortie du rapport")
+    args = parser.parse_args()
+
+    crops = load_crops(args.sample_dir, args.limit)
+    if not crops:
+        print(f"❌ Aucun recadrage trouvé dans {args.sample_dir}")
+        sys.exit(1)
+
+    reader = get_reader(args.languages)
+    truths = [truth for _, _, truth in crops]
+    ref_latencies, ref_texts = timed_texts(lambda image: join_lines(read_crops([image], reader)[0]), crops)
+    if not any(truth is not None for truth in truths):
+        print("⚠️ Pas de vérité terrain : CER calculé par rapport à la lecture sans normalisation")
+        truths = ref_texts
+    report = {
+        "crops": len(crops),
+        "reference": {**summarize(ref_latencies), "cer": character_error_rate(ref_texts, truths)},
+        "variants": {},
+    }
+
+    variants = [(height, False) for height in args.heights]
+    if args.binarize:
+        variants += [(height, True) for height in args.heights]
+    for height, binarize in variants:
+        def run(image):
+            normalized, _ = normalize_crop(image, target_height=height, binarize=binarize)
+            return join_lines(read_crops([normalized], reader)[0])
+
+        latencies, texts = timed_texts(run, crops)
+        name = f"height={height:g}" + (",binarize" if binarize else "")
+        report["variants"][name] = {**summarize(latencies), "cer": character_error_rate(texts, truths)}
+        print(f"🔧 {name}: {report['variants'][name]}")
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Rapport enregistré: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Rapport d'évaluation du mode INT8 du détecteur sur des pages locales
+
+Usage:
+    python scripts/benchmark_quantization.py --sample-dir samples/ [--report rapport.json]
+
+Seules les couches linéaires des têtes ROI (box head fc1/fc2 et prédicteur)
+sont quantifiées, en dynamique : le backbone ResNet-50/FPN et la tête de
+masques (convolutions) restent en FP32. Aucune calibration n'est effectuée ;
+les pages locales servent uniquement à comparer FP32 et INT8 : latence
+(moyenne, p50, p95), RSS ajoutée par le chargement, taille des paramètres et
+IoU des masques appariés.
+"""
+import sys
+import os
+import json
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+from detectron2.engine import DefaultPredictor
+
+from processing.model_registry import get_detectron_cfg
+from processing.quantization import quantize_predictor
+from detector_eval import load_pages, timed_run, summarize, compare
+
+
+def rss_bytes():
+    return psutil.Process(os.getpid()).memory_info().rss
+
+
+def parameters_bytes(model):
+    total = sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+    # Poids INT8 empaquetés des couches linéaires quantifiées
+    for module in model.modules():
+        if hasattr(module, "_packed_params"):
+            weight, bias = module._packed_params._weight_bias()
+            total += weight.numel() * weight.element_size()
+            if bias is not None:
+                total += bias.numel() * bias.element_size()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rapport FP32 vs INT8 du détecteur de bulles")
+    parser.add_argument("--sample-dir", required=True, help="Dossier de pages locales")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--report", help="Fichier JSON de sortie du rapport")
+    args = parser.parse_args()
+
+    pages = load_pages(args.sample_dir, args.limit)
+    if not pages:
+        print(f"❌ Aucune page trouvée dans {args.sample_dir}")
+        sys.exit(1)
+    print(f"🔧 {len(pages)} page(s) d'évaluation")
+
+    cfg = get_detectron_cfg().clone()
+    cfg.MODEL.DEVICE = "cpu"
+
+    rss = rss_bytes()
+    fp32 = DefaultPredictor(cfg)
+    fp32_rss = rss_bytes() - rss
+    fp32_params = parameters_bytes(fp32.model)
+    fp32_latencies, fp32_outputs = timed_run(lambda image: fp32(image)["instances"], pages)
+
+    rss = rss_bytes()
+    int8 = quantize_predictor(DefaultPredictor(cfg), mode="dynamic")
+    int8_rss = rss_bytes() - rss
+    int8_latencies, int8_outputs = timed_run(lambda image: int8(image)["instances"], pages)
+
+    report = {
+        "pages": len(pages),
+        "fp32": {**summarize(fp32_latencies), "load_rss_bytes": fp32_rss, "parameters_bytes": fp32_params},
+        "int8": {**summarize(int8_latencies), "load_rss_bytes": int8_rss, "parameters_bytes": parameters_bytes(int8.model)},
+        "mask_iou": compare(fp32_outputs, int8_outputs),
+    }
+    report["speedup"] = round(report["fp32"]["mean_ms"] / report["int8"]["mean_ms"], 2)
+
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Rapport enregistré: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
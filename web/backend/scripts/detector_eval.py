@@ -0,0 +1,110 @@
+"""
+Outils communs aux scripts d'évaluation du détecteur (quantification, résolution de détection)
+"""
+import os
+import glob
+import time
+
+import cv2
+import numpy as np
+
+from processing.masks import masks_of
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+def load_pages(sample_dir, limit):
+    """Charge jusqu'à limit pages locales (nom, image BGR)"""
+    paths = [
+        p for p in sorted(glob.glob(os.path.join(sample_dir, "*")))
+        if p.lower().endswith(IMAGE_EXTENSIONS)
+    ][:limit]
+    pages = [(os.path.basename(p), cv2.imread(p)) for p in paths]
+    return [(name, image) for name, image in pages if image is not None]
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def mask_iou(a, b):
+    """IoU de deux masques compacts, calculé dans leur boîte englobante commune"""
+    if a.is_empty or b.is_empty:
+        return 1.0 if a.is_empty and b.is_empty else 0.0
+    ay0, ay1, ax0, ax1 = a.region()
+    by0, by1, bx0, bx1 = b.region()
+    region = (min(ay0, by0), max(ay1, by1), min(ax0, bx0), max(ax1, bx1))
+    a, b = a.crop_to(region), b.crop_to(region)
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum()) / float(union) if union else 1.0
+
+
+def match_masks(ref, out):
+    """
+    Apparie chaque instance de référence à l'instance candidate de même classe
+    la plus recouvrante. Retourne (IoU des masques par instance de référence,
+    nombre d'instances candidates non appariées)
+    """
+    ref_boxes = ref.pred_boxes.tensor.numpy()
+    out_boxes = out.pred_boxes.tensor.numpy()
+    ref_classes = ref.pred_classes.numpy()
+    out_classes = out.pred_classes.numpy()
+    ref_masks = masks_of(ref)
+    out_masks = masks_of(out)
+
+    used = set()
+    ious = []
+    for i in range(len(ref)):
+        best, best_iou = None, 0.0
+        for j in range(len(out)):
+            if j in used or out_classes[j] != ref_classes[i]:
+                continue
+            iou = box_iou(ref_boxes[i], out_boxes[j])
+            if iou > best_iou:
+                best, best_iou = j, iou
+        if best is None:
+            ious.append(0.0)  # instance manquée
+            continue
+        used.add(best)
+        ious.append(mask_iou(ref_masks[i], out_masks[best]))
+    return ious, len(out) - len(used)
+
+
+def timed_run(run, pages, warmup=1):
+    """Exécute run(image) -> Instances sur chaque page, retourne (latences, sorties CPU)"""
+    for _, image in pages[:warmup]:
+        run(image)
+    latencies, outputs = [], []
+    for _, image in pages:
+        start = time.perf_counter()
+        outputs.append(run(image).to("cpu"))
+        latencies.append(time.perf_counter() - start)
+    return latencies, outputs
+
+
+def summarize(latencies):
+    ms = np.array(latencies) * 1000.0
+    return {
+        "mean_ms": round(float(ms.mean()), 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+    }
+
+
+def compare(ref_outputs, out_outputs):
+    """Résumé de l'IoU des masques appariés entre deux séries de sorties"""
+    all_ious, extra = [], 0
+    for ref, out in zip(ref_outputs, out_outputs):
+        ious, spurious = match_masks(ref, out)
+        all_ious.extend(ious)
+        extra += spurious
+    return {
+        "mean": round(float(np.mean(all_ious)), 4) if all_ious else None,
+        "min": round(float(np.min(all_ious)), 4) if all_ious else None,
+        "reference_instances": len(all_ious),
+        "extra_instances": extra,
+    }
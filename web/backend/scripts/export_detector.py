@@ -0,0 +1,156 @@
+"""
+Export du détecteur de bulles (model_final.pth) en TorchScript ou ONNX
+
+Usage:
+    python scripts/export_detector.py --format torchscript
+    python scripts/export_detector.py --format onnx --sample-dir samples/
+    python scripts/export_detector.py --format torchscript --check-parity --sample-dir samples/
+
+Le serveur utilise ensuite l'artefact avec DETECTOR_BACKEND=torchscript|onnx.
+--check-parity compare le modèle exporté au modèle eager sur des pages locales
+(nombre d'instances, classes, scores, IoU des masques) et échoue si l'écart
+dépasse les seuils.
+"""
+import sys
+import os
+import glob
+import pickle
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+import torch
+import detectron2.data.transforms as T
+from detectron2.checkpoint import DetectionCheckpointer
+from detectron2.engine import DefaultPredictor
+from detectron2.export import TracingAdapter
+from detectron2.modeling import build_model
+
+from processing.model_registry import get_detectron_cfg, get_export_path
+from processing.exported_predictor import ExportedPredictor, schema_path
+from processing.masks import masks_of
+from detector_eval import mask_iou
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+def load_samples(sample_dir, limit=None):
+    """Charge les pages de test locales (ou une page blanche synthétique)"""
+    paths = []
+    if sample_dir:
+        for path in sorted(glob.glob(os.path.join(sample_dir, "*"))):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(path)
+    images = [(os.path.basename(p), cv2.imread(p)) for p in paths[:limit]]
+    images = [(name, image) for name, image in images if image is not None]
+    if not images:
+        print("⚠️  Aucune page de test trouvée, utilisation d'une page synthétique 800x1200")
+        images = [("synthetic", np.full((1200, 800, 3), 255, dtype=np.uint8))]
+    return images
+
+
+def build_traceable_model(cfg, sample_image):
+    """Construit le modèle eager CPU et l'adaptateur de traçage Detectron2"""
+    model = build_model(cfg)
+    DetectionCheckpointer(model).load(cfg.MODEL.WEIGHTS)
+    model.eval()
+
+    # Même prétraitement que DefaultPredictor / ExportedPredictor
+    image = sample_image[:, :, ::-1] if cfg.INPUT.FORMAT == "RGB" else sample_image
+    aug = T.ResizeShortestEdge([cfg.INPUT.MIN_SIZE_TEST, cfg.INPUT.MIN_SIZE_TEST], cfg.INPUT.MAX_SIZE_TEST)
+    image = aug.get_transform(image).apply_image(image)
+    tensor = torch.as_tensor(image.astype("float32").transpose(2, 0, 1))
+
+    def inference(model, inputs):
+        # do_postprocess=False : les masques restent 28x28, collés par detector_postprocess au runtime
+        instances = model.inference(inputs, do_postprocess=False)[0]
+        return [{"instances": instances}]
+
+    adapter = TracingAdapter(model, [{"image": tensor}], inference)
+    return adapter, tensor
+
+
+def export(cfg, fmt, output_path, sample_image):
+    adapter, tensor = build_traceable_model(cfg, sample_image)
+    with torch.no_grad():
+        if fmt == "torchscript":
+            traced = torch.jit.trace(adapter, (tensor,))
+            traced.save(output_path)
+        else:
+            torch.onnx.export(
+                adapter,
+                (tensor,),
+                output_path,
+                opset_version=16,
+                input_names=["image"],
+                dynamic_axes={"image": {1: "height", 2: "width"}},
+            )
+    with open(schema_path(output_path), "wb") as f:
+        pickle.dump(adapter.outputs_schema, f)
+    print(f"✅ Modèle exporté ({fmt}): {output_path} ({os.path.getsize(output_path)} bytes)")
+
+
+def check_parity(cfg, fmt, output_path, samples, min_iou, max_score_diff):
+    """Compare les sorties du modèle exporté à celles du modèle eager"""
+    eager = DefaultPredictor(cfg)
+    exported = ExportedPredictor(cfg, output_path, backend=fmt)
+    ok = True
+
+    for name, image in samples:
+        ref = eager(image)["instances"].to("cpu")
+        out = exported(image)["instances"].to("cpu")
+        if len(ref) != len(out):
+            print(f"❌ {name}: {len(ref)} instances (eager) vs {len(out)} ({fmt})")
+            ok = False
+            continue
+        if len(ref) == 0:
+            print(f"✅ {name}: aucune instance des deux côtés")
+            continue
+
+        same_classes = bool((ref.pred_classes == out.pred_classes).all())
+        score_diff = float((ref.scores - out.scores).abs().max())
+        ious = [
+            mask_iou(a, b)
+            for a, b in zip(masks_of(ref), masks_of(out))
+        ]
+        worst_iou = min(ious)
+        passed = same_classes and score_diff <= max_score_diff and worst_iou >= min_iou
+        ok = ok and passed
+        print(
+            f"{'✅' if passed else '❌'} {name}: {len(ref)} instances, classes identiques={same_classes}, "
+            f"écart score max={score_diff:.4f}, IoU masque min={worst_iou:.4f}"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export TorchScript/ONNX du détecteur de bulles")
+    parser.add_argument("--format", choices=["torchscript", "onnx"], default="torchscript")
+    parser.add_argument("--output", help="Chemin de l'artefact (par défaut: models_ai/model_final.ts|.onnx)")
+    parser.add_argument("--sample-dir", help="Dossier de pages locales pour le traçage et la parité")
+    parser.add_argument("--limit", type=int, default=10, help="Nombre maximal de pages de test")
+    parser.add_argument("--check-parity", action="store_true", help="Comparer au modèle eager après export")
+    parser.add_argument("--skip-export", action="store_true", help="Vérifier la parité d'un artefact existant")
+    parser.add_argument("--min-iou", type=float, default=0.95)
+    parser.add_argument("--max-score-diff", type=float, default=0.02)
+    args = parser.parse_args()
+
+    cfg = get_detectron_cfg().clone()
+    # L'export et la comparaison se font sur CPU, comme en production
+    cfg.MODEL.DEVICE = "cpu"
+    output_path = args.output or get_export_path(args.format)
+    samples = load_samples(args.sample_dir, args.limit)
+
+    if not args.skip_export:
+        export(cfg, args.format, output_path, samples[0][1])
+
+    if args.check_parity:
+        if not check_parity(cfg, args.format, output_path, samples, args.min_iou, args.max_score_diff):
+            print("❌ Parité non respectée")
+            sys.exit(1)
+        print("✅ Parité respectée")
+
+
+if __name__ == "__main__":
+    main()
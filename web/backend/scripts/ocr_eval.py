@@ -0,0 +1,61 @@
+"""
+Outils communs aux scripts d'évaluation de l'OCR (normalisation, moteurs OCR)
+
+Un échantillon est un dossier de recadrages de bulles ; la vérité terrain
+d'un recadrage bulle_01.png est lue dans bulle_01.txt s'il existe.
+"""
+import os
+import time
+
+from detector_eval import load_pages
+
+
+def load_crops(sample_dir, limit):
+    """Charge jusqu'à limit recadrages locaux : (nom, image BGR, texte attendu ou None)"""
+    crops = []
+    for name, image in load_pages(sample_dir, limit):
+        truth_path = os.path.join(sample_dir, os.path.splitext(name)[0] + ".txt")
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding="utf-8") as f:
+                truth = f.read().strip()
+        crops.append((name, image, truth))
+    return crops
+
+
+def normalize_text(text):
+    return " ".join(text.upper().split())
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(predictions, truths):
+    """CER global (distance d'édition / caractères attendus), casse et espaces normalisés"""
+    errors, total = 0, 0
+    for prediction, truth in zip(predictions, truths):
+        if truth is None:
+            continue
+        truth = normalize_text(truth)
+        errors += edit_distance(normalize_text(prediction), truth)
+        total += len(truth)
+    return round(errors / total, 4) if total else None
+
+
+def timed_texts(run, crops, warmup=1):
+    """Exécute run(image) -> texte sur chaque recadrage, retourne (latences, textes)"""
+    for _, image, _ in crops[:warmup]:
+        run(image)
+    latencies, texts = [], []
+    for _, image, _ in crops:
+        start = time.perf_counter()
+        texts.append(run(image))
+        latencies.append(time.perf_counter() - start)
+    return latencies, texts